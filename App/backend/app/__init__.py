@@ -5,15 +5,32 @@ from flask_migrate import Migrate
 from flask_jwt_extended import JWTManager
 from flask_bcrypt import Bcrypt
 from .config import Config
+from .compression import Compress
+from .metrics import Metrics
+from .rate_limit import RateLimiter
+from .events import EventBus
+from .logs import StructuredLogging
+from .profiling import Profiler
+from . import replica
+from .services import posters
+import logging
 import time
 from sqlalchemy.exc import OperationalError
 from sqlalchemy import text
 
-# Initialisation des extensions Flask (Base de données, Migration, JWT, Hachage mdp)
-db = SQLAlchemy()
+# Initialisation des extensions Flask (Base de données, Migration, JWT, Hachage mdp, Compression, Métriques, Limitation de débit, Évènements des listes, Journaux, Profilage)
+db = SQLAlchemy(session_options={'class_': replica.RoutingSession})
 migrate = Migrate()
 jwt = JWTManager()
 bcrypt = Bcrypt()
+compress = Compress()
+metrics = Metrics()
+limiter = RateLimiter()
+events = EventBus()
+logs = StructuredLogging()
+profiler = Profiler()
+
+logger = logging.getLogger(__name__)
 
 def create_app(config_class=Config):
     """
@@ -24,10 +41,21 @@ def create_app(config_class=Config):
     app.config.from_object(config_class)
 
     # Initialisation des extensions avec l'instance de l'application
+    # Journaux en premier : les messages de démarrage et la durée complète des requêtes sont couverts
+    logs.init_app(app)
     db.init_app(app)
     migrate.init_app(app, db)
     jwt.init_app(app)
     bcrypt.init_app(app)
+    compress.init_app(app)
+    metrics.init_app(app)
+    # Après les métriques : les réponses 429 sont comptabilisées
+    limiter.init_app(app)
+    replica.init_app(app, db)
+    posters.init_app(app)
+    events.init_app(app)
+    # Après les journaux et les métriques : l'ID de requête et le nombre de requêtes SQL sont connus à l'enregistrement du profil
+    profiler.init_app(app)
     
     # Configuration de CORS pour autoriser les requêtes cross-origin
     CORS(app)
@@ -65,13 +93,23 @@ def create_app(config_class=Config):
     swagger = Swagger(app, template=swagger_template, config=swagger_config)
 
     # Enregistrement des Blueprints (les différentes parties de l'API)
-    from app.routes import auth, movies, lists, admin, profile
+    from app.routes import auth, movies, lists, admin, profile, batch, sync
     app.register_blueprint(auth.bp)
     app.register_blueprint(movies.bp)
     app.register_blueprint(lists.bp)
+    app.register_blueprint(batch.bp)
+    app.register_blueprint(sync.bp)
     app.register_blueprint(admin.bp)
     app.register_blueprint(profile.bp)
 
+    # Tâches d'administration en arrière-plan (import, export)
+    from .services import jobs
+    jobs.init_app(app, db)
+
+    # Commandes CLI (flask generate-data, ...)
+    from app import cli
+    cli.init_app(app)
+
     # Logique de démarrage : vérification de la connexion DB et migrations automatiques
     # Cette logique est ignorée lors des tests pour éviter de bloquer l'exécution
     if not app.config.get('TESTING'):
@@ -89,41 +127,106 @@ def create_app(config_class=Config):
                             conn.execute(text("ALTER TABLE movies ADD COLUMN release_date VARCHAR(20)"))
                             conn.execute(text("ALTER TABLE movies ADD COLUMN is_custom BOOLEAN DEFAULT 1"))
                             conn.commit()
-                            print("Added release_date and is_custom columns.")
+                            logger.info("Added release_date and is_custom columns.")
                     except Exception as migration_error:
                         # Ignorer si les colonnes existent déjà
-                        print(f"Migration note: {migration_error}")
+                        logger.info("Migration note: %s", migration_error)
                     
+                    # Colonnes updated_at pour l'export incrémental (since=...)
+                    # Les lignes existantes sont datées de la migration
+                    for table in ('users', 'movies', 'lists', 'list_items'):
+                        try:
+                            with db.engine.connect() as conn:
+                                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN updated_at DATETIME"))
+                                conn.execute(text(f"UPDATE {table} SET updated_at = CURRENT_TIMESTAMP WHERE updated_at IS NULL"))
+                                conn.execute(text(f"CREATE INDEX ix_{table}_updated_at ON {table} (updated_at)"))
+                                conn.commit()
+                                logger.info("Added updated_at column to %s.", table)
+                        except Exception as migration_error:
+                            # Ignorer si la colonne existe déjà
+                            logger.info("Migration note: %s", migration_error)
+
+                    # Numéro de séquence du journal des modifications (synchronisation incrémentale)
+                    try:
+                        with db.engine.connect() as conn:
+                            conn.execute(text("ALTER TABLE users ADD COLUMN change_seq INTEGER NOT NULL DEFAULT 0"))
+                            conn.commit()
+                            logger.info("Added change_seq column to users.")
+                    except Exception as migration_error:
+                        # Ignorer si la colonne existe déjà
+                        logger.info("Migration note: %s", migration_error)
+
+                    # Identifiant stable des utilisateurs et des films (réplication par export incrémental)
+                    from app.models import fill_missing_uids
+                    for table, key, order_by in (('users', 'username', 'id'), ('movies', 'title', 'is_custom, id')):
+                        try:
+                            with db.engine.connect() as conn:
+                                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN uid VARCHAR(36)"))
+                                conn.execute(text(f"CREATE UNIQUE INDEX ix_{table}_uid ON {table} (uid)"))
+                                conn.commit()
+                                logger.info("Added uid column to %s.", table)
+                        except Exception as migration_error:
+                            # Ignorer si la colonne existe déjà
+                            logger.info("Migration note: %s", migration_error)
+                        with db.engine.connect() as conn:
+                            filled = fill_missing_uids(conn, table, key, order_by)
+                            conn.commit()
+                            if filled:
+                                logger.info("Assigned uid to %d rows of %s.", filled, table)
+
                     # Correction des contraintes de clé étrangère (Cascade Delete)
                     try:
                         with db.engine.connect() as conn:
                             try:
                                 conn.execute(text("ALTER TABLE list_items DROP FOREIGN KEY list_items_ibfk_2"))
-                                print("Dropped old movie_id FK constraint.")
+                                logger.info("Dropped old movie_id FK constraint.")
                             except Exception:
                                 pass
                                 
                             conn.execute(text("ALTER TABLE list_items ADD CONSTRAINT list_items_ibfk_2 FOREIGN KEY (movie_id) REFERENCES movies(id) ON DELETE CASCADE"))
                             conn.commit()
-                            print("Applied CASCADE delete to list_items.movie_id")
+                            logger.info("Applied CASCADE delete to list_items.movie_id")
                     except Exception as fk_error:
-                        print(f"FK Fix note: {fk_error}")
+                        logger.info("FK Fix note: %s", fk_error)
+
+                    # Cascade côté base pour les listes, éléments de liste et profils (suppressions passives)
+                    for table, constraint, column, parent in (
+                        ('lists', 'lists_ibfk_1', 'user_id', 'users'),
+                        ('list_items', 'list_items_ibfk_1', 'list_id', 'lists'),
+                        ('user_profiles', 'user_profiles_ibfk_1', 'user_id', 'users'),
+                    ):
+                        try:
+                            with db.engine.connect() as conn:
+                                try:
+                                    conn.execute(text(f"ALTER TABLE {table} DROP FOREIGN KEY {constraint}"))
+                                except Exception:
+                                    pass
+                                conn.execute(text(f"ALTER TABLE {table} ADD CONSTRAINT {constraint} FOREIGN KEY ({column}) REFERENCES {parent}(id) ON DELETE CASCADE"))
+                                conn.commit()
+                                logger.info("Applied CASCADE delete to %s.%s", table, column)
+                        except Exception as fk_error:
+                            logger.info("FK Fix note: %s", fk_error)
 
                     # Peuplement initial de la base de données
                     from app.routes.movies import seed_movies
                     seed_movies()
-                    print("Database connected and seeded successfully!")
+
+                    # Classement des films : construit une première fois si la table est vide
+                    from app.services import leaderboard
+                    if leaderboard.is_empty(db.session):
+                        leaderboard.rebuild(db.session)
+                    logger.info("Database connected and seeded successfully!")
                     break
                 except OperationalError as e:
                     # Gestion de l'attente si la base de données n'est pas encore prête (ex: démarrage Docker)
                     if attempt < max_retries - 1:
-                        print(f"Database not ready yet (Attempt {attempt+1}/{max_retries}). Retrying in 5s...")
+                        logger.warning("Database not ready yet (Attempt %d/%d). Retrying in 5s...", attempt + 1, max_retries)
                         time.sleep(5)
                     else:
-                        print("Could not connect to database after multiple attempts.")
+                        logger.error("Could not connect to database after multiple attempts.")
                         raise e
                 except Exception as e:
-                    print(f"Unexpected error during startup: {e}")
+                    logger.exception("Unexpected error during startup")
                     raise e
 
     # Endpoint de santé pour vérifier que l'API tourne
@@ -0,0 +1,117 @@
+import time
+
+import click
+from flask.cli import with_appcontext
+
+# Commandes "flask ..." de l'application (exemple : flask --app wsgi generate-data --items 1000000)
+
+
+def init_app(app):
+    app.cli.add_command(generate_data)
+    app.cli.add_command(rebuild_leaderboard)
+    app.cli.add_command(build_recommendations)
+    app.cli.add_command(run_jobs)
+    app.cli.add_command(prune_changes)
+
+
+@click.command('generate-data')
+@click.option('--users', default=100, show_default=True, help="Nombre d'utilisateurs")
+@click.option('--movies', default=1000, show_default=True, help="Nombre de films")
+@click.option('--lists', default=500, show_default=True, help="Nombre de listes")
+@click.option('--items', default=10000, show_default=True, help="Nombre (approximatif) d'éléments de liste")
+@click.option('--seed', default=42, show_default=True, help="Graine aléatoire (même graine = mêmes données)")
+@click.option('--comment-ratio', default=0.2, show_default=True, help="Part des éléments ayant un commentaire")
+@click.option('--zipf', 'zipf_exponent', default=1.1, show_default=True, help="Exposant de Zipf de la popularité des films")
+@click.option('--pareto', 'pareto_alpha', default=1.3, show_default=True, help="Paramètre de Pareto de la taille des listes")
+@click.option('--password', default='password', show_default=True, help="Mot de passe commun aux utilisateurs générés")
+@click.option('--chunk-size', default=10000, show_default=True, help="Lignes par insertion groupée")
+@click.option('--export', 'export_path', type=click.Path(dir_okay=False, writable=True),
+              help="Écrit aussi un fichier au format de /api/admin/export")
+@with_appcontext
+def generate_data(users, movies, lists, items, seed, comment_ratio, zipf_exponent, pareto_alpha,
+                  password, chunk_size, export_path):
+    """Génère un jeu de données synthétique réaliste (popularité Zipf, listes à longue traîne)."""
+    from app import db, bcrypt
+    from app.services.datagen import generate
+    from app.services.export import iter_json
+
+    if min(users, movies, lists) < 1:
+        raise click.BadParameter("users, movies et lists doivent être strictement positifs")
+
+    started = time.perf_counter()
+
+    def progress(name, count):
+        click.echo(f"\r{name}: {count}", nl=False, err=True)
+
+    counts = generate(
+        db.session, bcrypt.generate_password_hash(password).decode('utf-8'),
+        users=users, movies=movies, lists=lists, items=items, seed=seed,
+        comment_ratio=comment_ratio, zipf_exponent=zipf_exponent, pareto_alpha=pareto_alpha,
+        chunk_size=chunk_size, progress=progress,
+    )
+    click.echo('', err=True)
+    for name, count in counts.items():
+        click.echo(f"{name}: {count} rows")
+    click.echo(f"Generated in {time.perf_counter() - started:.1f}s")
+
+    if export_path:
+        with open(export_path, 'w', encoding='utf-8') as f:
+            for part in iter_json(db.session):
+                f.write(part)
+        click.echo(f"Export written to {export_path}")
+
+
+@click.command('rebuild-leaderboard')
+@with_appcontext
+def rebuild_leaderboard():
+    """Reconstruit entièrement le classement des films (table movie_scores)."""
+    from app import db
+    from app.services import leaderboard
+
+    started = time.perf_counter()
+    leaderboard.rebuild(db.session)
+    click.echo(f"Leaderboard rebuilt in {time.perf_counter() - started:.1f}s")
+
+
+@click.command('build-recommendations')
+@click.option('--top', default=50, show_default=True, help="Nombre de voisins conservés par film")
+@with_appcontext
+def build_recommendations(top):
+    """Recalcule les films voisins utilisés par /api/lists/<public_id>/recommendations."""
+    from app import db
+    from app.services import recommendations
+
+    started = time.perf_counter()
+    pairs = recommendations.build(db.session, top_n=top)
+    click.echo(f"{pairs} neighbour pairs stored in {time.perf_counter() - started:.1f}s")
+
+
+@click.command('prune-changes')
+@click.option('--days', default=30, show_default=True, help="Ancienneté (jours) au-delà de laquelle le journal est élagué")
+@with_appcontext
+def prune_changes(days):
+    """Élague le journal des modifications (les clients non synchronisés depuis rechargeront tout)."""
+    from datetime import datetime, timedelta
+    from app import db
+    from app.services import changes
+
+    deleted = changes.prune(db.session, datetime.utcnow() - timedelta(days=days))
+    db.session.commit()
+    click.echo(f"{deleted} change log entries pruned")
+
+
+@click.command('run-jobs')
+@click.option('--once', is_flag=True, help="Exécute les tâches en attente puis s'arrête")
+@with_appcontext
+def run_jobs(once):
+    """Exécute les tâches d'import/export en arrière-plan (processus dédié, avec JOBS_WORKERS=0 côté web)."""
+    from flask import current_app
+    from app import db
+
+    runner = current_app.extensions['jobs']
+    while True:
+        while runner.run_next():
+            db.session.remove()
+        if once:
+            break
+        time.sleep(current_app.config['JOBS_POLL_INTERVAL'])
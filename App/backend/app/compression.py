@@ -0,0 +1,75 @@
+import zlib
+
+from flask import request, current_app
+
+# Paramètre wbits de zlib pour chaque encodage HTTP (gzip = en-tête gzip, deflate = format zlib)
+_WBITS = {
+    'gzip': 16 + zlib.MAX_WBITS,
+    'deflate': zlib.MAX_WBITS,
+}
+
+
+def _compress_stream(iterable, compressor):
+    """Compresse une réponse générée au fil de l'eau (ex: export en streaming)."""
+    try:
+        for chunk in iterable:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+        yield compressor.flush()
+    finally:
+        # Libère les ressources du générateur d'origine (curseurs, fichiers temporaires)
+        close = getattr(iterable, 'close', None)
+        if close:
+            close()
+
+
+class Compress:
+    """
+    Compression gzip/deflate des réponses, négociée à partir de l'en-tête Accept-Encoding.
+    Les réponses en mémoire ne sont compressées qu'au-delà de COMPRESS_MIN_SIZE octets ;
+    les réponses en streaming (générateurs) sont compressées bloc par bloc.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('COMPRESS_ENABLED', True)
+        app.config.setdefault('COMPRESS_LEVEL', 6)
+        app.config.setdefault('COMPRESS_MIN_SIZE', 1024)
+        app.config.setdefault('COMPRESS_MIMETYPES', ['application/json', 'text/html', 'text/plain', 'text/css', 'application/javascript'])
+        app.after_request(self.after_request)
+
+    def after_request(self, response):
+        config = current_app.config
+
+        if not config['COMPRESS_ENABLED']:
+            return response
+        if response.mimetype not in config['COMPRESS_MIMETYPES']:
+            return response
+        if response.status_code < 200 or response.status_code in (204, 206, 304):
+            return response
+        if 'Content-Encoding' in response.headers or response.direct_passthrough:
+            return response
+
+        response.vary.add('Accept-Encoding')
+        encoding = request.accept_encodings.best_match(list(_WBITS))
+        if not encoding:
+            return response
+
+        compressor = zlib.compressobj(config['COMPRESS_LEVEL'], zlib.DEFLATED, _WBITS[encoding])
+        if response.is_streamed:
+            response.response = _compress_stream(response.response, compressor)
+            response.headers.pop('Content-Length', None)
+        else:
+            data = response.get_data()
+            if len(data) < config['COMPRESS_MIN_SIZE']:
+                return response
+            response.set_data(compressor.compress(data) + compressor.flush())
+
+        response.headers['Content-Encoding'] = encoding
+        return response
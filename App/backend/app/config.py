@@ -13,10 +13,92 @@ class Config:
     
     # Désactive le suivi des modifications des objets (économise de la mémoire)
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Pool de connexions : pre_ping détecte les connexions coupées par MySQL,
+    # recycle les renouvelle avant le wait_timeout du serveur
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 10)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 20)),
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 280)),
+        'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', 30)),
+        'pool_pre_ping': os.environ.get('DB_POOL_PRE_PING', '1') == '1',
+    }
+
+    # Réplica en lecture optionnel : les vues @read_only y envoient leurs SELECT
+    SQLALCHEMY_BINDS = {'replica': os.environ['READ_DATABASE_URL']} if os.environ.get('READ_DATABASE_URL') else {}
+
+    # Durée (secondes) pendant laquelle un client relit sur le primaire après une écriture
+    REPLICA_STICKY_SECONDS = int(os.environ.get('REPLICA_STICKY_SECONDS', 5))
     
     # Clé spécifique pour signer les tokens JWT d'authentification
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY') or 'jwt_dev_secret_change_me'
 
+    # Nombre de lignes insérées par paquet (executemany) lors d'un import admin
+    IMPORT_CHUNK_SIZE = int(os.environ.get('IMPORT_CHUNK_SIZE', 1000))
+
+    # Nombre d'éléments de liste supprimés par transaction lors d'une suppression admin (verrous courts)
+    PURGE_CHUNK_SIZE = int(os.environ.get('PURGE_CHUNK_SIZE', 5000))
+
+    # Nombre maximal d'opérations par requête POST /api/batch
+    BATCH_MAX_OPERATIONS = int(os.environ.get('BATCH_MAX_OPERATIONS', 500))
+
+    # Compression gzip/deflate des réponses (niveau 1-9, taille minimale en octets)
+    COMPRESS_LEVEL = int(os.environ.get('COMPRESS_LEVEL', 6))
+    COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', 1024))
+
+    # Dossier partagé par les workers Gunicorn pour agréger /api/metrics (None = processus seul)
+    METRICS_DIR = os.environ.get('METRICS_DIR')
+    # Jeton optionnel exigé dans l'en-tête X-Metrics-Token pour lire /api/metrics
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+    # Limitation des vérifications d'identifiants : login, inscription et mots de passe refusés (protège le CPU de bcrypt), format "N/minute"
+    RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', '1') == '1'
+    RATE_LIMIT_PER_USER = os.environ.get('RATE_LIMIT_PER_USER', '10/minute')
+    RATE_LIMIT_PER_IP = os.environ.get('RATE_LIMIT_PER_IP', '30/minute')
+    # Fichier SQLite local partagé par les workers (None = compteurs propres au processus)
+    RATE_LIMIT_STORAGE = os.environ.get('RATE_LIMIT_STORAGE')
+
+    # Reconstruction complète périodique du classement des films, en secondes (0 = désactivée)
+    LEADERBOARD_REBUILD_INTERVAL = int(os.environ.get('LEADERBOARD_REBUILD_INTERVAL', 3600))
+
+    # Cache local des affiches (originaux et miniatures) et origine des chemins TMDB relatifs
+    POSTER_CACHE_DIR = os.environ.get('POSTER_CACHE_DIR') or '/tmp/poster-cache'
+    POSTER_TMDB_BASE_URL = os.environ.get('POSTER_TMDB_BASE_URL') or 'https://image.tmdb.org/t/p'
+    # Hôtes autorisés pour les affiches données par URL complète (séparés par des virgules)
+    POSTER_ALLOWED_HOSTS = tuple(os.environ.get('POSTER_ALLOWED_HOSTS', 'image.tmdb.org,upload.wikimedia.org').split(','))
+    # Dossier d'images servant d'origine (tests, développement hors ligne)
+    POSTER_FIXTURE_DIR = os.environ.get('POSTER_FIXTURE_DIR')
+
+    # Tâches d'import/export en arrière-plan : fichiers d'entrée et résultats (volume partagé
+    # si plusieurs conteneurs), threads d'exécution par processus (0 = processus "flask run-jobs" dédié)
+    JOBS_DIR = os.environ.get('JOBS_DIR') or '/tmp/app-jobs'
+    JOBS_WORKERS = int(os.environ.get('JOBS_WORKERS', 1))
+    JOBS_POLL_INTERVAL = int(os.environ.get('JOBS_POLL_INTERVAL', 5))
+    # Une tâche sans heartbeat depuis JOBS_STALE_SECONDS est reprise par un autre worker
+    JOBS_HEARTBEAT_INTERVAL = int(os.environ.get('JOBS_HEARTBEAT_INTERVAL', 10))
+    JOBS_STALE_SECONDS = int(os.environ.get('JOBS_STALE_SECONDS', 120))
+    JOBS_MAX_ATTEMPTS = int(os.environ.get('JOBS_MAX_ATTEMPTS', 3))
+
+    # Flux SSE des listes : fichier SQLite local partagé par les workers (None = évènements propres au processus)
+    EVENTS_BUS_PATH = os.environ.get('EVENTS_BUS_PATH')
+    # Flux simultanés par processus (chacun occupe un thread), commentaire de maintien, durée avant reconnexion
+    EVENTS_MAX_STREAMS = int(os.environ.get('EVENTS_MAX_STREAMS', 100))
+    EVENTS_KEEPALIVE_SECONDS = int(os.environ.get('EVENTS_KEEPALIVE_SECONDS', 15))
+    EVENTS_MAX_STREAM_SECONDS = int(os.environ.get('EVENTS_MAX_STREAM_SECONDS', 300))
+
+    # Journaux JSON écrits par un thread dédié : niveau, taille de la file (au-delà les enregistrements
+    # sont écartés), fraction conservée des journaux volumineux (accès, inscriptions), seuil de requête lente
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+    LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', 10000))
+    LOG_SAMPLE_RATE = float(os.environ.get('LOG_SAMPLE_RATE', 0.1))
+    LOG_SLOW_REQUEST_MS = int(os.environ.get('LOG_SLOW_REQUEST_MS', 1000))
+
+    # Profilage à la demande : requêtes de l'admin portant l'en-tête X-Profile, et fraction tirée au sort
+    # de toutes les requêtes (0 = aucune). Profils conservés dans un dossier partagé, les plus anciens supprimés
+    PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', 0))
+    PROFILE_DIR = os.environ.get('PROFILE_DIR') or '/tmp/app-profiles'
+    PROFILE_MAX_FILES = int(os.environ.get('PROFILE_MAX_FILES', 50))
+
 class TestConfig(Config):
     """
     Configuration spécifique pour les tests unitaires.
@@ -24,4 +106,21 @@ class TestConfig(Config):
     """
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    SQLALCHEMY_ENGINE_OPTIONS = {}
     WTF_CSRF_ENABLED = False
+    # Les vues dépassant leur budget de requêtes SQL (@query_budget) font échouer les tests
+    QUERY_BUDGET_ENFORCED = True
+    # Les tests enchaînent les connexions : la limitation est activée au cas par cas
+    RATE_LIMIT_ENABLED = False
+    # Base en mémoire invisible depuis d'autres threads : les tâches sont exécutées explicitement (run_next)
+    JOBS_WORKERS = 0
+
+class BenchmarkConfig(TestConfig):
+    """
+    Configuration du banc d'essai (benchmark.py).
+    Base SQLite en mémoire par défaut (ou BENCHMARK_DATABASE_URL), sans vérification des budgets.
+    """
+    SQLALCHEMY_DATABASE_URI = os.environ.get('BENCHMARK_DATABASE_URL') or 'sqlite:///:memory:'
+    QUERY_BUDGET_ENFORCED = False
+    # Hachage bcrypt allégé : seul le temps des endpoints mesurés compte, pas celui du chargement
+    BCRYPT_LOG_ROUNDS = 4
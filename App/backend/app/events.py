@@ -0,0 +1,283 @@
+from collections import deque
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+# Diffusion des modifications de listes aux pages ouvertes (Server-Sent Events).
+# Les routes d'écriture publient un évènement compact sur le canal de la liste (son public_id) ;
+# chaque flux SSE ouvert est abonné à ce canal via le bus du processus.
+
+# Évènements conservés pour la reprise d'un flux interrompu (en-tête Last-Event-ID),
+# par liste, pour les REPLAY_CHANNELS listes modifiées le plus récemment (bus en mémoire)
+REPLAY_SIZE = 200
+REPLAY_CHANNELS = 1000
+
+# Évènements en attente par abonné : au-delà, l'abonné décroche et le client recharge la liste
+SUBSCRIBER_QUEUE_SIZE = 1000
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    """Abonnement d'un flux SSE à un canal : file des évènements (id, type, données) à envoyer."""
+
+    def __init__(self, bus, channel, last_id=0):
+        self.bus = bus
+        self.channel = channel
+        self.last_id = last_id
+        self.overflowed = False
+        self._queue = queue.Queue(SUBSCRIBER_QUEUE_SIZE)
+
+    def put(self, event):
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self.overflowed = True
+
+    def get(self, timeout):
+        """Prochain évènement non encore envoyé, ou None après timeout secondes."""
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                event = self._queue.get(timeout=max(0, deadline - time.monotonic()))
+            except queue.Empty:
+                return None
+            # Un évènement rejoué puis reçu en direct n'est envoyé qu'une fois
+            if event[0] > self.last_id:
+                self.last_id = event[0]
+                return event
+
+    def close(self):
+        self.bus.unsubscribe(self)
+
+
+class LocalBus:
+    """
+    Bus en mémoire : les évènements ne sont vus que par les flux du même processus
+    (serveur de développement, worker unique, tests).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}
+        self._recent = {}
+        self._next_id = 0
+
+    def publish(self, channel, event_type, data):
+        with self._lock:
+            self._next_id += 1
+            self._dispatch(self._next_id, channel, event_type, data)
+
+    def _dispatch(self, event_id, channel, event_type, data):
+        event = (event_id, event_type, data)
+        self._remember(channel, event)
+        for subscription in self._subscribers.get(channel, ()):
+            subscription.put(event)
+
+    def _remember(self, channel, event):
+        recent = self._recent.pop(channel, None)
+        if recent is None:
+            recent = deque(maxlen=REPLAY_SIZE)
+            if len(self._recent) >= REPLAY_CHANNELS:
+                del self._recent[next(iter(self._recent))]
+        # Réinsertion en fin : le dictionnaire reste ordonné de la liste la moins récemment modifiée à la plus récente
+        recent.append(event)
+        self._recent[channel] = recent
+
+    def _replay(self, channel, last_id):
+        with self._lock:
+            return [event for event in self._recent.get(channel, ()) if event[0] > last_id]
+
+    def subscribe(self, channel, last_id=None):
+        """Abonne un flux au canal ; avec last_id, les évènements manqués depuis sont rejoués."""
+        # Sans reprise, seuls les évènements postérieurs à l'abonnement sont envoyés
+        if last_id is None:
+            last_id = self.last_id(channel)
+        subscription = Subscription(self, channel, last_id)
+        with self._lock:
+            self._subscribers.setdefault(channel, set()).add(subscription)
+        # Rejoue aussi ce qui a été publié pendant l'abonnement (les doublons sont écartés par ID)
+        try:
+            for event in self._replay(channel, last_id):
+                subscription.put(event)
+        except Exception:
+            # L'appelant ne reçoit pas l'abonnement : il ne pourrait jamais le fermer
+            self.unsubscribe(subscription)
+            raise
+        return subscription
+
+    def last_id(self, channel):
+        with self._lock:
+            return self._next_id
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.channel)
+            if subscribers:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.channel]
+
+
+class SQLiteBus(LocalBus):
+    """
+    Bus partagé par les workers Gunicorn du conteneur, au travers d'un fichier SQLite local :
+    publier insère une ligne, et un thread par processus relit les nouvelles lignes toutes les
+    poll_interval secondes pour les distribuer aux flux locaux. L'ID de ligne, commun à tous
+    les processus, sert d'ID d'évènement SSE (reprise possible sur n'importe quel worker).
+    """
+
+    def __init__(self, path, poll_interval=0.25, retention=300):
+        super().__init__()
+        self.path = path
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self._local = threading.local()
+        self._poller_pid = None
+        self._published = 0
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS events (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                "channel TEXT NOT NULL, type TEXT NOT NULL, data TEXT NOT NULL, created REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_events_channel ON events (channel, id)")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=5)
+
+    def _connection(self):
+        # Une connexion par thread et par processus (les connexions ne survivent pas au fork)
+        if getattr(self._local, 'pid', None) != os.getpid():
+            self._local.conn = self._connect()
+            self._local.conn.isolation_level = None
+            self._local.pid = os.getpid()
+        return self._local.conn
+
+    def publish(self, channel, event_type, data):
+        conn = self._connection()
+        now = time.time()
+        conn.execute(
+            "INSERT INTO events (channel, type, data, created) VALUES (?, ?, ?, ?)",
+            (channel, event_type, json.dumps(data), now)
+        )
+        self._published += 1
+        if self._published % 100 == 0:
+            conn.execute("DELETE FROM events WHERE created < ?", (now - self.retention,))
+
+    def _remember(self, channel, event):
+        # Les évènements récents sont relus dans le fichier partagé
+        pass
+
+    def _replay(self, channel, last_id):
+        rows = self._connection().execute(
+            "SELECT id, type, data FROM events WHERE channel = ? AND id > ? ORDER BY id", (channel, last_id)
+        ).fetchall()
+        return [(event_id, event_type, json.loads(data)) for event_id, event_type, data in rows]
+
+    def last_id(self, channel):
+        return self._connection().execute("SELECT COALESCE(MAX(id), 0) FROM events").fetchone()[0]
+
+    def subscribe(self, channel, last_id=None):
+        self._start_poller()
+        return super().subscribe(channel, last_id)
+
+    def _start_poller(self):
+        with self._lock:
+            if self._poller_pid == os.getpid():
+                return
+            self._poller_pid = os.getpid()
+        threading.Thread(target=self._poll, name='events-poller', daemon=True).start()
+
+    def _poll(self):
+        seen = self.last_id(None)
+        while True:
+            time.sleep(self.poll_interval)
+            if not self._subscribers:
+                seen = self.last_id(None)
+                continue
+            try:
+                rows = self._connection().execute(
+                    "SELECT id, channel, type, data FROM events WHERE id > ? ORDER BY id", (seen,)
+                ).fetchall()
+            except sqlite3.Error as e:
+                logger.warning("Error polling events: %s", e)
+                continue
+            with self._lock:
+                for event_id, channel, event_type, data in rows:
+                    seen = event_id
+                    if channel in self._subscribers:
+                        self._dispatch(event_id, channel, event_type, json.loads(data))
+
+
+class EventBus:
+    """
+    Extension : bus d'évènements des listes. Si EVENTS_BUS_PATH est défini, les évènements
+    passent par ce fichier SQLite partagé par les workers ; sinon ils restent dans le processus.
+    """
+
+    def __init__(self, app=None):
+        self.bus = None
+        self._streams = 0
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('EVENTS_BUS_PATH', None)
+        app.config.setdefault('EVENTS_KEEPALIVE_SECONDS', 15)
+        app.config.setdefault('EVENTS_MAX_STREAM_SECONDS', 300)
+        app.config.setdefault('EVENTS_MAX_STREAMS', 100)
+        path = app.config['EVENTS_BUS_PATH']
+        self.bus = SQLiteBus(path) if path else LocalBus()
+
+    def publish(self, channel, event_type, data):
+        """Publie un évènement ; une panne du bus n'empêche jamais l'écriture d'aboutir."""
+        try:
+            self.bus.publish(channel, event_type, data)
+        except Exception as e:
+            logger.exception("Error publishing event")
+
+    def open_stream(self, max_streams):
+        """Réserve une place de flux SSE dans ce processus (False si la limite est atteinte)."""
+        with self._lock:
+            if self._streams >= max_streams:
+                return False
+            self._streams += 1
+            return True
+
+    def close_stream(self, subscription=None):
+        """
+        Libère la place du flux (appelé à la fermeture de la réponse, même si le flux n'a jamais
+        démarré, ou par la vue si l'abonnement n'a pas pu être créé).
+        """
+        if subscription is not None:
+            subscription.close()
+        with self._lock:
+            self._streams -= 1
+
+    def stream(self, subscription, keepalive, max_seconds):
+        """
+        Génère le flux SSE : évènements "id/event/data", commentaire de maintien de connexion
+        toutes les keepalive secondes. Le flux est fermé après max_seconds (le navigateur se
+        reconnecte avec Last-Event-ID) pour ne pas immobiliser un thread indéfiniment.
+        """
+        yield f"retry: 3000\nid: {subscription.last_id}\n\n"
+        deadline = time.monotonic() + max_seconds
+        while time.monotonic() < deadline:
+            event = subscription.get(min(keepalive, max(0, deadline - time.monotonic())))
+            if subscription.overflowed:
+                # Trop d'évènements manqués : le client doit recharger la liste complète
+                yield "event: reset\ndata: {}\n\n"
+                return
+            if event is None:
+                yield ": keep-alive\n\n"
+                continue
+            event_id, event_type, data = event
+            yield f"id: {event_id}\nevent: {event_type}\ndata: {json.dumps(data)}\n\n"
+            if event_type == 'list_deleted':
+                return
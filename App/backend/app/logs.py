@@ -0,0 +1,200 @@
+from datetime import datetime, timezone
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import time
+import uuid
+
+from flask import g, request, has_request_context, current_app
+
+# Journalisation structurée, sans écriture bloquante dans les threads de requête :
+# un enregistrement est mis en file (jamais d'attente, il est écarté si la file est pleine)
+# et un thread d'écriture par processus le sérialise en JSON sur la sortie d'erreur.
+# Les enregistrements marqués extra={"sample": True} (volumineux : journal d'accès,
+# tentatives d'inscription) ne sont conservés qu'avec la probabilité LOG_SAMPLE_RATE.
+
+# Attributs standards d'un LogRecord (tout autre attribut provient de extra= et est sérialisé)
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime', 'taskName', 'sample'}
+
+
+class JsonFormatter(logging.Formatter):
+    """Un objet JSON par ligne : horodatage, niveau, logger, message, champs extra et trace d'exception."""
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class RequestContextFilter(logging.Filter):
+    """Ajoute l'ID de la requête HTTP en cours (exécuté dans le thread de la requête, avant la mise en file)."""
+
+    def filter(self, record):
+        if has_request_context() and 'request_id' in g and not hasattr(record, 'request_id'):
+            record.request_id = g.request_id
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Ne conserve qu'une fraction des enregistrements marqués "sample" (avertissements et erreurs toujours gardés)."""
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        if not getattr(record, 'sample', False) or record.levelno >= logging.WARNING:
+            return True
+        return self.rate >= 1 or random.random() < self.rate
+
+
+class AsyncHandler(logging.handlers.QueueHandler):
+    """
+    Met les enregistrements en file pour un thread d'écriture (QueueListener).
+    La file est bornée et l'ajout ne bloque jamais : au-delà, les enregistrements sont écartés
+    et leur nombre est reporté ("dropped") sur le suivant. Le thread d'écriture ne survivant
+    pas au fork, il est recréé dans chaque worker Gunicorn.
+    """
+
+    def __init__(self, target, maxsize):
+        self.target = target
+        self.maxsize = maxsize
+        self.dropped = 0
+        self.listener = None
+        super().__init__(queue.Queue(maxsize))
+        self.start()
+
+    def start(self):
+        self.queue = queue.Queue(self.maxsize)
+        self.listener = logging.handlers.QueueListener(self.queue, self.target, respect_handler_level=True)
+        self.listener.start()
+        self.pid = os.getpid()
+
+    def stop(self):
+        # Vide la file avant de rendre la main (arrêt du processus)
+        if self.listener is not None and self.pid == os.getpid():
+            self.listener.stop()
+        self.listener = None
+
+    def prepare(self, record):
+        # Seuls le message et la trace sont calculés ici ; la sérialisation JSON se fait dans le thread d'écriture
+        record = logging.makeLogRecord(vars(record))
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        # Appelé sous le verrou du gestionnaire : le compteur n'est pas partagé entre threads sans protection
+        if self.dropped:
+            record.dropped = self.dropped
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            return
+        self.dropped = 0
+
+
+# Gestionnaire actif du processus (une application par processus ; le dernier create_app l'emporte)
+_active = None
+
+
+def _restart_in_child():
+    if _active is not None:
+        _active.start()
+
+
+def _stop_active():
+    if _active is not None:
+        _active.stop()
+
+
+os.register_at_fork(after_in_child=_restart_in_child)
+atexit.register(_stop_active)
+
+
+class StructuredLogging:
+    """
+    Extension : configure le logger "app" (et donc ceux des modules app.*) avec le gestionnaire
+    asynchrone, attribue un ID à chaque requête (en-tête X-Request-ID, repris de Nginx s'il est
+    fourni) et journalise un enregistrement d'accès : durée, requêtes SQL, statut.
+    Les requêtes en erreur 5xx ou plus lentes que LOG_SLOW_REQUEST_MS sont toujours journalisées,
+    les autres sont échantillonnées.
+    """
+
+    def __init__(self, app=None):
+        self.handler = None
+        self.logger = logging.getLogger('app.request')
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        global _active
+        app.config.setdefault('LOG_LEVEL', 'INFO')
+        app.config.setdefault('LOG_SAMPLE_RATE', 1.0)
+        app.config.setdefault('LOG_QUEUE_SIZE', 10000)
+        app.config.setdefault('LOG_SLOW_REQUEST_MS', 1000)
+
+        stream = logging.StreamHandler(sys.stderr)
+        stream.setFormatter(JsonFormatter())
+        handler = AsyncHandler(stream, app.config['LOG_QUEUE_SIZE'])
+        handler.addFilter(RequestContextFilter())
+        handler.addFilter(SamplingFilter(app.config['LOG_SAMPLE_RATE']))
+
+        root = logging.getLogger('app')
+        if self.handler is not None:
+            root.removeHandler(self.handler)
+            self.handler.stop()
+        root.addHandler(handler)
+        root.setLevel(app.config['LOG_LEVEL'])
+        root.propagate = False
+        self.handler = _active = handler
+
+        app.before_request(self._start)
+        app.after_request(self._record)
+
+    def _start(self):
+        g.request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex
+        g.log_start = time.perf_counter()
+
+    def _record(self, response):
+        if 'log_start' not in g:
+            return response
+        response.headers['X-Request-ID'] = g.request_id
+        duration_ms = round((time.perf_counter() - g.log_start) * 1000, 1)
+        slow = duration_ms >= current_app.config['LOG_SLOW_REQUEST_MS']
+        self.logger.log(
+            logging.WARNING if response.status_code >= 500 or slow else logging.INFO,
+            "%s %s %s", request.method, request.path, response.status_code,
+            extra={
+                "sample": True,
+                "method": request.method,
+                "path": request.path,
+                "endpoint": request.url_rule.endpoint if request.url_rule else None,
+                "status": response.status_code,
+                "duration_ms": duration_ms,
+                "sql_count": g.get('sql_count'),
+                "sql_ms": round(g.sql_time * 1000, 1) if 'sql_time' in g else None,
+            }
+        )
+        return response
+
@@ -0,0 +1,241 @@
+from bisect import bisect_left
+import copy
+import glob
+import json
+import logging
+import os
+import threading
+import time
+
+from flask import g, request, has_request_context, current_app, abort
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Bornes (secondes) de l'histogramme de latence des requêtes HTTP
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Bornes de l'histogramme du nombre de requêtes SQL par requête HTTP (détection des N+1)
+QUERY_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100, 500)
+
+# Fichier regroupant les compteurs des workers terminés
+ARCHIVE_FILE = 'archive.json'
+
+logger = logging.getLogger(__name__)
+
+
+def _empty_series():
+    return {
+        "count": 0,
+        "sum": 0.0,
+        "buckets": [0] * (len(LATENCY_BUCKETS) + 1),
+        "sql_count": 0,
+        "sql_time": 0.0,
+        "sql_buckets": [0] * (len(QUERY_BUCKETS) + 1),
+    }
+
+
+def merge(target, source):
+    """Additionne les compteurs de source dans target (agrégation entre workers)."""
+    for key, series in source.get("requests", {}).items():
+        current = target["requests"].setdefault(key, _empty_series())
+        for field in ("count", "sum", "sql_count", "sql_time"):
+            current[field] += series[field]
+        for field in ("buckets", "sql_buckets"):
+            current[field] = [a + b for a, b in zip(current[field], series[field])]
+    for key, count in source.get("statuses", {}).items():
+        target["statuses"][key] = target["statuses"].get(key, 0) + count
+    return target
+
+
+def _read(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write(path, data):
+    # Écriture atomique : un lecteur ne voit jamais un fichier à moitié écrit
+    # (fichier temporaire propre au processus et au thread : deux écritures simultanées ne se marchent pas dessus)
+    tmp_path = f'{path}.{os.getpid()}-{threading.get_ident()}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def mark_process_dead(directory, pid):
+    """
+    Fusionne les compteurs d'un worker terminé dans l'archive (appelé par le maître Gunicorn),
+    pour que les totaux restent cumulatifs malgré le recyclage des workers.
+    """
+    path = os.path.join(directory, f'{pid}.json')
+    if not os.path.exists(path):
+        return
+    archive_path = os.path.join(directory, ARCHIVE_FILE)
+    archive = merge({"requests": {}, "statuses": {}}, _read(archive_path))
+    _write(archive_path, merge(archive, _read(path)))
+    os.remove(path)
+
+
+def _labels(**labels):
+    return ','.join(f'{name}="{value}"' for name, value in labels.items())
+
+
+def _format_le(bound):
+    return '+Inf' if bound is None else repr(float(bound))
+
+
+def render(data):
+    """Sérialise les compteurs au format texte Prometheus."""
+    lines = []
+    requests = sorted(data["requests"].items())
+
+    lines.append('# HELP http_request_duration_seconds Latence des requêtes HTTP par endpoint.')
+    lines.append('# TYPE http_request_duration_seconds histogram')
+    for key, series in requests:
+        endpoint, method = key.split('|')
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS + (None,), series["buckets"]):
+            cumulative += count
+            lines.append(f'http_request_duration_seconds_bucket{{{_labels(endpoint=endpoint, method=method, le=_format_le(bound))}}} {cumulative}')
+        lines.append(f'http_request_duration_seconds_sum{{{_labels(endpoint=endpoint, method=method)}}} {series["sum"]}')
+        lines.append(f'http_request_duration_seconds_count{{{_labels(endpoint=endpoint, method=method)}}} {series["count"]}')
+
+    lines.append('# HELP http_requests_total Nombre de requêtes HTTP par endpoint et code de statut.')
+    lines.append('# TYPE http_requests_total counter')
+    for key, count in sorted(data["statuses"].items()):
+        endpoint, method, status = key.split('|')
+        lines.append(f'http_requests_total{{{_labels(endpoint=endpoint, method=method, status=status)}}} {count}')
+
+    lines.append('# HELP http_request_sql_queries Nombre de requêtes SQL émises par requête HTTP.')
+    lines.append('# TYPE http_request_sql_queries histogram')
+    for key, series in requests:
+        endpoint, method = key.split('|')
+        cumulative = 0
+        for bound, count in zip(QUERY_BUCKETS + (None,), series["sql_buckets"]):
+            cumulative += count
+            lines.append(f'http_request_sql_queries_bucket{{{_labels(endpoint=endpoint, method=method, le=_format_le(bound))}}} {cumulative}')
+        lines.append(f'http_request_sql_queries_sum{{{_labels(endpoint=endpoint, method=method)}}} {series["sql_count"]}')
+        lines.append(f'http_request_sql_queries_count{{{_labels(endpoint=endpoint, method=method)}}} {series["count"]}')
+
+    lines.append('# HELP http_request_sql_duration_seconds_total Temps total passé en base de données par endpoint.')
+    lines.append('# TYPE http_request_sql_duration_seconds_total counter')
+    for key, series in requests:
+        endpoint, method = key.split('|')
+        lines.append(f'http_request_sql_duration_seconds_total{{{_labels(endpoint=endpoint, method=method)}}} {series["sql_time"]}')
+
+    return '\n'.join(lines) + '\n'
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_start'].pop()
+    if has_request_context() and 'metrics_start' in g:
+        g.sql_count += 1
+        g.sql_time += elapsed
+
+
+class Metrics:
+    """
+    Mesures par endpoint : histogramme de latence, codes de statut, nombre de requêtes SQL
+    et temps passé en base. Exposées au format Prometheus sur /api/metrics.
+    Si METRICS_DIR est défini, chaque worker y recopie ses compteurs (au plus toutes les
+    METRICS_FLUSH_INTERVAL secondes) et /api/metrics agrège tous les workers du nœud.
+    """
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        # Sérialise les recopies dans METRICS_DIR (distinct de _lock : l'écriture disque ne bloque pas les compteurs)
+        self._flush_lock = threading.Lock()
+        self._data = {"requests": {}, "statuses": {}}
+        self._last_flush = 0.0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('METRICS_DIR', None)
+        app.config.setdefault('METRICS_FLUSH_INTERVAL', 1.0)
+        app.config.setdefault('METRICS_TOKEN', None)
+        if app.config['METRICS_DIR']:
+            os.makedirs(app.config['METRICS_DIR'], exist_ok=True)
+
+        app.before_request(self._start)
+        app.after_request(self._record)
+        app.add_url_rule('/api/metrics', 'metrics', self.metrics_view)
+
+    def _start(self):
+        g.metrics_start = time.perf_counter()
+        g.sql_count = 0
+        g.sql_time = 0.0
+
+    def _record(self, response):
+        if 'metrics_start' not in g:
+            return response
+        elapsed = time.perf_counter() - g.metrics_start
+        endpoint = request.url_rule.endpoint if request.url_rule else 'unmatched'
+        key = f'{endpoint}|{request.method}'
+
+        with self._lock:
+            series = self._data["requests"].setdefault(key, _empty_series())
+            series["count"] += 1
+            series["sum"] += elapsed
+            series["buckets"][bisect_left(LATENCY_BUCKETS, elapsed)] += 1
+            series["sql_count"] += g.sql_count
+            series["sql_time"] += g.sql_time
+            series["sql_buckets"][bisect_left(QUERY_BUCKETS, g.sql_count)] += 1
+            status_key = f'{key}|{response.status_code}'
+            self._data["statuses"][status_key] = self._data["statuses"].get(status_key, 0) + 1
+
+        try:
+            self._flush()
+        except Exception as e:
+            # Une mesure non recopiée ne doit jamais faire échouer la requête
+            logger.warning("Error flushing metrics: %s", e)
+        return response
+
+    def _flush(self, force=False):
+        """Recopie les compteurs du worker courant dans METRICS_DIR."""
+        directory = current_app.config['METRICS_DIR']
+        if not directory:
+            return
+        # Hors recopie forcée, un thread qui trouve une recopie en cours n'attend pas
+        if not self._flush_lock.acquire(blocking=force):
+            return
+        try:
+            now = time.monotonic()
+            if not force and now - self._last_flush < current_app.config['METRICS_FLUSH_INTERVAL']:
+                return
+            with self._lock:
+                snapshot = copy.deepcopy(self._data)
+            _write(os.path.join(directory, f'{os.getpid()}.json'), snapshot)
+            self._last_flush = now
+        finally:
+            self._flush_lock.release()
+
+    def collect(self):
+        """Renvoie les compteurs agrégés (tous les workers si METRICS_DIR est défini)."""
+        directory = current_app.config['METRICS_DIR']
+        if not directory:
+            with self._lock:
+                return copy.deepcopy(self._data)
+        try:
+            self._flush(force=True)
+        except OSError as e:
+            # Les autres workers restent agrégés ; les compteurs du worker courant datent de sa dernière recopie
+            logger.warning("Error flushing metrics: %s", e)
+        data = {"requests": {}, "statuses": {}}
+        for path in glob.glob(os.path.join(directory, '*.json')):
+            merge(data, _read(path))
+        return data
+
+    def metrics_view(self):
+        token = current_app.config['METRICS_TOKEN']
+        if token and request.headers.get('X-Metrics-Token') != token:
+            abort(403)
+        return current_app.response_class(render(self.collect()), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -1,7 +1,40 @@
 from datetime import datetime
+import sqlite3
 import uuid
+from sqlalchemy import event, select, text
+from sqlalchemy.engine import Engine
 from . import db
 
+# Espace de noms des uid dérivés d'une clé naturelle : mêmes valeurs sur toutes les bases,
+# sans échange préalable (films du catalogue initial, lignes antérieures aux uid)
+UID_NAMESPACE = uuid.UUID('465f9625-1652-41f0-8e44-a1a67800ca6a')
+
+
+def natural_uid(kind, key):
+    """uid déterministe d'une ligne identifiée par sa clé naturelle (ex : natural_uid('movie', 'Inception'))."""
+    return str(uuid.uuid5(UID_NAMESPACE, f'{kind}:{key.lower()}'))
+
+
+def fill_missing_uids(connection, table, key, order_by):
+    """
+    Attribue un uid aux lignes qui n'en ont pas (migration) : dérivé de la clé naturelle, pour que
+    deux bases déjà synchronisées donnent le même uid à la même ligne ; aléatoire si cet uid est
+    déjà pris (titres identiques à la casse près : le premier selon order_by garde l'uid dérivé).
+    """
+    rows = connection.execute(text(f"SELECT id, {key} FROM {table} WHERE uid IS NULL ORDER BY {order_by}")).all()
+    if not rows:
+        return 0
+    used = set(connection.execute(text(f"SELECT uid FROM {table} WHERE uid IS NOT NULL")).scalars())
+    values = []
+    for row_id, natural_key in rows:
+        uid = natural_uid(table[:-1], natural_key)
+        if uid in used:
+            uid = str(uuid.uuid4())
+        used.add(uid)
+        values.append({"b_uid": uid, "b_id": row_id})
+    connection.execute(text(f"UPDATE {table} SET uid = :b_uid WHERE id = :b_id"), values)
+    return len(values)
+
 class User(db.Model):
     """
     Modèle représentant un utilisateur de l'application.
@@ -9,15 +42,21 @@ class User(db.Model):
     __tablename__ = 'users'
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
+    # Identifiant stable, conservé d'une base à l'autre (le pseudo peut changer) : réplication par export incrémental
+    uid = db.Column(db.String(36), default=lambda: str(uuid.uuid4()), unique=True)
     password_hash = db.Column(db.String(128), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+    # Dernier numéro de séquence du journal des modifications de l'utilisateur (voir Change)
+    change_seq = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     
     # Relation One-to-Many avec les listes de l'utilisateur
     # cascade="all, delete-orphan" assure que les listes sont supprimées si l'utilisateur l'est
-    lists = db.relationship('List', backref='owner', lazy=True, cascade="all, delete-orphan")
+    # passive_deletes : les listes non chargées ne sont pas lues, la base les supprime (ON DELETE CASCADE)
+    lists = db.relationship('List', backref='owner', lazy=True, cascade="all, delete-orphan", passive_deletes=True)
     
     # Relation One-to-One avec le profil utilisateur (Bio)
-    profile = db.relationship('UserProfile', backref='user', uselist=False, cascade="all, delete-orphan")
+    profile = db.relationship('UserProfile', backref='user', uselist=False, cascade="all, delete-orphan", passive_deletes=True)
 
 class UserProfile(db.Model):
     """
@@ -25,7 +64,7 @@ class UserProfile(db.Model):
     """
     __tablename__ = 'user_profiles'
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), unique=True, nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), unique=True, nullable=False)
     bio = db.Column(db.Text)
 
 class Movie(db.Model):
@@ -35,9 +74,12 @@ class Movie(db.Model):
     __tablename__ = 'movies'
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(255), nullable=False)
+    # Identifiant stable, conservé d'une base à l'autre (plusieurs films peuvent porter le même titre)
+    uid = db.Column(db.String(36), default=lambda: str(uuid.uuid4()), unique=True)
     poster_path = db.Column(db.String(255)) # URL ou chemin de l'affiche
     release_date = db.Column(db.String(20)) # Date de sortie (souvent juste l'année)
     is_custom = db.Column(db.Boolean, default=True) # True si ajouté manuellement par un utilisateur
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
 
 class List(db.Model):
     """
@@ -45,7 +87,7 @@ class List(db.Model):
     """
     __tablename__ = 'lists'
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
     name = db.Column(db.String(100), nullable=False)
     
     # IDs publics (lecture seule) et privés (édition) pour le partage
@@ -54,9 +96,10 @@ class List(db.Model):
     
     is_public = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     
     # Relation avec les éléments de la liste (films ajoutés)
-    items = db.relationship('ListItem', backref='list', lazy=True, cascade="all, delete-orphan", order_by='ListItem.rank')
+    items = db.relationship('ListItem', backref='list', lazy=True, cascade="all, delete-orphan", order_by='ListItem.rank', passive_deletes=True)
 
 class ListItem(db.Model):
     """
@@ -65,12 +108,127 @@ class ListItem(db.Model):
     """
     __tablename__ = 'list_items'
     id = db.Column(db.Integer, primary_key=True)
-    list_id = db.Column(db.Integer, db.ForeignKey('lists.id'), nullable=False)
+    list_id = db.Column(db.Integer, db.ForeignKey('lists.id', ondelete='CASCADE'), nullable=False)
     
     # ondelete='CASCADE' assure que l'élément de liste est supprimé si le film est supprimé de la base globale
     movie_id = db.Column(db.Integer, db.ForeignKey('movies.id', ondelete='CASCADE'), nullable=False)
     
     rank = db.Column(db.Integer, nullable=False) # Ordre dans la liste
     comment = db.Column(db.Text) # Commentaire optionnel de l'utilisateur sur ce film
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     
     movie = db.relationship('Movie') # Accès direct à l'objet Movie
+
+class MovieScore(db.Model):
+    """
+    Classement matérialisé des films ("les plus aimés"), agrégé sur toutes les listes publiques.
+    Maintenu incrémentalement à chaque flush (voir app/services/leaderboard.py).
+    """
+    __tablename__ = 'movie_scores'
+    movie_id = db.Column(db.Integer, db.ForeignKey('movies.id', ondelete='CASCADE'), primary_key=True)
+    score = db.Column(db.Integer, nullable=False, default=0) # Somme des points de Borda
+    list_count = db.Column(db.Integer, nullable=False, default=0) # Nombre de listes publiques contenant le film
+
+    # Parcours du classement par pagination "keyset" (score, movie_id) décroissants
+    __table_args__ = (db.Index('ix_movie_scores_score', 'score', 'movie_id'),)
+
+class MovieNeighbor(db.Model):
+    """
+    Films voisins (souvent classés ensemble) d'un film, calculés par lot
+    (voir app/services/recommendations.py). Seuls les N meilleurs voisins sont conservés.
+    """
+    __tablename__ = 'movie_neighbors'
+    movie_id = db.Column(db.Integer, db.ForeignKey('movies.id', ondelete='CASCADE'), primary_key=True)
+    neighbor_id = db.Column(db.Integer, db.ForeignKey('movies.id', ondelete='CASCADE'), primary_key=True)
+    score = db.Column(db.Float, nullable=False) # Similarité cosinus des co-occurrences pondérées par le rang
+
+class Job(db.Model):
+    """
+    Tâche d'administration exécutée en arrière-plan (import, export), voir app/services/jobs.py.
+    L'état est stocké en base : n'importe quel worker peut répondre au suivi, et une tâche dont
+    le worker s'est arrêté (heartbeat trop ancien) est reprise par un autre.
+    """
+    __tablename__ = 'jobs'
+    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    kind = db.Column(db.String(16), nullable=False) # import ou export
+    status = db.Column(db.String(16), nullable=False, default='pending', index=True) # pending, running, succeeded, failed
+    params = db.Column(db.Text) # Paramètres JSON (format, since)
+    progress = db.Column(db.Text) # Lignes traitées par section (JSON)
+    rows = db.Column(db.Integer, nullable=False, default=0) # Total des lignes traitées
+    result = db.Column(db.Text) # Résumé JSON du résultat
+    error = db.Column(db.Text)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    worker = db.Column(db.String(128)) # hôte:pid:thread du worker en charge
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    started_at = db.Column(db.DateTime)
+    heartbeat_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+class Change(db.Model):
+    """
+    Journal des modifications des listes d'un utilisateur (synchronisation incrémentale, GET /api/sync).
+    Chaque écriture avance users.change_seq et enregistre ici les listes et éléments touchés
+    avec ce numéro : le curseur d'un client est le dernier numéro qu'il a reçu.
+    Seule l'identité des lignes est journalisée, leur état courant est relu à la synchronisation.
+    """
+    __tablename__ = 'changes'
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    seq = db.Column(db.Integer, nullable=False)
+    entity = db.Column(db.String(8), nullable=False) # list, item, ou reset (resynchronisation complète)
+    entity_id = db.Column(db.Integer)
+    list_id = db.Column(db.Integer) # Liste de l'élément (sans clé étrangère : la liste a pu être supprimée)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+    __table_args__ = (db.Index('ix_changes_user_seq', 'user_id', 'seq'),)
+
+class Tombstone(db.Model):
+    """
+    Trace d'une ligne supprimée, utilisée par l'export incrémental (since=...).
+    Les lignes sont identifiées par une clé stable pour pouvoir rejouer la suppression
+    sur une autre base (les IDs diffèrent d'une base à l'autre) : uid des utilisateurs
+    et des films, public_id des listes. Les pierres tombales antérieures portent le pseudo
+    ou le titre, rejoués seulement s'ils désignent une ligne sans ambiguïté.
+    """
+    __tablename__ = 'tombstones'
+    id = db.Column(db.Integer, primary_key=True)
+    table_name = db.Column(db.String(32), nullable=False)
+    key = db.Column(db.String(255), nullable=False) # uid, public_id ou uid du film (list_items)
+    parent_key = db.Column(db.String(36)) # public_id de la liste pour les list_items
+    deleted_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+
+def _record_deletion(table_name, key_attr):
+    """Construit un écouteur after_delete qui insère une pierre tombale pour la ligne supprimée."""
+    def listener(mapper, connection, target):
+        connection.execute(Tombstone.__table__.insert().values(
+            table_name=table_name,
+            key=getattr(target, key_attr),
+            deleted_at=datetime.utcnow()
+        ))
+    return listener
+
+
+def _record_list_item_deletion(mapper, connection, target):
+    # Seules des requêtes SQL sont permises pendant le flush : les clés stables
+    # (uid du film, public_id de la liste) sont donc relues par sous-requêtes
+    connection.execute(Tombstone.__table__.insert().values(
+        table_name='list_items',
+        key=select(Movie.uid).where(Movie.id == target.movie_id).scalar_subquery(),
+        parent_key=select(List.public_id).where(List.id == target.list_id).scalar_subquery(),
+        deleted_at=datetime.utcnow()
+    ))
+
+
+@event.listens_for(Engine, 'connect')
+def _enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+    # SQLite n'applique les clés étrangères (et donc ON DELETE CASCADE) qu'à la demande, par connexion
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA foreign_keys = ON')
+        cursor.close()
+
+
+event.listen(User, 'after_delete', _record_deletion('users', 'uid'))
+event.listen(Movie, 'after_delete', _record_deletion('movies', 'uid'))
+event.listen(List, 'after_delete', _record_deletion('lists', 'public_id'))
+event.listen(ListItem, 'after_delete', _record_list_item_deletion)
@@ -0,0 +1,168 @@
+from datetime import datetime, timezone
+import cProfile
+import glob
+import io
+import json
+import logging
+import os
+import pstats
+import random
+import re
+import threading
+import time
+import uuid
+
+from flask import g, request, current_app
+from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity
+
+# Profils cProfile de requêtes choisies, pour savoir où passe le temps d'un endpoint lent en
+# production (bcrypt, SQL, hydratation ORM, construction du JSON). Une requête est profilée si
+# l'administrateur envoie l'en-tête PROFILE_HEADER, ou par tirage avec la probabilité
+# PROFILE_SAMPLE_RATE. Sans déclenchement, le coût se limite à la lecture d'un en-tête.
+
+# Format des IDs de profil (horodatage à la microseconde puis suffixe aléatoire : l'ordre alphabétique est chronologique)
+_PROFILE_ID = re.compile(r'^\d{8}T\d{12}-[0-9a-f]{8}$')
+
+logger = logging.getLogger(__name__)
+
+
+def _write(path, write):
+    # Écriture atomique : un lecteur ne voit jamais un fichier à moitié écrit
+    tmp_path = f'{path}.tmp'
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+
+class Profiler:
+    """
+    Extension : profile les requêtes déclenchées et conserve les profils (format pstats de
+    cProfile, lisible par pstats, snakeviz ou gprof2dot) dans PROFILE_DIR, avec leurs
+    métadonnées. Le dossier est un tampon circulaire partagé par les workers : au-delà de
+    PROFILE_MAX_FILES profils, les plus anciens sont supprimés.
+    Un seul profil à la fois par processus ; une requête déclenchée pendant ce temps n'est pas profilée.
+    Les flux (SSE, exports en streaming) ne sont profilés que jusqu'au renvoi de la réponse.
+    """
+
+    def __init__(self, app=None):
+        self._busy = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('PROFILE_DIR', '/tmp/app-profiles')
+        app.config.setdefault('PROFILE_MAX_FILES', 50)
+        app.config.setdefault('PROFILE_SAMPLE_RATE', 0.0)
+        app.config.setdefault('PROFILE_HEADER', 'X-Profile')
+        os.makedirs(app.config['PROFILE_DIR'], exist_ok=True)
+
+        app.before_request(self._start)
+        app.after_request(self._stop)
+        app.teardown_request(self._abort)
+
+    def _trigger(self):
+        config = current_app.config
+        rate = config['PROFILE_SAMPLE_RATE']
+        if rate and random.random() < rate:
+            return 'sampled'
+        if request.headers.get(config['PROFILE_HEADER']):
+            # Jeton vérifié uniquement quand l'en-tête est présent
+            try:
+                verify_jwt_in_request(optional=True)
+            except Exception:
+                return None
+            if get_jwt_identity() == "admin":
+                return 'header'
+        return None
+
+    def _start(self):
+        trigger = self._trigger()
+        if trigger is None or not self._busy.acquire(blocking=False):
+            return
+        g.profile_trigger = trigger
+        g.profile_start = time.perf_counter()
+        g.profile = cProfile.Profile()
+        g.profile.enable()
+
+    def _stop(self, response):
+        profile = g.pop('profile', None)
+        if profile is None:
+            return response
+        profile.disable()
+        try:
+            duration_ms = round((time.perf_counter() - g.profile_start) * 1000, 1)
+            response.headers['X-Profile-ID'] = self._save(profile, {
+                "trigger": g.profile_trigger,
+                "method": request.method,
+                "path": request.path,
+                "endpoint": request.url_rule.endpoint if request.url_rule else None,
+                "status": response.status_code,
+                "duration_ms": duration_ms,
+                "sql_count": g.get('sql_count'),
+                "request_id": g.get('request_id'),
+            })
+        except OSError as e:
+            # Dossier plein ou inaccessible : la réponse est renvoyée sans profil
+            logger.warning("Error saving profile: %s", e)
+        finally:
+            self._busy.release()
+        return response
+
+    def _abort(self, exc):
+        # Exception non gérée : after_request n'est pas appelé, le profil est abandonné
+        profile = g.pop('profile', None)
+        if profile is not None:
+            profile.disable()
+            self._busy.release()
+
+    def _save(self, profile, meta):
+        directory = current_app.config['PROFILE_DIR']
+        now = datetime.now(timezone.utc)
+        profile_id = f"{now.strftime('%Y%m%dT%H%M%S%f')}-{uuid.uuid4().hex[:8]}"
+        meta = {"id": profile_id, "created_at": now.isoformat(timespec='milliseconds'),
+                "pid": os.getpid(), **meta}
+        _write(os.path.join(directory, f'{profile_id}.prof'), profile.dump_stats)
+        _write(os.path.join(directory, f'{profile_id}.json'), lambda path: self._dump_meta(path, meta))
+        self._trim(directory, current_app.config['PROFILE_MAX_FILES'])
+        return profile_id
+
+    @staticmethod
+    def _dump_meta(path, meta):
+        with open(path, 'w') as f:
+            json.dump(meta, f)
+
+    def _ids(self, directory):
+        return sorted(os.path.basename(path)[:-len('.json')] for path in glob.glob(os.path.join(directory, '*.json')))
+
+    def _trim(self, directory, max_files):
+        for profile_id in self._ids(directory)[:-max_files or None]:
+            for ext in ('.json', '.prof'):
+                try:
+                    os.remove(os.path.join(directory, profile_id + ext))
+                except FileNotFoundError:
+                    # Déjà supprimé par un autre worker
+                    pass
+
+    def profiles(self):
+        """Métadonnées des profils conservés, du plus récent au plus ancien."""
+        directory = current_app.config['PROFILE_DIR']
+        result = []
+        for profile_id in reversed(self._ids(directory)):
+            try:
+                with open(os.path.join(directory, f'{profile_id}.json')) as f:
+                    result.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return result
+
+    def path(self, profile_id):
+        """Chemin du fichier pstats d'un profil, ou None s'il n'existe pas (ou plus)."""
+        if not _PROFILE_ID.match(profile_id):
+            return None
+        path = os.path.join(current_app.config['PROFILE_DIR'], f'{profile_id}.prof')
+        return path if os.path.exists(path) else None
+
+    def report(self, path, sort='cumulative', limit=50):
+        """Résumé texte d'un profil (fonctions les plus coûteuses selon sort)."""
+        stream = io.StringIO()
+        pstats.Stats(path, stream=stream).sort_stats(sort).print_stats(limit)
+        return stream.getvalue()
@@ -0,0 +1,67 @@
+from functools import wraps
+import threading
+
+from flask import current_app, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Levée (en test) quand une vue émet plus de requêtes SQL que son budget déclaré."""
+
+
+class QueryCounter:
+    """
+    Contexte qui enregistre les requêtes SQL exécutées pendant un bloc, sur tous les moteurs.
+    Seules les requêtes du thread courant sont comptées (serveur de test multi-thread).
+    Exemple : with QueryCounter() as counter: ... ; counter.count, counter.statements
+    """
+
+    def __init__(self):
+        self.statements = []
+        self._thread = threading.get_ident()
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        if threading.get_ident() == self._thread:
+            self.statements.append(statement)
+
+    def __enter__(self):
+        event.listen(Engine, 'after_cursor_execute', self._record)
+        return self
+
+    def __exit__(self, *exc_info):
+        event.remove(Engine, 'after_cursor_execute', self._record)
+        return False
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def report(self):
+        return '\n'.join(f'  {i}. {statement}' for i, statement in enumerate(self.statements, 1))
+
+    def assert_at_most(self, limit, label='block'):
+        if self.count > limit:
+            raise QueryBudgetExceeded(
+                f"{label} issued {self.count} SQL queries (budget {limit}):\n{self.report()}"
+            )
+
+
+def query_budget(limit):
+    """
+    Déclare le nombre maximal de requêtes SQL qu'une vue peut émettre.
+    Vérifié uniquement si QUERY_BUDGET_ENFORCED est actif (TestConfig) : aucun coût en production.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not current_app.config.get('QUERY_BUDGET_ENFORCED'):
+                return view(*args, **kwargs)
+            with QueryCounter() as counter:
+                response = view(*args, **kwargs)
+            counter.assert_at_most(limit, label=request.endpoint)
+            return response
+
+        wrapper.query_budget = limit
+        return wrapper
+    return decorator
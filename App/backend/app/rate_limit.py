@@ -0,0 +1,176 @@
+import math
+import os
+import sqlite3
+import threading
+import time
+
+from flask import request, current_app, jsonify
+
+# Endpoints dont chaque appel est décompté (vérification d'identifiants ou hachage bcrypt à chaque fois)
+CREDENTIAL_ENDPOINTS = ('auth.login', 'auth.register')
+
+# Les compartiments inactifs depuis plus longtemps sont purgés du stockage
+IDLE_SECONDS = 3600
+PURGE_EVERY = 1000
+
+
+def parse_rate(value):
+    """'10/minute' -> (jetons par seconde, capacité). Unités : second, minute, hour."""
+    count, _, unit = value.partition('/')
+    seconds = {'second': 1, 'minute': 60, 'hour': 3600}[unit.strip().rstrip('s') or 'second']
+    count = int(count)
+    return count / seconds, count
+
+
+def _refill(tokens, updated, rate, burst, now):
+    return min(burst, tokens + (now - updated) * rate)
+
+
+def _take(states, buckets, now, cost=1):
+    """
+    Décompte cost jetons de chaque compartiment, tout ou rien (cost=0 : vérifie seulement qu'il en reste un).
+    states : clé -> (jetons, date). Renvoie (nouveaux états, délai d'attente en secondes ou 0).
+    """
+    refilled = {}
+    wait = 0.0
+    for key, rate, burst in buckets:
+        tokens, updated = states.get(key, (burst, now))
+        tokens = _refill(tokens, updated, rate, burst, now)
+        refilled[key] = tokens
+        if tokens < 1:
+            wait = max(wait, (1 - tokens) / rate)
+    if not wait:
+        refilled = {key: tokens - cost for key, tokens in refilled.items()}
+    return {key: (tokens, now) for key, tokens in refilled.items()}, wait
+
+
+class MemoryStore:
+    """Compartiments en mémoire : limite propre au processus (développement, worker unique)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._states = {}
+        self._calls = 0
+
+    def acquire(self, buckets, now, cost=1):
+        with self._lock:
+            new_states, wait = _take(self._states, buckets, now, cost)
+            self._states.update(new_states)
+            self._calls += 1
+            if self._calls % PURGE_EVERY == 0:
+                self._states = {k: v for k, v in self._states.items() if now - v[1] < IDLE_SECONDS}
+            return wait
+
+
+class SQLiteStore:
+    """
+    Compartiments dans un fichier SQLite local partagé par les workers Gunicorn du conteneur.
+    BEGIN IMMEDIATE sérialise les mises à jour entre processus : le décompte reste exact.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._calls = 0
+        with self._connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=5)
+
+    def _connection(self):
+        # Une connexion par thread et par processus (les connexions ne survivent pas au fork)
+        if getattr(self._local, 'pid', None) != os.getpid():
+            self._local.conn = self._connect()
+            self._local.conn.isolation_level = None
+            self._local.conn.execute('PRAGMA journal_mode=WAL')
+            self._local.pid = os.getpid()
+        return self._local.conn
+
+    def acquire(self, buckets, now, cost=1):
+        conn = self._connection()
+        keys = [key for key, _, _ in buckets]
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            rows = conn.execute(
+                f"SELECT key, tokens, updated FROM buckets WHERE key IN ({', '.join('?' * len(keys))})", keys
+            ).fetchall()
+            new_states, wait = _take({key: (tokens, updated) for key, tokens, updated in rows}, buckets, now, cost)
+            conn.executemany(
+                "INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)",
+                [(key, tokens, updated) for key, (tokens, updated) in new_states.items()]
+            )
+            self._calls += 1
+            if self._calls % PURGE_EVERY == 0:
+                conn.execute("DELETE FROM buckets WHERE updated < ?", (now - IDLE_SECONDS,))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return wait
+
+
+class RateLimiter:
+    """
+    Limitation par compartiments à jetons des vérifications d'identifiants, par nom d'utilisateur
+    et par IP cliente (X-Real-IP posé par nginx). Chaque login et chaque inscription est décompté ;
+    pour les autres requêtes avec mot de passe en paramètre (scripts), seuls les échecs (401, 403)
+    le sont, un script aux identifiants valides n'est donc jamais limité. Le refus (429 + Retry-After)
+    intervient avant la vue, donc avant tout calcul bcrypt.
+    Si RATE_LIMIT_STORAGE est défini, les compteurs sont partagés via ce fichier SQLite local.
+    """
+
+    def __init__(self, app=None):
+        self.store = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('RATE_LIMIT_ENABLED', True)
+        app.config.setdefault('RATE_LIMIT_PER_USER', '10/minute')
+        app.config.setdefault('RATE_LIMIT_PER_IP', '30/minute')
+        app.config.setdefault('RATE_LIMIT_STORAGE', None)
+        path = app.config['RATE_LIMIT_STORAGE']
+        self.store = SQLiteStore(path) if path else MemoryStore()
+        app.before_request(self.before_request)
+        app.after_request(self.after_request)
+
+    def _buckets(self):
+        config = current_app.config
+        buckets = []
+        ip = request.headers.get('X-Real-IP') or request.remote_addr
+        if ip:
+            buckets.append((f'ip:{ip}', *parse_rate(config['RATE_LIMIT_PER_IP'])))
+        username = request.args.get('username')
+        if username:
+            buckets.append((f'user:{username.lower()}', *parse_rate(config['RATE_LIMIT_PER_USER'])))
+        return buckets
+
+    def before_request(self):
+        if not current_app.config['RATE_LIMIT_ENABLED']:
+            return None
+        if request.endpoint in CREDENTIAL_ENDPOINTS:
+            cost = 1
+        elif 'password' in request.args:
+            # Échecs décomptés après la vue (after_request) : ici on vérifie seulement qu'il reste un jeton
+            cost = 0
+        else:
+            return None
+        buckets = self._buckets()
+        if not buckets:
+            return None
+        wait = self.store.acquire(buckets, time.time(), cost)
+        if not wait:
+            return None
+        response = jsonify({"msg": "Too many requests"})
+        response.status_code = 429
+        response.headers['Retry-After'] = str(math.ceil(wait))
+        return response
+
+    def after_request(self, response):
+        if (current_app.config['RATE_LIMIT_ENABLED'] and 'password' in request.args
+                and request.endpoint not in CREDENTIAL_ENDPOINTS and response.status_code in (401, 403)):
+            buckets = self._buckets()
+            if buckets:
+                self.store.acquire(buckets, time.time())
+        return response
@@ -0,0 +1,77 @@
+from functools import wraps
+import time
+
+from flask import g, request, has_request_context, current_app
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+
+# Nom du bind SQLAlchemy pointant vers le réplica en lecture (voir SQLALCHEMY_BINDS)
+REPLICA_BIND = 'replica'
+
+# Cookie posé après une écriture : le client relit sur le primaire tant qu'il est valide
+STICKY_COOKIE = 'db_primary_until'
+
+
+def read_only(view):
+    """
+    Décorateur pour les vues en lecture seule : leurs SELECT sont envoyés au réplica
+    (si configuré), sauf juste après une écriture du même client (read-your-writes).
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        g.read_only = True
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def _recent_write():
+    try:
+        return float(request.cookies.get(STICKY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+class RoutingSession(Session):
+    """
+    Session qui envoie les lectures des vues @read_only vers le bind "replica".
+    Tout le reste (écritures, flush, vues non marquées) reste sur le primaire.
+    """
+
+    def _use_replica(self, clause):
+        if not has_request_context() or not g.get('read_only'):
+            return False
+        if clause is None or not getattr(clause, 'is_select', False):
+            return False
+        # La session a déjà écrit dans cette requête, ou le client vient d'écrire
+        if self.info.get('wrote') or _recent_write():
+            return False
+        return REPLICA_BIND in self._db.engines
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and self._use_replica(clause):
+            return self._db.engines[REPLICA_BIND]
+        return super().get_bind(mapper, clause=clause, bind=bind, **kwargs)
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _mark_flush(session, flush_context):
+    session.info['wrote'] = True
+
+
+@event.listens_for(RoutingSession, 'do_orm_execute')
+def _mark_bulk_write(orm_execute_state):
+    # Écritures ensemblistes (insert/update/delete exécutés via session.execute)
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info['wrote'] = True
+
+
+def init_app(app, db):
+    """Pose le cookie read-your-writes sur les réponses des requêtes ayant écrit en base."""
+    app.config.setdefault('REPLICA_STICKY_SECONDS', 5)
+
+    @app.after_request
+    def stick_to_primary(response):
+        if REPLICA_BIND in current_app.config.get('SQLALCHEMY_BINDS', {}) and db.session().info.get('wrote'):
+            window = current_app.config['REPLICA_STICKY_SECONDS']
+            response.set_cookie(STICKY_COOKIE, str(time.time() + window), max_age=window, httponly=True, samesite='Lax')
+        return response
@@ -1,15 +1,28 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app, stream_with_context, send_file
 from datetime import datetime
-from app import db, bcrypt
-from app.models import User, List, Movie, ListItem
+from app import db, bcrypt, profiler
+from app.replica import read_only
+from app.query_budget import query_budget
+from app.models import User, List, Movie, ListItem, Job
+from app.services.bulk_import import BulkImporter, SECTIONS
+from app.services.export import iter_json, parse_since
+from app.services.json_stream import iter_object
+from app.services.snapshot import write_snapshot, stream_and_remove, save_upload, iter_snapshot, SNAPSHOT_MIMETYPE
+from app.services import leaderboard, recommendations, jobs, purge, duplicates
 from flask_jwt_extended import jwt_required, get_jwt_identity
-import sys
+from sqlalchemy import select
+import logging
 import os
+import json
+import shutil
+import uuid
 
 # Création d'un Blueprint pour regrouper les routes d'administration
 # Toutes les routes commenceront par /api/admin
 bp = Blueprint('admin', __name__, url_prefix='/api/admin')
 
+logger = logging.getLogger(__name__)
+
 def is_admin():
     """
     Vérifie si l'utilisateur connecté via JWT a le rôle d'administrateur.
@@ -20,6 +33,8 @@ def is_admin():
 
 @bp.route('/users', methods=['GET'])
 @jwt_required()
+@read_only
+@query_budget(1)
 def get_users():
     """
     Récupère la liste de tous les utilisateurs (sauf l'admin lui-même).
@@ -31,12 +46,13 @@ def get_users():
     try:
         # Récupération du nom d'utilisateur admin depuis les variables d'env pour l'exclure
         admin_username = os.environ.get('ADMIN_USERNAME', 'admin')
-        users = User.query.filter(User.username != admin_username).all()
+        # Nombre de listes calculé par la base (sous-requête corrélée) : une seule requête
+        list_count = db.select(db.func.count(List.id)).where(List.user_id == User.id).scalar_subquery()
+        users = db.session.query(User, list_count).filter(User.username != admin_username).all()
         result = []
         
         # Construction de la réponse JSON
-        for user in users:
-            list_count = List.query.filter_by(user_id=user.id).count()
+        for user, list_count in users:
             result.append({
                 "id": user.id,
                 "username": user.username,
@@ -45,7 +61,7 @@ def get_users():
             })
         return jsonify(result), 200
     except Exception as e:
-        print(f"Error fetching users: {str(e)}", file=sys.stderr)
+        logger.exception("Error fetching users")
         return jsonify({"msg": "Internal Server Error"}), 500
 
 @bp.route('/users/<int:user_id>', methods=['DELETE'])
@@ -59,17 +75,13 @@ def delete_user(user_id):
         return jsonify({"msg": "Unauthorized"}), 403
     
     try:
-        user = User.query.get(user_id)
-        if not user:
+        # Éléments de liste supprimés par paquets, listes et profil par cascade côté base
+        if not purge.purge_users(db.session, [user_id], current_app.config['PURGE_CHUNK_SIZE']):
             return jsonify({"msg": "User not found"}), 404
-        
-        # La suppression de l'utilisateur supprimera en cascade ses listes et profils
-        db.session.delete(user)
-        db.session.commit()
         return jsonify({"msg": "User deleted"}), 200
     except Exception as e:
         db.session.rollback()
-        print(f"Error deleting user: {str(e)}", file=sys.stderr)
+        logger.exception("Error deleting user")
         return jsonify({"msg": "Internal Server Error"}), 500
 
 @bp.route('/users/<int:user_id>', methods=['PUT'])
@@ -106,11 +118,13 @@ def update_user(user_id):
         return jsonify({"msg": "User updated"}), 200
     except Exception as e:
         db.session.rollback()
-        print(f"Error updating user: {str(e)}", file=sys.stderr)
+        logger.exception("Error updating user")
         return jsonify({"msg": "Internal Server Error"}), 500
 
 @bp.route('/movies/custom', methods=['GET'])
 @jwt_required()
+@read_only
+@query_budget(1)
 def get_custom_movies():
     """
     Récupère la liste des films ajoutés manuellement par les utilisateurs (is_custom=True).
@@ -129,6 +143,138 @@ def get_custom_movies():
         })
     return jsonify(results)
 
+@bp.route('/movies/duplicates', methods=['GET'])
+@jwt_required()
+@read_only
+@query_budget(2)
+def get_duplicate_movies():
+    """
+    File de modération des doublons : regroupe les films personnalisés dont les titres sont
+    presque identiques ("Inception ", "inception (2010)", "Incepton"), avec les films du
+    catalogue qu'ils doublonnent. Chaque membre indique le nombre d'éléments de liste qui le
+    référencent ; le film canonique proposé est celui du catalogue, sinon le plus utilisé.
+    ---
+    tags:
+      - Admin
+    parameters:
+      - name: threshold
+        in: query
+        type: number
+        description: Similarité minimale des titres (0-1, défaut 0.7)
+    security:
+      - Bearer: []
+    responses:
+      200:
+        description: Groupes de doublons, les plus utilisés d'abord
+    """
+    if not is_admin():
+        return jsonify({"msg": "Unauthorized"}), 403
+
+    threshold = request.args.get('threshold', duplicates.DEFAULT_THRESHOLD, type=float)
+    if not 0 < threshold <= 1:
+        return jsonify({"msg": "threshold must be between 0 and 1"}), 400
+
+    movies = {m.id: m for m in Movie.query.all()}
+    clusters = [
+        members for members in duplicates.find_clusters(
+            ((m.id, m.title, m.release_date) for m in movies.values()), threshold
+        )
+        if any(movies[movie_id].is_custom for movie_id in members)
+    ]
+    counts = duplicates.item_counts(db.session, [movie_id for members in clusters for movie_id in members])
+
+    results = []
+    for members in clusters:
+        ordered = sorted(members, key=lambda movie_id: (movies[movie_id].is_custom, -counts.get(movie_id, 0), movie_id))
+        results.append({
+            "canonical": ordered[0],
+            "item_count": sum(counts.get(movie_id, 0) for movie_id in members),
+            "members": [{
+                "id": movie_id,
+                "title": movies[movie_id].title,
+                "release_date": movies[movie_id].release_date,
+                "is_custom": movies[movie_id].is_custom,
+                "item_count": counts.get(movie_id, 0),
+                "similarity": members[movie_id],
+            } for movie_id in ordered],
+        })
+    results.sort(key=lambda cluster: (-cluster["item_count"], cluster["canonical"]))
+    return jsonify({"clusters": results}), 200
+
+@bp.route('/movies/merge', methods=['POST'])
+@jwt_required()
+def merge_movies():
+    """
+    Fusionne des films personnalisés en double dans un film canonique : tous les éléments de
+    liste sont repointés en une requête (les doublons dans une même liste sont supprimés en
+    gardant le mieux classé), puis les doublons sont supprimés.
+    ---
+    tags:
+      - Admin
+    parameters:
+      - name: body
+        in: body
+        required: true
+        schema:
+          type: object
+          properties:
+            canonical:
+              type: integer
+            duplicates:
+              type: array
+              items:
+                type: integer
+    security:
+      - Bearer: []
+    responses:
+      200:
+        description: Fusion effectuée
+      400:
+        description: Corps invalide
+      403:
+        description: Un doublon est un film du catalogue
+      404:
+        description: Film introuvable
+    """
+    if not is_admin():
+        return jsonify({"msg": "Unauthorized"}), 403
+
+    data = request.get_json(silent=True) or {}
+    canonical_id = data.get('canonical')
+    duplicate_ids = data.get('duplicates') or []
+    if not isinstance(canonical_id, int) or not isinstance(duplicate_ids, list) \
+            or not duplicate_ids or not all(isinstance(i, int) for i in duplicate_ids):
+        return jsonify({"msg": "'canonical' (id) and 'duplicates' (list of ids) are required"}), 400
+    duplicate_ids = sorted(set(duplicate_ids) - {canonical_id})
+    if not duplicate_ids:
+        return jsonify({"msg": "Nothing to merge"}), 400
+
+    try:
+        found = {m.id: m for m in Movie.query.filter(Movie.id.in_([canonical_id] + duplicate_ids)).all()}
+        missing = [movie_id for movie_id in [canonical_id] + duplicate_ids if movie_id not in found]
+        if missing:
+            return jsonify({"msg": "Movie not found", "ids": missing}), 404
+        # Sécurité : seuls les films custom peuvent disparaître dans une fusion
+        if any(not found[movie_id].is_custom for movie_id in duplicate_ids):
+            return jsonify({"msg": "Forbidden - Cannot merge away system movies"}), 403
+
+        moved, removed = duplicates.merge(db.session, canonical_id, duplicate_ids)
+        # Les doublons ne sont plus référencés : suppression avec pierres tombales pour l'export incrémental,
+        # validée avec la fusion (un échec annule tout, jamais d'éléments repointés vers des doublons restants)
+        deleted = purge.purge_movies(db.session, duplicate_ids, current_app.config['PURGE_CHUNK_SIZE'], commit=False)
+        db.session.commit()
+        return jsonify({
+            "msg": "Movies merged",
+            "canonical": canonical_id,
+            "items_moved": moved,
+            "items_removed": removed,
+            "movies_deleted": deleted,
+        }), 200
+    except Exception as e:
+        db.session.rollback()
+        logger.exception("Error merging movies")
+        return jsonify({"msg": "Internal Server Error"}), 500
+
 @bp.route('/movies/<int:movie_id>', methods=['DELETE'])
 @jwt_required()
 def delete_movie(movie_id):
@@ -139,14 +285,15 @@ def delete_movie(movie_id):
     if not is_admin():
         return jsonify({"msg": "Unauthorized"}), 403
         
-    movie = Movie.query.get(movie_id)
-    if not movie:
-        return jsonify({"msg": "Movie not found"}), 404
-        
-    db.session.delete(movie)
-    db.session.commit()
-    
-    return jsonify({"msg": "Movie deleted"}), 200
+    try:
+        # Les éléments de liste qui le référencent sont supprimés par paquets avant le film
+        if not purge.purge_movies(db.session, [movie_id], current_app.config['PURGE_CHUNK_SIZE']):
+            return jsonify({"msg": "Movie not found"}), 404
+        return jsonify({"msg": "Movie deleted"}), 200
+    except Exception as e:
+        db.session.rollback()
+        logger.exception("Error deleting movie")
+        return jsonify({"msg": "Internal Server Error"}), 500
 
 @bp.route('/users/name/<string:target_username>', methods=['DELETE'])
 @jwt_required(optional=True)
@@ -209,12 +356,11 @@ def delete_user_by_name(target_username):
         if user.username == admin_user_env:
              return jsonify({"msg": "Cannot delete admin user"}), 400
 
-        db.session.delete(user)
-        db.session.commit()
+        purge.purge_users(db.session, [user.id], current_app.config['PURGE_CHUNK_SIZE'])
         return jsonify({"msg": f"User {target_username} deleted"}), 200
     except Exception as e:
         db.session.rollback()
-        print(f"Error deleting user: {str(e)}", file=sys.stderr)
+        logger.exception("Error deleting user")
         return jsonify({"msg": "Internal Server Error"}), 500
 
 @bp.route('/movies/title/<string:target_title>', methods=['DELETE'])
@@ -276,13 +422,79 @@ def delete_movie_by_title(target_title):
         if not movie.is_custom:
             return jsonify({"msg": "Forbidden - Cannot delete system movies"}), 403
             
-        db.session.delete(movie)
-        db.session.commit()
+        title = movie.title
+        purge.purge_movies(db.session, [movie.id], current_app.config['PURGE_CHUNK_SIZE'])
         
-        return jsonify({"msg": f"Movie '{movie.title}' deleted"}), 200
+        return jsonify({"msg": f"Movie '{title}' deleted"}), 200
+    except Exception as e:
+        db.session.rollback()
+        logger.exception("Error deleting movie")
+        return jsonify({"msg": "Internal Server Error"}), 500
+
+@bp.route('/bulk-delete', methods=['POST'])
+@jwt_required()
+def bulk_delete():
+    """
+    Supprime en une requête de nombreux utilisateurs, films et/ou listes par ID.
+    Les éléments de liste sont supprimés par paquets de PURGE_CHUNK_SIZE, chacun dans sa
+    propre transaction : une purge volumineuse ne bloque pas les autres écritures.
+    ---
+    tags:
+      - Admin
+    parameters:
+      - name: body
+        in: body
+        required: true
+        schema:
+          type: object
+          properties:
+            users:
+              type: array
+              items:
+                type: integer
+            movies:
+              type: array
+              items:
+                type: integer
+            lists:
+              type: array
+              items:
+                type: integer
+    security:
+      - Bearer: []
+    responses:
+      200:
+        description: Nombre de lignes supprimées par type
+      400:
+        description: Corps invalide
+    """
+    if not is_admin():
+        return jsonify({"msg": "Unauthorized"}), 403
+
+    data = request.get_json(silent=True) or {}
+    ids = {}
+    for key in ('users', 'lists', 'movies'):
+        values = data.get(key) or []
+        if not isinstance(values, list) or not all(isinstance(v, int) and not isinstance(v, bool) for v in values):
+            return jsonify({"msg": f"'{key}' must be a list of integer ids"}), 400
+        ids[key] = sorted(set(values))
+    if not any(ids.values()):
+        return jsonify({"msg": "No ids provided"}), 400
+
+    try:
+        # Le compte administrateur n'est jamais supprimé
+        admin_username = os.environ.get('ADMIN_USERNAME', 'admin')
+        admin_ids = set(db.session.scalars(select(User.id).where(User.username == admin_username)))
+        chunk_size = current_app.config['PURGE_CHUNK_SIZE']
+        deleted = {
+            "users": purge.purge_users(db.session, [i for i in ids['users'] if i not in admin_ids], chunk_size),
+            "lists": purge.purge_lists(db.session, ids['lists'], chunk_size),
+            "movies": purge.purge_movies(db.session, ids['movies'], chunk_size),
+        }
+        return jsonify({"msg": "Bulk delete done", "deleted": deleted}), 200
     except Exception as e:
         db.session.rollback()
-        print(f"Error deleting movie: {str(e)}", file=sys.stderr)
+        logger.exception("Error during bulk delete")
         return jsonify({"msg": "Internal Server Error"}), 500
 
 @bp.route('/export', methods=['GET'])
@@ -303,11 +515,22 @@ def export_data():
         in: query
         type: string
         required: true
+      - name: since
+        in: query
+        type: string
+        description: Date ISO 8601 - n'exporte que les lignes modifiées ou supprimées depuis (sauvegarde incrémentale)
+      - name: format
+        in: query
+        type: string
+        enum: [json, sqlite]
+        description: sqlite renvoie un fichier SQLite autonome (restauration rapide, requêtable hors ligne)
     security:
       - Bearer: []
     responses:
       200:
-        description: Fichier JSON complet des données
+        description: Fichier JSON (ou SQLite) complet des données (ou delta si since est fourni)
+      400:
+        description: Paramètre since invalide
     """
     username = request.args.get('username')
     password = request.args.get('password')
@@ -323,184 +546,394 @@ def export_data():
     current_user = get_jwt_identity()
     if not is_direct_admin and current_user != "admin":
         return jsonify({"msg": "Unauthorized"}), 403
+
+    since = None
+    if request.args.get('since'):
+        try:
+            since = parse_since(request.args.get('since'))
+        except ValueError:
+            return jsonify({"msg": "Invalid since timestamp"}), 400
+    
+    if request.args.get('format') == 'sqlite':
+        try:
+            path = write_snapshot(db.session, since, chunk_size=current_app.config.get('IMPORT_CHUNK_SIZE', 1000))
+        except Exception as e:
+            logger.exception("Error exporting snapshot")
+            return jsonify({"msg": "Internal Server Error"}), 500
+        # Le fichier est envoyé par blocs puis supprimé à la fermeture de la réponse
+        filename = f"backup_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.sqlite"
+        return stream_and_remove(
+            current_app.response_class,
+            path,
+            mimetype=SNAPSHOT_MIMETYPE,
+            headers={"Content-Disposition": f"attachment; filename={filename}"}
+        )
+
+    # Réponse générée au fil de l'eau (compressée si le client l'accepte)
+    # Une erreur en cours d'export tronque le document, ce qui le rend invalide à l'import
+    return current_app.response_class(
+        stream_with_context(iter_json(db.session, since)),
+        mimetype='application/json'
+    ), 200
+
+@bp.route('/import', methods=['POST'])
+@jwt_required()
+def import_data():
+    """
+    Importe les données depuis un fichier JSON (export complet ou delta produit avec since=...)
+    ou depuis un snapshot SQLite (format=sqlite).
+    Le corps de la requête est lu de façon incrémentale (mémoire bornée) et les
+    lignes sont insérées par paquets. Les éléments déjà présents sont détectés par
+    requêtes groupées et les relations sont reconstruites via des tables de
+    correspondance compactes (Ancien ID -> Nouvel ID).
+    """
+    if not is_admin():
+        return jsonify({"msg": "Unauthorized"}), 403
     
+    if request.args.get('format') == 'sqlite' or request.mimetype == SNAPSHOT_MIMETYPE:
+        return import_snapshot()
+
     try:
-        # --- Export des Utilisateurs ---
-        users = User.query.all()
-        users_data = []
-        for u in users:
-            users_data.append({
-                "id": u.id,
-                "username": u.username,
-                "password_hash": u.password_hash, # Export du hash pour pouvoir restaurer à l'identique
-                "created_at": u.created_at.isoformat()
-            })
+        importer = BulkImporter(db.session, chunk_size=current_app.config.get('IMPORT_CHUNK_SIZE', 1000))
+        has_data = False
+        for key, value in iter_object(request.stream):
+            has_data = True
+            if key == 'since' and value:
+                # Fichier delta : les lignes existantes sont mises à jour au lieu d'être ignorées
+                importer.update_existing = True
+            if key in SECTIONS:
+                importer.feed(key, value)
+        if not has_data:
+             return jsonify({"msg": "No data provided"}), 400
+        importer.finish()
 
-        # --- Export des Films ---
-        movies = Movie.query.all()
-        movies_data = []
-        for m in movies:
-            movies_data.append({
-                "id": m.id,
-                "title": m.title,
-                "poster_path": m.poster_path,
-                "release_date": m.release_date,
-                "is_custom": m.is_custom
-            })
+        db.session.commit()
+        counts = importer.counts
+        return jsonify({"msg": "Import successful", "details": f"Processed {counts['users']} users, {counts['movies']} movies, {counts['lists']} lists"}), 200
 
-        # --- Export des Listes ---
-        lists = List.query.all()
-        lists_data = []
-        for l in lists:
-            lists_data.append({
-                "id": l.id,
-                "user_id": l.user_id,
-                "name": l.name,
-                "public_id": l.public_id,
-                "private_id": l.private_id,
-                "is_public": l.is_public,
-                "created_at": l.created_at.isoformat()
-            })
+    except ValueError as e:
+        db.session.rollback()
+        logger.warning("Invalid import file: %s", e)
+        return jsonify({"msg": "Invalid import file"}), 400
+    except Exception as e:
+        db.session.rollback()
+        logger.exception("Error importing data")
+        return jsonify({"msg": "Internal Server Error"}), 500
 
-        # --- Export des Éléments de Liste ---
-        from app.models import ListItem
-        list_items = ListItem.query.all()
-        list_items_data = []
-        for li in list_items:
-            list_items_data.append({
-                "id": li.id,
-                "list_id": li.list_id,
-                "movie_id": li.movie_id,
-                "rank": li.rank,
-                "comment": li.comment
-            })
+def import_snapshot():
+    """
+    Restaure un snapshot SQLite produit par /export?format=sqlite.
+    Le fichier est recopié sur disque par blocs puis relu table par table : aucune
+    analyse JSON, les lignes sont copiées par paquets via BulkImporter.
+    """
+    path = None
+    try:
+        path = save_upload(request.stream)
+        meta, sections = iter_snapshot(path)
+        importer = BulkImporter(
+            db.session,
+            chunk_size=current_app.config.get('IMPORT_CHUNK_SIZE', 1000),
+            update_existing=bool(meta.get('since'))
+        )
+        for name, rows in sections:
+            importer.feed(name, rows)
+        importer.finish()
 
-        # Construction de l'objet final
-        export_data = {
-            "users": users_data,
-            "movies": movies_data,
-            "lists": lists_data,
-            "list_items": list_items_data,
-            "version": "1.0",
-            "exported_at": datetime.utcnow().isoformat()
-        }
+        db.session.commit()
+        counts = importer.counts
+        return jsonify({"msg": "Import successful", "details": f"Processed {counts['users']} users, {counts['movies']} movies, {counts['lists']} lists"}), 200
+
+    except ValueError as e:
+        db.session.rollback()
+        logger.warning("Invalid import file: %s", e)
+        return jsonify({"msg": "Invalid import file"}), 400
+    except Exception as e:
+        db.session.rollback()
+        logger.exception("Error importing snapshot")
+        return jsonify({"msg": "Internal Server Error"}), 500
+    finally:
+        if path:
+            os.remove(path)
 
-        return jsonify(export_data), 200
+@bp.route('/leaderboard/rebuild', methods=['POST'])
+@jwt_required()
+def rebuild_leaderboard():
+    """
+    Reconstruit entièrement le classement des films (table movie_scores).
+    Normalement inutile : il est maintenu à chaque écriture et reconstruit périodiquement.
+    """
+    if not is_admin():
+        return jsonify({"msg": "Unauthorized"}), 403
 
+    try:
+        leaderboard.rebuild(db.session)
+        return jsonify({"msg": "Leaderboard rebuilt"}), 200
     except Exception as e:
-        print(f"Error exporting data: {str(e)}", file=sys.stderr)
+        db.session.rollback()
+        logger.exception("Error rebuilding leaderboard")
         return jsonify({"msg": "Internal Server Error"}), 500
 
-@bp.route('/import', methods=['POST'])
+@bp.route('/recommendations/rebuild', methods=['POST'])
 @jwt_required()
-def import_data():
+def rebuild_recommendations():
     """
-    Importe les données depuis un fichier JSON.
-    Gère les conflits en vérifiant si les éléments existent déjà.
-    Reconstruit les relations via des dictionnaires de mapping (Ancien ID -> Nouvel ID).
+    Recalcule les films voisins utilisés par les recommandations (table movie_neighbors).
     """
     if not is_admin():
         return jsonify({"msg": "Unauthorized"}), 403
-    
+
     try:
-        data = request.get_json()
-        if not data:
-             return jsonify({"msg": "No data provided"}), 400
+        pairs = recommendations.build(db.session)
+        return jsonify({"msg": "Recommendations rebuilt", "pairs": pairs}), 200
+    except Exception as e:
+        db.session.rollback()
+        logger.exception("Error building recommendations")
+        return jsonify({"msg": "Internal Server Error"}), 500
 
-        # Dictionnaires pour mapper les anciens IDs (du fichier import) vers les nouveaux IDs (base actuelle)
-        user_map = {}
-        movie_map = {}
-        list_map = {}
-
-        # --- Import des Utilisateurs ---
-        users_data = data.get('users', [])
-        for u_data in users_data:
-            existing = User.query.filter_by(username=u_data['username']).first()
-            if existing:
-                user_map[u_data['id']] = existing.id # On garde l'ID existant
-            else:
-                new_user = User(
-                    username=u_data['username'],
-                    password_hash=u_data['password_hash'], 
-                    created_at=datetime.fromisoformat(u_data['created_at']) if u_data.get('created_at') else datetime.utcnow()
-                )
-                db.session.add(new_user)
-                db.session.flush() # Flush pour récupérer le nouvel ID généré
-                user_map[u_data['id']] = new_user.id
-        
-        # --- Import des Films ---
-        movies_data = data.get('movies', [])
-        for m_data in movies_data:
-            existing = Movie.query.filter(Movie.title.ilike(m_data['title'])).first()
-            if existing:
-                movie_map[m_data['id']] = existing.id
-            else:
-                new_movie = Movie(
-                    title=m_data['title'],
-                    poster_path=m_data.get('poster_path'),
-                    release_date=m_data.get('release_date'),
-                    is_custom=m_data.get('is_custom', True)
-                )
-                db.session.add(new_movie)
-                db.session.flush()
-                movie_map[m_data['id']] = new_movie.id
-
-        # --- Import des Listes ---
-        lists_data = data.get('lists', [])
-        for l_data in lists_data:
-            old_user_id = l_data['user_id']
-            # Si le propriétaire n'a pas pu être importé/trouvé, on ignore la liste
-            if old_user_id not in user_map:
-                continue 
-
-            new_owner_id = user_map[old_user_id]
-            
-            # On vérifie par public_id si la liste existe déjà
-            existing = List.query.filter_by(public_id=l_data['public_id']).first()
-            if existing:
-                list_map[l_data['id']] = existing.id
-            else:
-                new_list = List(
-                    user_id=new_owner_id,
-                    name=l_data['name'],
-                    public_id=l_data.get('public_id'),
-                    private_id=l_data.get('private_id'),
-                    is_public=l_data.get('is_public', True),
-                    created_at=datetime.fromisoformat(l_data['created_at']) if l_data.get('created_at') else datetime.utcnow()
-                )
-                db.session.add(new_list)
-                db.session.flush()
-                list_map[l_data['id']] = new_list.id
-
-        # --- Import des Éléments de Liste ---
-        from app.models import ListItem
-        list_items_data = data.get('list_items', [])
-        for li_data in list_items_data:
-            old_list_id = li_data['list_id']
-            old_movie_id = li_data['movie_id']
-
-            # Vérification que la liste et le film existent bien dans le nouveau contexte
-            if old_list_id not in list_map or old_movie_id not in movie_map:
-                continue
-            
-            new_list_id = list_map[old_list_id]
-            new_movie_id = movie_map[old_movie_id]
-
-            # On évite les doublons dans la liste
-            existing_item = ListItem.query.filter_by(list_id=new_list_id, movie_id=new_movie_id).first()
-            if not existing_item:
-                new_item = ListItem(
-                    list_id=new_list_id,
-                    movie_id=new_movie_id,
-                    rank=li_data.get('rank', 0),
-                    comment=li_data.get('comment')
-                )
-                db.session.add(new_item)
+@bp.route('/jobs/import', methods=['POST'])
+@jwt_required()
+def submit_import_job():
+    """
+    Import en arrière-plan : le fichier (JSON ou snapshot SQLite, comme /import) est enregistré
+    sur disque et la réponse est immédiate. Suivi via GET /api/admin/jobs/<id>.
+    ---
+    tags:
+      - Admin
+    parameters:
+      - name: format
+        in: query
+        type: string
+        enum: [json, sqlite]
+    security:
+      - Bearer: []
+    responses:
+      202:
+        description: Tâche enregistrée
+      400:
+        description: Fichier vide ou snapshot invalide
+    """
+    if not is_admin():
+        return jsonify({"msg": "Unauthorized"}), 403
 
-        db.session.commit()
-        return jsonify({"msg": "Import successful", "details": f"Processed {len(users_data)} users, {len(movies_data)} movies, {len(lists_data)} lists"}), 200
+    fmt = 'sqlite' if request.args.get('format') == 'sqlite' or request.mimetype == SNAPSHOT_MIMETYPE else 'json'
+    runner = current_app.extensions['jobs']
+    job_id = str(uuid.uuid4())
+    path = jobs.input_path(current_app.config['JOBS_DIR'], job_id)
+    try:
+        if fmt == 'sqlite':
+            shutil.move(save_upload(request.stream), path)
+        else:
+            with open(path, 'wb') as target:
+                shutil.copyfileobj(request.stream, target)
+        if not os.path.getsize(path):
+            os.remove(path)
+            return jsonify({"msg": "No data provided"}), 400
+        jobs.submit(db.session, 'import', {"format": fmt}, job_id=job_id)
+    except ValueError as e:
+        logger.warning("Invalid import file: %s", e)
+        return jsonify({"msg": "Invalid import file"}), 400
+    except Exception as e:
+        db.session.rollback()
+        if os.path.exists(path):
+            os.remove(path)
+        logger.exception("Error submitting import job")
+        return jsonify({"msg": "Internal Server Error"}), 500
+
+    runner.wake()
+    return jsonify({"msg": "Import job submitted", "id": job_id}), 202, {"Location": f"/api/admin/jobs/{job_id}"}
+
+@bp.route('/jobs/export', methods=['POST'])
+@jwt_required()
+def submit_export_job():
+    """
+    Export en arrière-plan (mêmes paramètres que /export). Le fichier produit est
+    téléchargeable via GET /api/admin/jobs/<id>/result une fois la tâche terminée.
+    ---
+    tags:
+      - Admin
+    parameters:
+      - name: since
+        in: query
+        type: string
+      - name: format
+        in: query
+        type: string
+        enum: [json, sqlite]
+    security:
+      - Bearer: []
+    responses:
+      202:
+        description: Tâche enregistrée
+      400:
+        description: Paramètre since invalide
+    """
+    if not is_admin():
+        return jsonify({"msg": "Unauthorized"}), 403
 
+    params = {"format": 'sqlite' if request.args.get('format') == 'sqlite' else 'json'}
+    if request.args.get('since'):
+        try:
+            params["since"] = parse_since(request.args.get('since')).isoformat()
+        except ValueError:
+            return jsonify({"msg": "Invalid since timestamp"}), 400
+
+    try:
+        job_id = jobs.submit(db.session, 'export', params)
     except Exception as e:
         db.session.rollback()
-        print(f"Error importing data: {str(e)}", file=sys.stderr)
+        logger.exception("Error submitting export job")
         return jsonify({"msg": "Internal Server Error"}), 500
+
+    current_app.extensions['jobs'].wake()
+    return jsonify({"msg": "Export job submitted", "id": job_id}), 202, {"Location": f"/api/admin/jobs/{job_id}"}
+
+@bp.route('/jobs', methods=['GET'])
+@jwt_required()
+@query_budget(1)
+def get_jobs():
+    """
+    Liste les tâches les plus récentes (50 par défaut).
+    ---
+    tags:
+      - Admin
+    security:
+      - Bearer: []
+    """
+    if not is_admin():
+        return jsonify({"msg": "Unauthorized"}), 403
+
+    limit = min(request.args.get('limit', 50, type=int), 500)
+    recent = Job.query.order_by(Job.created_at.desc()).limit(limit).all()
+    return jsonify([jobs.to_dict(job) for job in recent]), 200
+
+@bp.route('/jobs/<string:job_id>', methods=['GET'])
+@jwt_required()
+@query_budget(1)
+def get_job(job_id):
+    """
+    État d'une tâche : statut, lignes traitées par section, résultat ou erreur.
+    Lu en base, donc disponible depuis n'importe quel worker.
+    ---
+    tags:
+      - Admin
+    security:
+      - Bearer: []
+    responses:
+      200:
+        description: État de la tâche
+      404:
+        description: Tâche introuvable
+    """
+    if not is_admin():
+        return jsonify({"msg": "Unauthorized"}), 403
+
+    job = db.session.get(Job, job_id)
+    if not job:
+        return jsonify({"msg": "Job not found"}), 404
+    return jsonify(jobs.to_dict(job)), 200
+
+@bp.route('/jobs/<string:job_id>/result', methods=['GET'])
+@jwt_required()
+@query_budget(1)
+def get_job_result(job_id):
+    """
+    Télécharge le fichier produit par une tâche d'export terminée.
+    ---
+    tags:
+      - Admin
+    security:
+      - Bearer: []
+    responses:
+      200:
+        description: Fichier d'export (JSON ou SQLite)
+      404:
+        description: Tâche introuvable
+      409:
+        description: Tâche non terminée ou sans fichier résultat
+    """
+    if not is_admin():
+        return jsonify({"msg": "Unauthorized"}), 403
+
+    job = db.session.get(Job, job_id)
+    if not job:
+        return jsonify({"msg": "Job not found"}), 404
+    if job.kind != 'export' or job.status != jobs.SUCCEEDED:
+        return jsonify({"msg": f"No result available (status: {job.status})"}), 409
+
+    fmt = json.loads(job.params or '{}').get('format', 'json')
+    path = jobs.result_path(current_app.config['JOBS_DIR'], job.id, fmt)
+    if not os.path.exists(path):
+        return jsonify({"msg": "Result file not found"}), 404
+    filename = f"backup_{job.created_at.strftime('%Y%m%d_%H%M%S')}.{fmt}"
+    return send_file(path, mimetype=jobs.RESULT_MIMETYPES[fmt], as_attachment=True, download_name=filename)
+
+# Critères de tri acceptés pour le résumé texte d'un profil
+PROFILE_SORTS = ('cumulative', 'tottime', 'calls')
+
+@bp.route('/profiles', methods=['GET'])
+@jwt_required()
+def get_profiles():
+    """
+    Liste les profils de requêtes conservés (du plus récent au plus ancien).
+    Une requête de l'admin portant l'en-tête X-Profile: 1 est profilée ; l'ID du profil est
+    renvoyé dans l'en-tête X-Profile-ID de sa réponse.
+    ---
+    tags:
+      - Admin
+    security:
+      - Bearer: []
+    responses:
+      200:
+        description: Métadonnées des profils (endpoint, statut, durée, requêtes SQL, ID de requête)
+    """
+    if not is_admin():
+        return jsonify({"msg": "Unauthorized"}), 403
+    return jsonify(profiler.profiles()), 200
+
+@bp.route('/profiles/<string:profile_id>', methods=['GET'])
+@jwt_required()
+def get_profile(profile_id):
+    """
+    Télécharge un profil au format pstats (cProfile : python -m pstats, snakeviz, gprof2dot),
+    ou son résumé texte avec format=text.
+    ---
+    tags:
+      - Admin
+    security:
+      - Bearer: []
+    parameters:
+      - name: format
+        in: query
+        type: string
+        enum: [pstats, text]
+        default: pstats
+      - name: sort
+        in: query
+        type: string
+        enum: [cumulative, tottime, calls]
+        default: cumulative
+        description: Tri du résumé texte
+      - name: limit
+        in: query
+        type: integer
+        default: 50
+        description: Nombre de fonctions du résumé texte
+    responses:
+      200:
+        description: Profil
+      404:
+        description: Profil introuvable (ou supprimé du tampon)
+    """
+    if not is_admin():
+        return jsonify({"msg": "Unauthorized"}), 403
+
+    path = profiler.path(profile_id)
+    if not path:
+        return jsonify({"msg": "Profile not found"}), 404
+    if request.args.get('format') == 'text':
+        sort = request.args.get('sort', 'cumulative')
+        if sort not in PROFILE_SORTS:
+            return jsonify({"msg": f"sort must be one of {', '.join(PROFILE_SORTS)}"}), 400
+        limit = min(request.args.get('limit', 50, type=int), 1000)
+        return current_app.response_class(profiler.report(path, sort, limit), content_type='text/plain; charset=utf-8')
+    return send_file(path, mimetype='application/octet-stream', as_attachment=True, download_name=f'{profile_id}.prof')
@@ -3,12 +3,14 @@ from app import db, bcrypt
 from app.models import User
 from flask_jwt_extended import create_access_token
 from sqlalchemy.exc import IntegrityError
-import sys
+import logging
 import os
 
 # Blueprint pour l'authentification
 bp = Blueprint('auth', __name__, url_prefix='/api/auth')
 
+logger = logging.getLogger(__name__)
+
 @bp.route('/register', methods=['POST'])
 def register():
     """
@@ -37,8 +39,9 @@ def register():
         description: Nom d'utilisateur déjà pris
     """
     try:
-        print(f"Register attempt for: {request.args.get('username')}", file=sys.stderr)
-        
+        # Journal volumineux (une ligne par tentative) : échantillonné
+        logger.info("Register attempt", extra={"username": request.args.get('username'), "sample": True})
+
         username = request.args.get('username')
         password = request.args.get('password')
 
@@ -56,12 +59,12 @@ def register():
         db.session.add(new_user)
         db.session.commit()
         
-        print(f"User {username} created successfully", file=sys.stderr)
+        logger.info("User created", extra={"username": username})
         return jsonify({"msg": "User created successfully"}), 201
         
     except Exception as e:
         db.session.rollback()
-        print(f"Error during registration: {str(e)}", file=sys.stderr)
+        logger.exception("Error during registration")
         return jsonify({"msg": "Internal Server Error", "error": str(e)}), 500
 
 @bp.route('/login', methods=['POST'])
@@ -125,5 +128,5 @@ def login():
 
         return jsonify({"msg": "Bad username or password"}), 401
     except Exception as e:
-        print(f"Error during login: {str(e)}", file=sys.stderr)
+        logger.exception("Error during login")
         return jsonify({"msg": "Internal Server Error"}), 500
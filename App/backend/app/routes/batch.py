@@ -0,0 +1,357 @@
+from flask import Blueprint, request, jsonify, current_app
+from app import db, bcrypt, events
+from app.models import User, List, ListItem, Movie
+from app.routes.lists import item_to_dict
+from app.services import purge
+from flask_jwt_extended import jwt_required, get_jwt_identity
+import logging
+
+# Blueprint de l'API par lots : plusieurs opérations sur les listes et les films en une requête,
+# une authentification et un seul commit (pour les scripts d'automatisation)
+bp = Blueprint('batch', __name__, url_prefix='/api')
+
+logger = logging.getLogger(__name__)
+
+
+class OperationError(Exception):
+    """Échec d'une opération du lot : message et code HTTP renvoyés dans son résultat."""
+
+    def __init__(self, msg, status=400):
+        super().__init__(msg)
+        self.msg = msg
+        self.status = status
+
+
+class Batch:
+    """
+    État partagé par les opérations d'un lot : utilisateur authentifié, listes déjà
+    résolues et prochain rang libre de chaque liste (une requête par liste, pas par ajout),
+    évènements à diffuser aux pages ouvertes une fois le lot validé.
+    """
+
+    def __init__(self, session, user_id):
+        self.session = session
+        self.user_id = user_id
+        self.events = []
+        self._lists = {}
+        self._next_rank = {}
+
+    def forget(self):
+        """Oublie l'état mis en cache (après annulation d'une opération, ses objets ne sont plus valides)."""
+        self._lists.clear()
+        self._next_rank.clear()
+
+    def find_list(self, args):
+        """Liste désignée par son ID privé ("private_id") ou par le nom d'une liste de l'utilisateur ("list")."""
+        if args.get('private_id'):
+            key = ('private_id', args['private_id'])
+            criteria = {"private_id": args['private_id']}
+        elif args.get('list'):
+            key = ('name', args['list'])
+            criteria = {"user_id": self.user_id, "name": args['list']}
+        else:
+            raise OperationError("list or private_id required")
+        movie_list = self._lists.get(key)
+        if movie_list is None:
+            movie_list = List.query.filter_by(**criteria).first()
+            if not movie_list:
+                raise OperationError("List not found", 404)
+            self._lists[key] = movie_list
+        return movie_list
+
+    def next_rank(self, movie_list):
+        if movie_list.id not in self._next_rank:
+            max_rank = self.session.query(db.func.max(ListItem.rank)).filter_by(list_id=movie_list.id).scalar() or 0
+            self._next_rank[movie_list.id] = max_rank + 1
+        rank = self._next_rank[movie_list.id]
+        self._next_rank[movie_list.id] += 1
+        return rank
+
+    def find_item(self, movie_list, args):
+        """Élément de la liste désigné par son ID ("item_id") ou par le titre du film ("movie_title")."""
+        if args.get('item_id'):
+            item = self.session.get(ListItem, args['item_id'])
+            if not item or item.list_id != movie_list.id:
+                item = None
+        elif args.get('movie_title'):
+            item = (ListItem.query.join(Movie)
+                    .filter(ListItem.list_id == movie_list.id, Movie.title.ilike(args['movie_title'])).first())
+        else:
+            raise OperationError("item_id or movie_title required")
+        if not item:
+            raise OperationError("Item not found in this list", 404)
+        return item
+
+    def find_movie(self, args):
+        if args.get('movie_id'):
+            movie = self.session.get(Movie, args['movie_id'])
+            if not movie and args.get('title'):
+                # Comme l'ajout par ID : le film inconnu est créé (ID TMDB fourni par le client)
+                movie = Movie(id=args['movie_id'], title=args['title'], poster_path=args.get('poster_path'))
+                self.session.add(movie)
+        elif args.get('movie_title'):
+            movie = Movie.query.filter(Movie.title.ilike(args['movie_title'])).first()
+        else:
+            raise OperationError("movie_id or movie_title required")
+        if not movie:
+            raise OperationError("Movie not found", 404)
+        return movie
+
+    def publish(self, movie_list, event_type, data):
+        self.events.append((movie_list.public_id, event_type, data))
+
+
+# Opérations disponibles : nom -> fonction(batch, args) renvoyant (code HTTP, résultat)
+OPERATIONS = {}
+
+
+def operation(name):
+    def register(func):
+        OPERATIONS[name] = func
+        return func
+    return register
+
+
+@operation('create_list')
+def create_list(batch, args):
+    new_list = List(user_id=batch.user_id, name=args.get('name', 'Ma Liste'))
+    batch.session.add(new_list)
+    batch.session.flush()
+    batch._lists[('name', new_list.name)] = new_list
+    batch._next_rank[new_list.id] = 1
+    return 201, {
+        "id": new_list.id,
+        "name": new_list.name,
+        "public_id": new_list.public_id,
+        "private_id": new_list.private_id
+    }
+
+
+@operation('create_movie')
+def create_movie(batch, args):
+    title = args.get('title')
+    if not title:
+        raise OperationError("Title is required")
+    existing = Movie.query.filter(Movie.title.ilike(title)).first()
+    if existing:
+        return 200, {"id": existing.id, "title": existing.title, "poster_path": existing.poster_path,
+                     "release_date": existing.release_date}
+    new_movie = Movie(title=title, poster_path=None, release_date=args.get('release_date'))
+    batch.session.add(new_movie)
+    batch.session.flush()
+    return 201, {"id": new_movie.id, "title": new_movie.title, "poster_path": new_movie.poster_path,
+                 "release_date": new_movie.release_date, "is_custom": True}
+
+
+@operation('add_movie')
+def add_movie(batch, args):
+    movie_list = batch.find_list(args)
+    movie = batch.find_movie(args)
+    existing = ListItem.query.filter_by(list_id=movie_list.id, movie_id=movie.id).first()
+    if existing:
+        return 200, {"msg": "Movie already in list", "item_id": existing.id}
+    new_item = ListItem(list_id=movie_list.id, movie_id=movie.id, rank=batch.next_rank(movie_list),
+                        comment=args.get('comment'))
+    batch.session.add(new_item)
+    batch.session.flush()
+    result = item_to_dict(new_item)
+    batch.publish(movie_list, 'item_added', result)
+    return 201, result
+
+
+@operation('update_item')
+def update_item(batch, args):
+    movie_list = batch.find_list(args)
+    item = batch.find_item(movie_list, args)
+    if 'comment' in args:
+        item.comment = args['comment']
+        batch.publish(movie_list, 'comment_edited', {"item_id": item.id, "comment": item.comment})
+    return 200, {"id": item.id, "comment": item.comment}
+
+
+@operation('remove_item')
+def remove_item(batch, args):
+    movie_list = batch.find_list(args)
+    item = batch.find_item(movie_list, args)
+    item_id = item.id
+    batch.session.delete(item)
+    batch.session.flush()
+    batch.publish(movie_list, 'item_removed', {"item_id": item_id})
+    return 200, {"id": item_id}
+
+
+@operation('reorder')
+def reorder(batch, args):
+    movie_list = batch.find_list(args)
+    items_order = args.get('items')
+    if not items_order:
+        raise OperationError("Items order required")
+    item_ids = [item_data['id'] for item_data in items_order]
+    items = {
+        item.id: item
+        for item in ListItem.query.filter(ListItem.id.in_(item_ids), ListItem.list_id == movie_list.id)
+    }
+    moved = []
+    for item_data in items_order:
+        item = items.get(item_data['id'])
+        if item:
+            item.rank = item_data['rank']
+            moved.append({"id": item.id, "rank": item.rank})
+    # Les rangs ont pu dépasser le dernier rang connu : recalculé au prochain ajout
+    batch._next_rank.pop(movie_list.id, None)
+    batch.publish(movie_list, 'items_moved', {"items": moved})
+    return 200, {"items": moved}
+
+
+@operation('rename_list')
+def rename_list(batch, args):
+    movie_list = batch.find_list(args)
+    if not args.get('name'):
+        raise OperationError("Name is required")
+    movie_list.name = args['name']
+    batch.forget()
+    batch.publish(movie_list, 'renamed', {"name": movie_list.name})
+    return 200, {"id": movie_list.id, "name": movie_list.name}
+
+
+@operation('delete_list')
+def delete_list(batch, args):
+    movie_list = batch.find_list(args)
+    list_id = movie_list.id
+    item_count = batch.session.query(ListItem).filter_by(list_id=list_id).count()
+    # Même purge que la route de suppression (classement, journal, pierres tombales), mais sans
+    # commit intermédiaire : elle est validée ou annulée avec le reste du lot
+    purge.purge_lists(batch.session, [list_id], current_app.config['PURGE_CHUNK_SIZE'], commit=False)
+    batch.publish(movie_list, 'list_deleted', {})
+    # Suppression ensembliste : l'objet, toujours dans la session, ne correspond plus à aucune ligne
+    batch.session.expunge(movie_list)
+    batch.forget()
+    return 200, {"id": list_id, "items": item_count}
+
+
+def _authenticate():
+    """Renvoie (ID de l'utilisateur, None), ou (None, réponse d'erreur) si le lot ne peut pas être exécuté."""
+    username = request.args.get('username')
+    password = request.args.get('password')
+    if username and password:
+        user = User.query.filter_by(username=username).first()
+        if user and bcrypt.check_password_hash(user.password_hash, password):
+            return user.id, None
+    identity = get_jwt_identity()
+    if identity is None:
+        return None, (jsonify({"msg": "Unauthorized - Provide valid credentials or token"}), 401)
+    # Les opérations portent sur les listes d'un utilisateur : le jeton admin (ou celui d'un
+    # utilisateur supprimé depuis) ne désigne aucun compte
+    if not str(identity).isdigit() or db.session.get(User, int(identity)) is None:
+        return None, (jsonify({"msg": "Forbidden - Batch operations require a user account"}), 403)
+    return int(identity), None
+
+
+@bp.route('/batch', methods=['POST'])
+@jwt_required(optional=True)
+def run_batch():
+    """
+    Exécute une suite ordonnée d'opérations sur les listes et les films en une seule requête.
+    Par défaut le lot est atomique : un échec annule toutes les opérations. Avec "atomic": false,
+    chaque opération est isolée dans un point de sauvegarde et seules celles en échec sont annulées.
+    Dans les deux cas, un seul commit.
+    ---
+    tags:
+      - Batch
+    parameters:
+      - name: username
+        in: query
+        type: string
+        description: Nom d'utilisateur (si auth directe)
+      - name: password
+        in: query
+        type: string
+        description: Mot de passe (si auth directe)
+      - name: body
+        in: body
+        required: true
+        schema:
+          type: object
+          properties:
+            atomic:
+              type: boolean
+              default: true
+            operations:
+              type: array
+              description: >
+                Opérations {"op": ..., "args": {...}} : create_list (name), create_movie (title, release_date),
+                add_movie (list | private_id, movie_title | movie_id, comment), update_item et remove_item
+                (list | private_id, item_id | movie_title, comment), reorder (list | private_id, items),
+                rename_list (list | private_id, name), delete_list (list | private_id)
+              items:
+                type: object
+    responses:
+      200:
+        description: Lot validé, résultat par opération
+      400:
+        description: Lot invalide, ou lot atomique annulé (voir "failed")
+      401:
+        description: Non autorisé
+      403:
+        description: Jeton ne désignant aucun utilisateur (admin)
+    """
+    user_id, error = _authenticate()
+    if error:
+        return error
+
+    data = request.get_json(silent=True) or {}
+    operations = data.get('operations')
+    atomic = data.get('atomic', True)
+    if not isinstance(operations, list) or not operations:
+        return jsonify({"msg": "operations required"}), 400
+    max_operations = current_app.config['BATCH_MAX_OPERATIONS']
+    if len(operations) > max_operations:
+        return jsonify({"msg": f"At most {max_operations} operations per batch"}), 400
+
+    session = db.session
+    batch = Batch(session, user_id)
+    results = []
+    failed = None
+    for index, spec in enumerate(operations):
+        if not isinstance(spec, dict):
+            spec = {}
+        name, args = spec.get('op'), spec.get('args') or {}
+        handler = OPERATIONS.get(name)
+        pending = len(batch.events)
+        savepoint = None if atomic else session.begin_nested()
+        try:
+            if handler is None:
+                raise OperationError(f"Unknown operation, expected one of {', '.join(OPERATIONS)}")
+            status, result = handler(batch, args)
+            if savepoint is not None:
+                savepoint.commit()
+            results.append({"index": index, "op": name, "status": status, "result": result})
+            continue
+        except OperationError as e:
+            status, msg = e.status, e.msg
+        except Exception as e:
+            logger.exception("Error in batch operation %d (%s)", index, name)
+            status, msg = 500, "Internal Server Error"
+
+        # Échec : annulation de l'opération seule, ou de tout le lot s'il est atomique
+        del batch.events[pending:]
+        batch.forget()
+        results.append({"index": index, "op": name, "status": status, "msg": msg})
+        if atomic:
+            session.rollback()
+            failed = index
+            break
+        savepoint.rollback()
+
+    if failed is not None:
+        results.extend(
+            {"index": index, "op": spec.get('op') if isinstance(spec, dict) else None, "status": None,
+             "msg": "Not executed"}
+            for index, spec in enumerate(operations[failed + 1:], start=failed + 1)
+        )
+        return jsonify({"committed": False, "atomic": True, "failed": failed, "results": results}), 400
+
+    session.commit()
+    for event in batch.events:
+        events.publish(*event)
+    return jsonify({"committed": True, "atomic": bool(atomic), "results": results}), 200
@@ -1,6 +1,10 @@
-from flask import Blueprint, request, jsonify
-from app import db, bcrypt
+from flask import Blueprint, request, jsonify, current_app, Response
+from app import db, bcrypt, events
+from app.replica import read_only
+from app.query_budget import query_budget
+from sqlalchemy.orm import selectinload
 from app.models import User, List, ListItem, Movie
+from app.services import recommendations, ranking, posters, purge
 from flask_jwt_extended import jwt_required, get_jwt_identity
 import uuid
 
@@ -67,6 +71,8 @@ def create_list():
     }), 201
 
 @bp.route('/lookup', methods=['GET'])
+@read_only
+@query_budget(3)
 def lookup_list():
     """
     Recherche une liste spécifique en fournissant le nom d'utilisateur, le mot de passe et le nom de la liste.
@@ -105,7 +111,10 @@ def lookup_list():
     if not bcrypt.check_password_hash(user.password_hash, password):
         return jsonify({"msg": "Invalid password"}), 401
         
-    movie_list = List.query.filter(
+    # Chargement des éléments et de leurs films en une seule requête supplémentaire (pas de N+1)
+    movie_list = List.query.options(
+        selectinload(List.items).joinedload(ListItem.movie)
+    ).filter(
         List.user_id == user.id,
         List.name == list_name
     ).first()
@@ -121,7 +130,8 @@ def lookup_list():
             "movie": {
                 "id": item.movie.id,
                 "title": item.movie.title,
-                "poster_path": item.movie.poster_path
+                "poster_path": item.movie.poster_path,
+                "poster_url": posters.poster_url(item.movie.id, item.movie.poster_path)
             },
             "rank": item.rank,
             "comment": item.comment
@@ -137,37 +147,120 @@ def lookup_list():
         "items": items
     })
 
+@bp.route('/consensus', methods=['GET'])
+@read_only
+@query_budget(1)
+def consensus_ranking():
+    """
+    Fusionne plusieurs listes en un classement de groupe (ex: les "Top 10" d'un groupe d'amis).
+    ---
+    tags:
+      - Lists
+    parameters:
+      - name: ids
+        in: query
+        type: string
+        required: true
+        description: IDs publics des listes, séparés par des virgules (50 maximum)
+      - name: method
+        in: query
+        type: string
+        description: borda (défaut), kemeny (approximation) ou schulze
+      - name: limit
+        in: query
+        type: integer
+        description: Nombre de films renvoyés (50 par défaut, 500 maximum)
+    responses:
+      200:
+        description: Classement consensuel
+      400:
+        description: Paramètres invalides
+      404:
+        description: Liste introuvable
+    """
+    public_ids = list(dict.fromkeys(i.strip() for i in request.args.get('ids', '').split(',') if i.strip()))
+    method = request.args.get('method', 'borda')
+    limit = max(1, min(request.args.get('limit', 50, type=int), 500))
+    if len(public_ids) < 2 or len(public_ids) > 50:
+        return jsonify({"msg": "Between 2 and 50 list ids required"}), 400
+    if method not in ranking.CONSENSUS_METHODS:
+        return jsonify({"msg": f"Unknown method, expected one of {', '.join(ranking.CONSENSUS_METHODS)}"}), 400
+
+    # Listes, éléments et films en une seule requête (jointures externes : une liste vide est quand même trouvée)
+    rows = db.session.query(List.public_id, List.name, ListItem.rank, Movie) \
+        .outerjoin(ListItem, ListItem.list_id == List.id) \
+        .outerjoin(Movie, Movie.id == ListItem.movie_id) \
+        .filter(List.public_id.in_(public_ids)).all()
+    rankings = {public_id: {} for public_id in public_ids}
+    names = {}
+    movies = {}
+    for public_id, name, rank, movie in rows:
+        names[public_id] = name
+        if movie is not None:
+            rankings[public_id][movie.id] = rank
+            movies[movie.id] = movie
+    missing = [public_id for public_id in public_ids if public_id not in names]
+    if missing:
+        return jsonify({"msg": "List not found", "missing": missing}), 404
+
+    ordered, scores, agreement = ranking.consensus(list(rankings.values()), method)
+    results = []
+    for position, movie_id in enumerate(ordered[:limit], 1):
+        results.append({
+            "rank": position,
+            "id": movie_id,
+            "title": movies[movie_id].title,
+            "poster_path": movies[movie_id].poster_path,
+            "score": scores[movie_id],
+            "appearances": sum(1 for ranks in rankings.values() if movie_id in ranks)
+        })
+
+    return jsonify({
+        "method": method,
+        "lists": [{"public_id": public_id, "name": names[public_id]} for public_id in public_ids],
+        "kemeny_agreement": agreement, # Nombre de paires (film, liste) en accord avec l'ordre renvoyé
+        "results": results
+    })
+
+def item_to_dict(item):
+    """Élément de liste tel que renvoyé par l'API (et diffusé aux pages ouvertes)."""
+    return {
+        "id": item.id,
+        "movie": {
+            "id": item.movie.id,
+            "title": item.movie.title,
+            "poster_path": item.movie.poster_path,
+            "poster_url": posters.poster_url(item.movie.id, item.movie.poster_path)
+        },
+        "rank": item.rank,
+        "comment": item.comment
+    }
+
 @bp.route('/<string:list_id_str>', methods=['GET'])
+@read_only
+@query_budget(3)
 def get_list(list_id_str):
     """
     Récupère une liste via son ID public ou privé.
     Si l'ID privé est utilisé, on considère que c'est le propriétaire qui accède (is_owner=True).
     """
+    # Les éléments et leurs films sont chargés en une seule requête, quel que soit leur nombre
+    with_items = List.query.options(selectinload(List.items).joinedload(ListItem.movie))
+
     # Essai avec ID Public (Lecture seule par défaut)
-    movie_list = List.query.filter_by(public_id=list_id_str).first()
+    movie_list = with_items.filter_by(public_id=list_id_str).first()
     is_owner = False
     
     # Si non trouvé, essai avec ID Privé (Propriétaire)
     if not movie_list:
-        movie_list = List.query.filter_by(private_id=list_id_str).first()
+        movie_list = with_items.filter_by(private_id=list_id_str).first()
         if movie_list:
             is_owner = True
     
     if not movie_list:
         return jsonify({"msg": "List not found"}), 404
         
-    items = []
-    for item in movie_list.items:
-        items.append({
-            "id": item.id,
-            "movie": {
-                "id": item.movie.id,
-                "title": item.movie.title,
-                "poster_path": item.movie.poster_path
-            },
-            "rank": item.rank,
-            "comment": item.comment
-        })
+    items = [item_to_dict(item) for item in movie_list.items]
         
     return jsonify({
         "id": movie_list.id,
@@ -179,6 +272,207 @@ def get_list(list_id_str):
         "items": items
     })
 
+@bp.route('/<string:public_id>/events', methods=['GET'])
+@read_only
+@query_budget(1)
+def list_events(public_id):
+    """
+    Flux Server-Sent Events des modifications d'une liste (remplace le rechargement périodique).
+    Évènements : item_added (élément complet), item_removed, items_moved, comment_edited,
+    renamed, list_deleted ; "reset" demande au client de recharger la liste complète.
+    Après une coupure, le navigateur se reconnecte avec Last-Event-ID et reçoit les évènements manqués.
+    ---
+    tags:
+      - Lists
+    produces:
+      - text/event-stream
+    parameters:
+      - name: public_id
+        in: path
+        type: string
+        required: true
+    responses:
+      200:
+        description: Flux d'évènements
+      404:
+        description: Liste introuvable
+      503:
+        description: Trop de flux ouverts sur ce worker
+    """
+    if not db.session.query(List.id).filter_by(public_id=public_id).first():
+        return jsonify({"msg": "List not found"}), 404
+
+    config = current_app.config
+    # Chaque flux occupe un thread du worker : au-delà de la limite, le client réessaie plus tard
+    if not events.open_stream(config['EVENTS_MAX_STREAMS']):
+        return jsonify({"msg": "Too many open streams"}), 503, {"Retry-After": "10"}
+
+    # La place est libérée ici tant que la réponse n'a pas pris le relais (call_on_close)
+    subscription = None
+    handed_over = False
+    try:
+        last_event_id = request.headers.get('Last-Event-ID', type=int)
+        subscription = events.bus.subscribe(public_id, last_event_id)
+        # Le générateur ne touche pas à la base : la session est libérée dès le retour de la vue
+        stream = events.stream(subscription, config['EVENTS_KEEPALIVE_SECONDS'], config['EVENTS_MAX_STREAM_SECONDS'])
+        response = Response(stream, mimetype='text/event-stream', headers={
+            "Cache-Control": "no-cache",
+            # Nginx ne doit pas mettre le flux en tampon
+            "X-Accel-Buffering": "no",
+        })
+        response.call_on_close(lambda: events.close_stream(subscription))
+        handed_over = True
+        return response
+    finally:
+        if not handed_over:
+            events.close_stream(subscription)
+
+@bp.route('/<string:public_id>/recommendations', methods=['GET'])
+@read_only
+@query_budget(3)
+def get_recommendations(public_id):
+    """
+    Suggère des films à ajouter à une liste, à partir des films souvent classés avec les siens.
+    Les voisins sont précalculés par lot (flask build-recommendations) : simple lecture et fusion.
+    ---
+    tags:
+      - Lists
+    parameters:
+      - name: limit
+        in: query
+        type: integer
+        description: Nombre de suggestions (20 par défaut, 100 maximum)
+    responses:
+      200:
+        description: Films suggérés, du plus pertinent au moins pertinent
+      404:
+        description: Liste introuvable
+    """
+    movie_list = List.query.filter_by(public_id=public_id).first()
+    if not movie_list:
+        return jsonify({"msg": "List not found"}), 404
+
+    limit = max(1, min(request.args.get('limit', 20, type=int), 100))
+    movie_ranks = dict(db.session.query(ListItem.movie_id, ListItem.rank).filter(ListItem.list_id == movie_list.id).all())
+
+    results = []
+    for movie, score in recommendations.recommend(db.session, movie_ranks, limit):
+        results.append({
+            "id": movie.id,
+            "title": movie.title,
+            "poster_path": movie.poster_path,
+            "release_date": movie.release_date,
+            "score": round(score, 4)
+        })
+    return jsonify({"results": results})
+
+@bp.route('/<string:public_id>/compare/<string:other_public_id>', methods=['GET'])
+@read_only
+@query_budget(2)
+def compare_lists(public_id, other_public_id):
+    """
+    Compare deux listes : films en commun et corrélation de leurs classements
+    (Spearman et Kendall tau, calculés sur les films communs).
+    ---
+    tags:
+      - Lists
+    responses:
+      200:
+        description: Recouvrement et corrélations
+      404:
+        description: Liste introuvable
+    """
+    lists = {l.public_id: l for l in List.query.filter(List.public_id.in_([public_id, other_public_id]))}
+    if public_id not in lists or other_public_id not in lists:
+        return jsonify({"msg": "List not found"}), 404
+
+    # Éléments des deux listes et titres des films en une requête
+    rows = db.session.query(ListItem.list_id, ListItem.rank, Movie).join(Movie, Movie.id == ListItem.movie_id) \
+        .filter(ListItem.list_id.in_([lists[public_id].id, lists[other_public_id].id])).all()
+    ranks = {lists[public_id].id: {}, lists[other_public_id].id: {}}
+    movies = {}
+    for list_id, rank, movie in rows:
+        ranks[list_id][movie.id] = rank
+        movies[movie.id] = movie
+
+    first, second = ranks[lists[public_id].id], ranks[lists[other_public_id].id]
+    result = ranking.compare(first, second)
+    shared = []
+    for movie_id in result["shared"]:
+        shared.append({
+            "id": movie_id,
+            "title": movies[movie_id].title,
+            "poster_path": movies[movie_id].poster_path,
+            "rank": first[movie_id],
+            "other_rank": second[movie_id]
+        })
+
+    return jsonify({
+        "list": {"public_id": public_id, "name": lists[public_id].name, "item_count": len(first)},
+        "other": {"public_id": other_public_id, "name": lists[other_public_id].name, "item_count": len(second)},
+        "overlap": result["overlap"],
+        "jaccard": round(result["jaccard"], 4),
+        "spearman": result["spearman"],
+        "kendall_tau": result["kendall_tau"],
+        "shared": shared
+    })
+
+@bp.route('/<string:public_id>/similar', methods=['GET'])
+@read_only
+@query_budget(4)
+def similar_lists(public_id):
+    """
+    Trouve les listes publiques dont le classement ressemble le plus à celui d'une liste
+    (Spearman sur les films communs). Toutes les listes candidates sont chargées en une
+    requête et comparées en une passe vectorisée.
+    ---
+    tags:
+      - Lists
+    parameters:
+      - name: limit
+        in: query
+        type: integer
+        description: Nombre de listes renvoyées (10 par défaut, 50 maximum)
+      - name: min_overlap
+        in: query
+        type: integer
+        description: Nombre minimal de films en commun (3 par défaut)
+    responses:
+      200:
+        description: Listes similaires, de la plus proche à la plus éloignée
+      404:
+        description: Liste introuvable
+    """
+    movie_list = List.query.filter_by(public_id=public_id).first()
+    if not movie_list:
+        return jsonify({"msg": "List not found"}), 404
+
+    limit = max(1, min(request.args.get('limit', 10, type=int), 50))
+    min_overlap = max(2, request.args.get('min_overlap', 3, type=int))
+    reference = dict(db.session.query(ListItem.movie_id, ListItem.rank).filter(ListItem.list_id == movie_list.id).all())
+    if len(reference) < min_overlap:
+        return jsonify({"results": []})
+
+    # Éléments (films communs uniquement) de toutes les listes publiques partageant au moins un film
+    candidates = db.session.query(ListItem.list_id, ListItem.movie_id, ListItem.rank) \
+        .join(List, List.id == ListItem.list_id) \
+        .filter(ListItem.movie_id.in_(list(reference)), List.is_public.is_(True), List.id != movie_list.id).all()
+    list_ids, overlaps, rhos = ranking.spearman_many(
+        reference, [c[0] for c in candidates], [c[1] for c in candidates], [c[2] for c in candidates], min_overlap
+    )
+
+    # Plus forte corrélation d'abord, à égalité le plus grand recouvrement
+    best = sorted(zip(rhos.tolist(), overlaps.tolist(), list_ids.tolist()), key=lambda r: (-r[0], -r[1], r[2]))[:limit]
+    names = dict(db.session.query(List.id, List.public_id).filter(List.id.in_([r[2] for r in best])).all()) if best else {}
+    results = []
+    for rho, overlap, list_id in best:
+        results.append({
+            "public_id": names[list_id],
+            "overlap": overlap,
+            "spearman": round(rho, 4)
+        })
+    return jsonify({"results": results})
+
 @bp.route('/<string:private_id>/items', methods=['POST'])
 def add_item(private_id):
     """
@@ -209,10 +503,12 @@ def add_item(private_id):
     new_item = ListItem(list_id=movie_list.id, movie_id=movie_id, rank=max_rank + 1)
     db.session.add(new_item)
     db.session.commit()
+    events.publish(movie_list.public_id, 'item_added', item_to_dict(new_item))
     
     return jsonify({"msg": "Movie added"}), 201
 
 @bp.route('/<string:private_id>/reorder', methods=['PUT'])
+@query_budget(6) # Liste, items, executemany des rangs, mise à jour groupée du classement, séquence et journal des modifications
 def reorder_items(private_id):
     """
     Réordonne les éléments d'une liste.
@@ -228,17 +524,31 @@ def reorder_items(private_id):
     if not items_order:
         return jsonify({"msg": "Items order required"}), 400
         
+    # Chargement de tous les items concernés en une requête
+    # Sécurité : on ne retient que les items appartenant bien à la liste modifiée
+    item_ids = [item_data['id'] for item_data in items_order]
+    items = {
+        item.id: item
+        for item in ListItem.query.filter(ListItem.id.in_(item_ids), ListItem.list_id == movie_list.id)
+    }
+    moved = []
     for item_data in items_order:
-        item = ListItem.query.get(item_data['id'])
-        # Sécurité : on vérifie que l'item appartient bien à la liste modifiée
-        if item and item.list_id == movie_list.id:
+        item = items.get(item_data['id'])
+        if item:
             item.rank = item_data['rank']
+            moved.append({"id": item.id, "rank": item.rank})
             
+    # Les mises à jour sont envoyées en un seul executemany au commit
+    # (public_id lu avant : le commit expire la liste, la relire coûterait une requête)
+    public_id = movie_list.public_id
     db.session.commit()
+    events.publish(public_id, 'items_moved', {"items": moved})
     return jsonify({"msg": "List reordered"}), 200
 
 @bp.route('/mine', methods=['GET'])
 @jwt_required(optional=True)
+@read_only
+@query_budget(2)
 def get_my_lists():
     """
     Récupère toutes les listes de l'utilisateur connecté.
@@ -270,15 +580,17 @@ def get_my_lists():
     if not user_id:
         return jsonify({"msg": "Unauthorized - Provide valid credentials or token"}), 401
 
-    user_lists = List.query.filter_by(user_id=user_id).all()
+    # Nombre d'éléments calculé par la base (sous-requête corrélée) au lieu de charger chaque liste
+    item_count = db.select(db.func.count(ListItem.id)).where(ListItem.list_id == List.id).scalar_subquery()
+    user_lists = db.session.query(List, item_count).filter(List.user_id == user_id).all()
     results = []
-    for l in user_lists:
+    for l, count in user_lists:
         results.append({
             "id": l.id,
             "name": l.name,
             "private_id": l.private_id,
             "public_id": l.public_id,
-            "item_count": len(l.items)
+            "item_count": count
         })
     return jsonify(results)
 
@@ -297,6 +609,7 @@ def remove_item(private_id, item_id):
         
     db.session.delete(item)
     db.session.commit()
+    events.publish(movie_list.public_id, 'item_removed', {"item_id": item_id})
     
     return jsonify({"msg": "Item removed"}), 200
 
@@ -318,6 +631,8 @@ def update_item(private_id, item_id):
         item.comment = data['comment']
         
     db.session.commit()
+    if 'comment' in data:
+        events.publish(movie_list.public_id, 'comment_edited', {"item_id": item.id, "comment": item.comment})
     
     return jsonify({
         "msg": "Item updated",
@@ -341,6 +656,8 @@ def update_list(private_id):
         movie_list.name = data['name']
         
     db.session.commit()
+    if 'name' in data:
+        events.publish(movie_list.public_id, 'renamed', {"name": movie_list.name})
     
     return jsonify({
         "msg": "List updated",
@@ -359,8 +676,10 @@ def delete_list(private_id):
     if not movie_list:
         return jsonify({"msg": "List not found"}), 404
         
-    db.session.delete(movie_list)
-    db.session.commit()
+    # Éléments supprimés par paquets (classement mis à jour), puis la liste
+    public_id = movie_list.public_id
+    purge.purge_lists(db.session, [movie_list.id], current_app.config['PURGE_CHUNK_SIZE'])
+    events.publish(public_id, 'list_deleted', {})
     
     return jsonify({"msg": "List deleted"}), 200
 
@@ -434,6 +753,7 @@ def add_movie_by_names(list_name):
     new_item = ListItem(list_id=movie_list.id, movie_id=movie.id, rank=max_rank + 1)
     db.session.add(new_item)
     db.session.commit()
+    events.publish(movie_list.public_id, 'item_added', item_to_dict(new_item))
 
     return jsonify({"msg": "Movie added to list"}), 201
 
@@ -478,7 +798,9 @@ def delete_list_by_name(list_name):
     if not movie_list:
         return jsonify({"msg": "List not found"}), 404
         
-    db.session.delete(movie_list)
-    db.session.commit()
+    # Éléments supprimés par paquets (classement mis à jour), puis la liste
+    public_id = movie_list.public_id
+    purge.purge_lists(db.session, [movie_list.id], current_app.config['PURGE_CHUNK_SIZE'])
+    events.publish(public_id, 'list_deleted', {})
     
     return jsonify({"msg": f"List '{list_name}' deleted"}), 200
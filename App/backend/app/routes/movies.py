@@ -1,13 +1,21 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app, send_file
 from app import db, bcrypt
-from app.models import Movie, User
+from app.replica import read_only
+from app.query_budget import query_budget
+from app.models import Movie, User, natural_uid
+from app.services import leaderboard, posters
 from flask_jwt_extended import jwt_required, get_jwt_identity
+import logging
 
 # Blueprint pour la gestion des films
 bp = Blueprint('movies', __name__, url_prefix='/api/movies')
 
+logger = logging.getLogger(__name__)
+
 @bp.route('/search', methods=['GET'])
 @jwt_required(optional=True)
+@read_only
+@query_budget(2)
 def search():
     """
     Recherche des films dans la base de données locale (et potentiellement externe TMDB).
@@ -77,6 +85,7 @@ def search():
             "id": movie.id,
             "title": movie.title,
             "poster_path": movie.poster_path,
+            "poster_url": posters.poster_url(movie.id, movie.poster_path, 'grid'),
             "release_date": movie.release_date,
             "is_custom": movie.is_custom
         })
@@ -160,6 +169,106 @@ def create_custom_movie():
         "is_custom": True
     }), 201
 
+@bp.route('/leaderboard', methods=['GET'])
+@read_only
+@query_budget(1)
+def get_leaderboard():
+    """
+    Classement des films les plus aimés, agrégé sur toutes les listes publiques (score de Borda).
+    Lu depuis la table matérialisée movie_scores : le coût dépend de la taille de la page seulement.
+    ---
+    tags:
+      - Movies
+    parameters:
+      - name: limit
+        in: query
+        type: integer
+        description: Nombre de films par page (50 par défaut, 100 maximum)
+      - name: cursor
+        in: query
+        type: string
+        description: Curseur renvoyé par la page précédente (next_cursor)
+    responses:
+      200:
+        description: Page du classement et curseur de la page suivante
+    """
+    limit = max(1, min(request.args.get('limit', 50, type=int), 100))
+    try:
+        rows, next_cursor = leaderboard.page(db.session, limit, request.args.get('cursor'))
+    except ValueError:
+        return jsonify({"msg": "Invalid cursor"}), 400
+
+    results = []
+    for score, movie in rows:
+        results.append({
+            "id": movie.id,
+            "title": movie.title,
+            "poster_path": movie.poster_path,
+            "release_date": movie.release_date,
+            "score": score.score,
+            "list_count": score.list_count
+        })
+    return jsonify({"results": results, "next_cursor": next_cursor})
+
+@bp.route('/<int:movie_id>/poster', methods=['GET'])
+@bp.route('/<int:movie_id>/poster/<string:size>', methods=['GET'])
+@read_only
+@query_budget(1)
+def get_poster(movie_id, size='list'):
+    """
+    Sert l'affiche d'un film depuis le cache local (téléchargée une seule fois à l'origine).
+    Avec le paramètre v renvoyé par poster_url, la réponse est marquée immutable.
+    ---
+    tags:
+      - Movies
+    parameters:
+      - name: size
+        in: path
+        type: string
+        description: thumb (92px), list (200px), grid (500px) ou original
+      - name: v
+        in: query
+        type: string
+        description: Version de l'affiche (fournie par poster_url)
+    responses:
+      200:
+        description: Image
+      304:
+        description: Inchangée (If-None-Match)
+      404:
+        description: Film ou affiche introuvable
+      502:
+        description: Affiche indisponible à l'origine
+    """
+    if size not in posters.SIZES and size != posters.ORIGINAL:
+        return jsonify({"msg": f"Unknown size, expected one of {', '.join(list(posters.SIZES) + [posters.ORIGINAL])}"}), 400
+
+    poster_path = db.session.query(Movie.poster_path).filter(Movie.id == movie_id).scalar()
+    if not poster_path:
+        return jsonify({"msg": "Poster not found"}), 404
+
+    key = posters.cache_key(poster_path)
+    etag = f'{key}-{size}'
+    # URL versionnée : le contenu ne changera jamais. Sinon, revalidation quotidienne par ETag.
+    max_age = 31536000 if request.args.get('v') == key else 86400
+
+    if request.if_none_match.contains(etag):
+        response = current_app.response_class(status=304)
+    else:
+        try:
+            path, mimetype = current_app.extensions['posters'].get(poster_path, size)
+        except posters.PosterError as e:
+            logger.warning("Error fetching poster: %s", e)
+            return jsonify({"msg": "Poster unavailable"}), 502
+        response = send_file(path, mimetype=mimetype, etag=False, conditional=False, max_age=max_age)
+
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = max_age
+    response.cache_control.no_cache = None
+    response.cache_control.immutable = max_age == 31536000
+    return response
+
 def seed_movies():
     """
     Fonction utilitaire pour peupler la base de données avec des films initiaux "classiques".
@@ -190,14 +299,15 @@ def seed_movies():
                 existing.release_date = m['release_date']
                 updated_count += 1
         else:
-            # Ajout du nouveau film
-            db.session.add(Movie(title=m['title'], poster_path=m['poster_path'], release_date=m['release_date'], is_custom=False))
+            # Ajout du nouveau film (uid dérivé du titre : le même sur toutes les bases, pour la réplication)
+            db.session.add(Movie(uid=natural_uid('movie', m['title']), title=m['title'], poster_path=m['poster_path'],
+                                 release_date=m['release_date'], is_custom=False))
             added_count += 1
     
     try:
         if updated_count > 0 or added_count > 0:
             db.session.commit()
-            print(f"Database seeded! ({added_count} added, {updated_count} updated)")
+            logger.info("Database seeded! (%d added, %d updated)", added_count, updated_count)
         else:
             # Assurance que les films par défaut ne sont pas marqués comme custom
             for m in initial_movies:
@@ -207,7 +317,7 @@ def seed_movies():
                     db.session.add(mov)
             db.session.commit()
             
-            print("Database already up to date.")
+            logger.info("Database already up to date.")
     except Exception as e:
-        print(f"Error seeding: {e}")
+        logger.exception("Error seeding")
         db.session.rollback()
@@ -0,0 +1,113 @@
+from flask import Blueprint, request, jsonify
+from app import db, bcrypt
+from app.replica import read_only
+from app.query_budget import query_budget
+from app.models import User, List, ListItem
+from app.routes.lists import item_to_dict
+from app.services import changes
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from sqlalchemy.orm import joinedload
+
+# Blueprint de la synchronisation incrémentale : un client garde une copie locale de ses listes
+# et ne récupère que ce qui a changé depuis son dernier curseur
+bp = Blueprint('sync', __name__, url_prefix='/api')
+
+
+def _list_to_dict(movie_list, item_count):
+    return {
+        "id": movie_list.id,
+        "name": movie_list.name,
+        "private_id": movie_list.private_id,
+        "public_id": movie_list.public_id,
+        "is_public": movie_list.is_public,
+        "item_count": item_count
+    }
+
+
+@bp.route('/sync', methods=['GET'])
+@jwt_required(optional=True)
+@read_only
+@query_budget(4) # Curseur, journal, listes, éléments (avec leurs films)
+def sync():
+    """
+    Modifications des listes de l'utilisateur depuis un curseur.
+    Sans curseur (ou s'il est trop ancien), renvoie l'état complet avec "full": true : le client
+    remplace alors sa copie locale. Sinon, seules les listes et éléments modifiés sont renvoyés,
+    ainsi que les IDs supprimés. Le client conserve "cursor" pour l'appel suivant.
+    ---
+    tags:
+      - Lists
+    parameters:
+      - name: since
+        in: query
+        type: integer
+        description: Curseur renvoyé par la synchronisation précédente
+      - name: username
+        in: query
+        type: string
+        description: (auth directe)
+      - name: password
+        in: query
+        type: string
+        description: (auth directe)
+    responses:
+      200:
+        description: Modifications (ou état complet) et nouveau curseur
+      400:
+        description: Curseur invalide
+      401:
+        description: Non autorisé
+    """
+    username = request.args.get('username')
+    password = request.args.get('password')
+    user_id = None
+
+    if username and password:
+        user = User.query.filter_by(username=username).first()
+        if user and bcrypt.check_password_hash(user.password_hash, password):
+            user_id = user.id
+
+    if not user_id:
+        user_id = get_jwt_identity()
+
+    if not user_id:
+        return jsonify({"msg": "Unauthorized - Provide valid credentials or token"}), 401
+
+    try:
+        since = int(request.args.get('since', 0))
+    except ValueError:
+        return jsonify({"msg": "Invalid cursor"}), 400
+
+    cursor, changed = changes.changes_since(db.session, user_id, since)
+    if changed == {}:
+        return jsonify({"cursor": cursor, "full": False, "lists": [], "items": [],
+                        "deleted_lists": [], "deleted_items": []})
+
+    item_count = db.select(db.func.count(ListItem.id)).where(ListItem.list_id == List.id).scalar_subquery()
+    lists_query = db.session.query(List, item_count).filter(List.user_id == user_id)
+    items_query = (ListItem.query.options(joinedload(ListItem.movie))
+                   .join(List, List.id == ListItem.list_id).filter(List.user_id == user_id))
+
+    if changed is None:
+        lists = lists_query.all()
+        items = items_query.all()
+        deleted_lists, deleted_items = [], []
+    else:
+        list_ids = [entity_id for entity, entity_id in changed if entity == changes.LIST]
+        item_ids = [entity_id for entity, entity_id in changed if entity == changes.ITEM]
+        lists = lists_query.filter(List.id.in_(list_ids)).all() if list_ids else []
+        items = items_query.filter(ListItem.id.in_(item_ids)).all() if item_ids else []
+        # Lignes journalisées mais introuvables : supprimées depuis
+        found_lists = {movie_list.id for movie_list, _ in lists}
+        found_items = {item.id for item in items}
+        deleted_lists = [list_id for list_id in list_ids if list_id not in found_lists]
+        deleted_items = [item_id for item_id in item_ids if item_id not in found_items]
+
+    return jsonify({
+        "cursor": cursor,
+        "full": changed is None,
+        "lists": [_list_to_dict(movie_list, count) for movie_list, count in lists],
+        "items": [{**item_to_dict(item), "list_id": item.list_id} for item in items],
+        "deleted_lists": deleted_lists,
+        "deleted_items": deleted_items
+    })
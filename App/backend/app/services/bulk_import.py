@@ -0,0 +1,431 @@
+from array import array
+from bisect import bisect_left
+from datetime import datetime
+import uuid
+
+from sqlalchemy import select, insert, update, tuple_, or_
+
+from app.models import User, Movie, List, ListItem
+from app.services import changes, leaderboard
+from app.services.purge import delete_users, delete_movies, delete_lists, delete_list_items
+
+# Sections reconnues dans un fichier d'export, dans l'ordre des dépendances
+# ("deleted" n'apparaît que dans les exports incrémentaux et doit être rejouée en premier)
+SECTIONS = ('deleted', 'users', 'movies', 'lists', 'list_items')
+
+# Sections devant être importées avant une section donnée (résolution des clés étrangères)
+_DEPENDENCIES = {
+    'deleted': (),
+    'users': (),
+    'movies': (),
+    'lists': ('users',),
+    'list_items': ('lists', 'movies'),
+}
+
+
+class IdMap:
+    """
+    Correspondance compacte Ancien ID -> Nouvel ID.
+    Les paires sont stockées dans deux tableaux d'entiers 64 bits (16 octets par entrée,
+    contre plus de 100 pour un dict) et recherchées par dichotomie.
+    """
+    __slots__ = ('_keys', '_values', '_sorted')
+
+    def __init__(self):
+        self._keys = array('q')
+        self._values = array('q')
+        self._sorted = True
+
+    def add(self, old_id, new_id):
+        if self._keys and old_id <= self._keys[-1]:
+            self._sorted = False
+        self._keys.append(old_id)
+        self._values.append(new_id)
+
+    def _ensure_sorted(self):
+        if self._sorted:
+            return
+        pairs = sorted(zip(self._keys, self._values))
+        self._keys = array('q', (k for k, _ in pairs))
+        self._values = array('q', (v for _, v in pairs))
+        self._sorted = True
+
+    def get(self, old_id, default=None):
+        if old_id is None:
+            return default
+        self._ensure_sorted()
+        index = bisect_left(self._keys, old_id)
+        if index < len(self._keys) and self._keys[index] == old_id:
+            return self._values[index]
+        return default
+
+    def __contains__(self, old_id):
+        return self.get(old_id) is not None
+
+    def __len__(self):
+        return len(self._keys)
+
+
+def chunked(iterable, size):
+    """Découpe un itérable en listes de taille fixe."""
+    chunk = []
+    for row in iterable:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def parse_datetime(value):
+    return datetime.fromisoformat(value) if value else datetime.utcnow()
+
+
+class BulkImporter:
+    """
+    Import ensembliste d'un export JSON.
+    Les clés existantes sont chargées par requêtes groupées (IN) et les insertions
+    sont faites en executemany par paquets de taille fixe, sans flush ligne par ligne.
+    Les sections arrivant avant leurs dépendances sont mises en attente jusqu'à ce
+    que celles-ci aient été importées.
+    Avec update_existing (fichiers delta), les lignes déjà présentes sont mises à jour
+    au lieu d'être ignorées.
+    Le classement est ajusté pour les seules lignes importées, modifiées ou supprimées
+    (coût proportionnel au fichier, pas à la base).
+    on_chunk(section, lignes) est appelé après chaque paquet (suivi de progression des tâches).
+    """
+
+    def __init__(self, session, chunk_size=1000, update_existing=False, on_chunk=None):
+        self.session = session
+        self.chunk_size = chunk_size
+        self.update_existing = update_existing
+        self.on_chunk = on_chunk
+        self.user_map = IdMap()
+        self.movie_map = IdMap()
+        self.list_map = IdMap()
+        self.counts = dict.fromkeys(SECTIONS, 0)
+        self._done = set()
+        self._pending = {}
+        self._movie_ids = None
+
+    def feed(self, name, rows):
+        """Importe une section complète (itérable de dictionnaires)."""
+        if name not in SECTIONS:
+            return
+        if any(dep not in self._done for dep in _DEPENDENCIES[name]):
+            self._pending[name] = list(rows)
+            return
+        self._run(name, rows)
+        self._flush_pending()
+
+    def finish(self):
+        """
+        Importe les sections restées en attente (dépendances absentes du fichier).
+        Les insertions groupées n'étant pas journalisées, les clients synchronisés rechargent tout.
+        """
+        for name in SECTIONS:
+            if name in self._pending:
+                self._run(name, self._pending.pop(name))
+        if any(self.counts.values()):
+            changes.reset(self.session)
+
+    def _flush_pending(self):
+        for name in SECTIONS:
+            if name in self._pending and all(dep in self._done for dep in _DEPENDENCIES[name]):
+                self._run(name, self._pending.pop(name))
+
+    def _run(self, name, rows):
+        handler = getattr(self, f'_import_{name}')
+        for chunk in chunked(rows, self.chunk_size):
+            self.counts[name] += len(chunk)
+            handler(chunk)
+            if self.on_chunk:
+                self.on_chunk(name, len(chunk))
+        self._done.add(name)
+
+    def _lookup(self, key_column, keys):
+        """Récupère {clé: id} pour les clés déjà présentes en base (une seule requête)."""
+        model = key_column.class_
+        if not keys:
+            return {}
+        return dict(self.session.execute(select(key_column, model.id).where(key_column.in_(keys))).all())
+
+    def _update(self, model, rows):
+        """Met à jour des lignes existantes en un seul executemany (clé primaire 'id')."""
+        if self.update_existing and rows:
+            self.session.execute(update(model), rows)
+
+    def _scores(self, apply, item_ids):
+        # Ajout ou retrait des points d'éléments écrits par requête ensembliste, par paquets
+        item_ids = list(item_ids)
+        for start in range(0, len(item_ids), self.chunk_size):
+            apply(self.session, item_ids[start:start + self.chunk_size])
+
+    def _item_ids(self, *criteria):
+        return self.session.scalars(select(ListItem.id).where(*criteria)).all()
+
+    def _insert(self, model, key_column, rows):
+        """
+        Insère des lignes en un seul executemany et renvoie {clé: nouvel id}.
+        Les nouveaux IDs sont relus par la clé naturelle (unique) des lignes insérées, pas de
+        RETURNING sous MySQL ; un intervalle d'IDs inclurait les insertions concurrentes d'autres workers.
+        """
+        self.session.execute(insert(model), rows)
+        return self._lookup(key_column, [row[key_column.key] for row in rows])
+
+    # --- Utilisateurs (clé stable : uid, à défaut username) ---
+    def _import_users(self, rows):
+        # Utilisateurs déjà connus par leur uid : le pseudo suit (renommage sur la base source),
+        # sauf s'il est encore porté par un autre utilisateur (échange de pseudos)
+        by_uid = self._lookup(User.uid, list({r['uid'] for r in rows if r.get('uid')}))
+        known = [r for r in rows if r.get('uid') in by_uid]
+        taken = self._lookup(User.username, list({r['username'] for r in known}))
+        renamed = {r['uid'] for r in known if taken.get(r['username'], by_uid[r['uid']]) == by_uid[r['uid']]}
+        self._update(User, [
+            {"id": by_uid[r['uid']], "username": r['username'], "password_hash": r['password_hash']}
+            for r in known if r['uid'] in renamed
+        ])
+        self._update(User, [
+            {"id": by_uid[r['uid']], "password_hash": r['password_hash']} for r in known if r['uid'] not in renamed
+        ])
+
+        # Les autres par pseudo (relus après les renommages), sinon insérés avec leur uid
+        rest = [r for r in rows if r.get('uid') not in by_uid]
+        by_name = self._lookup(User.username, list({r['username'] for r in rest}))
+        self._update(User, [
+            {"id": by_name[r['username']], "password_hash": r['password_hash']}
+            for r in rest if r['username'] in by_name
+        ])
+        # Le pseudo étant unique, l'utilisateur trouvé est le même : il prend l'uid du fichier pour que
+        # ses renommages et sa suppression suivent (identité de la ligne, appliquée même hors delta)
+        adopted = [{"id": by_name[r['username']], "uid": r['uid']} for r in rest if r['username'] in by_name and r.get('uid')]
+        if adopted:
+            self.session.execute(update(User), adopted)
+        new_rows = {}
+        for r in rest:
+            if r['username'] not in by_name and r['username'] not in new_rows:
+                new_rows[r['username']] = {
+                    "username": r['username'],
+                    "uid": r.get('uid') or str(uuid.uuid4()),
+                    "password_hash": r['password_hash'],
+                    "created_at": parse_datetime(r.get('created_at')),
+                }
+        if new_rows:
+            by_name.update(self._insert(User, User.username, list(new_rows.values())))
+        for r in rows:
+            self.user_map.add(r['id'], by_uid[r['uid']] if r.get('uid') in by_uid else by_name[r['username']])
+
+    # --- Films (clé stable : uid ; titre insensible à la casse pour les fichiers antérieurs aux uid) ---
+    def _load_movie_ids(self):
+        self._movie_ids = {}
+        result = self.session.execute(select(Movie.title, Movie.id).order_by(Movie.id))
+        for title, movie_id in result:
+            self._movie_ids.setdefault(title.lower(), movie_id)
+
+    def _import_movies(self, rows):
+        # Plusieurs films peuvent porter le même titre (film personnalisé et film du catalogue) :
+        # un film du fichier ne correspond qu'au film de même uid. Le catalogue initial a le même
+        # uid sur toutes les bases (dérivé du titre, voir natural_uid).
+        by_uid = self._lookup(Movie.uid, list({r['uid'] for r in rows if r.get('uid')}))
+        legacy = [r for r in rows if not r.get('uid')]
+        if legacy and self._movie_ids is None:
+            self._load_movie_ids()
+
+        def existing(r):
+            return by_uid.get(r['uid']) if r.get('uid') else self._movie_ids.get(r['title'].lower())
+
+        self._update(Movie, [
+            {
+                "id": existing(r),
+                # Reconnu par son uid : le titre suit (renommage sur la base source)
+                "title": r['title'],
+                "poster_path": r.get('poster_path'),
+                "release_date": r.get('release_date'),
+                "is_custom": r.get('is_custom', True),
+            }
+            for r in rows if r.get('uid') and existing(r) is not None
+        ])
+        self._update(Movie, [
+            {
+                "id": existing(r),
+                "poster_path": r.get('poster_path'),
+                "release_date": r.get('release_date'),
+                "is_custom": r.get('is_custom', True),
+            }
+            for r in legacy if existing(r) is not None
+        ])
+        new_rows = {}
+        for r in rows:
+            key = r.get('uid') or r['title'].lower()
+            if existing(r) is None and key not in new_rows:
+                new_rows[key] = {
+                    "uid": r.get('uid') or str(uuid.uuid4()),
+                    "title": r['title'],
+                    "poster_path": r.get('poster_path'),
+                    "release_date": r.get('release_date'),
+                    "is_custom": r.get('is_custom', True),
+                }
+        if new_rows:
+            inserted = self._insert(Movie, Movie.uid, list(new_rows.values()))
+            leaderboard.add_movies(self.session, list(inserted.values()))
+            for key, row in new_rows.items():
+                movie_id = inserted[row['uid']]
+                if key == row['uid']:
+                    by_uid[key] = movie_id
+                if self._movie_ids is not None:
+                    self._movie_ids.setdefault(row['title'].lower(), movie_id)
+        for r in rows:
+            self.movie_map.add(r['id'], existing(r))
+
+    # --- Listes (clé naturelle : public_id) ---
+    def _import_lists(self, rows):
+        # Si le propriétaire n'a pas pu être importé/trouvé, on ignore la liste
+        rows = [r for r in rows if r['user_id'] in self.user_map]
+        for r in rows:
+            if not r.get('public_id'):
+                r['public_id'] = str(uuid.uuid4())
+        ids = self._lookup(List.public_id, list({r['public_id'] for r in rows}))
+        updates = [
+            {"id": ids[r['public_id']], "name": r['name'], "is_public": r.get('is_public', True)}
+            for r in rows if r['public_id'] in ids
+        ]
+        # Changement de visibilité : les points des éléments sont retirés tant que la liste est
+        # publique, puis rajoutés si elle l'est après la mise à jour
+        flipped = []
+        if self.update_existing and updates:
+            visibility = {row["id"]: row["is_public"] for row in updates}
+            flipped = [
+                list_id for list_id, is_public in self.session.execute(
+                    select(List.id, List.is_public).where(List.id.in_(visibility)))
+                if bool(is_public) != bool(visibility[list_id])
+            ]
+        item_ids = self._item_ids(ListItem.list_id.in_(flipped)) if flipped else []
+        self._scores(leaderboard.remove_items, item_ids)
+        self._update(List, updates)
+        self._scores(leaderboard.add_items, item_ids)
+        new_rows = {}
+        for r in rows:
+            if r['public_id'] not in ids and r['public_id'] not in new_rows:
+                new_rows[r['public_id']] = {
+                    "user_id": self.user_map.get(r['user_id']),
+                    "name": r['name'],
+                    "public_id": r['public_id'],
+                    "private_id": r.get('private_id') or str(uuid.uuid4()),
+                    "is_public": r.get('is_public', True),
+                    "created_at": parse_datetime(r.get('created_at')),
+                }
+        if new_rows:
+            ids.update(self._insert(List, List.public_id, list(new_rows.values())))
+        for r in rows:
+            self.list_map.add(r['id'], ids[r['public_id']])
+
+    # --- Éléments de liste (clé naturelle : couple liste/film) ---
+    def _import_list_items(self, rows):
+        mapped = []
+        for r in rows:
+            list_id = self.list_map.get(r['list_id'])
+            movie_id = self.movie_map.get(r['movie_id'])
+            # Vérification que la liste et le film existent bien dans le nouveau contexte
+            if list_id is not None and movie_id is not None:
+                mapped.append((list_id, movie_id, r))
+        if not mapped:
+            return
+
+        # On évite les doublons dans la liste (base existante + fichier)
+        list_ids = list({list_id for list_id, _, _ in mapped})
+        existing = {
+            (list_id, movie_id): item_id
+            for item_id, list_id, movie_id in self.session.execute(
+                select(ListItem.id, ListItem.list_id, ListItem.movie_id).where(ListItem.list_id.in_(list_ids))
+            )
+        }
+        new_rows = []
+        updates = []
+        for list_id, movie_id, r in mapped:
+            if (list_id, movie_id) in existing:
+                if existing[(list_id, movie_id)] is not None:
+                    updates.append({"id": existing[(list_id, movie_id)], "rank": r.get('rank', 0), "comment": r.get('comment')})
+                continue
+            existing[(list_id, movie_id)] = None
+            new_rows.append({
+                "list_id": list_id,
+                "movie_id": movie_id,
+                "rank": r.get('rank', 0),
+                "comment": r.get('comment'),
+            })
+        if self.update_existing and updates:
+            updated = [row["id"] for row in updates]
+            self._scores(leaderboard.remove_items, updated)
+            self._update(ListItem, updates)
+            self._scores(leaderboard.add_items, updated)
+        if new_rows:
+            self.session.execute(insert(ListItem), new_rows)
+            # IDs relus par couple (liste, film), clé unique d'un élément dans sa liste
+            pairs = [(row["list_id"], row["movie_id"]) for row in new_rows]
+            self._scores(leaderboard.add_items, self._item_ids(
+                ListItem.list_id.in_({list_id for list_id, _ in pairs}),
+                tuple_(ListItem.list_id, ListItem.movie_id).in_(pairs),
+            ))
+
+    # --- Suppressions (exports incrémentaux) ---
+    def _unambiguous(self, key_column, keys):
+        """
+        IDs des lignes désignées par une ancienne pierre tombale (pseudo, titre) : comparaison exacte
+        (MySQL compare sans tenir compte de la casse), et seulement si une seule ligne correspond.
+        """
+        model = key_column.class_
+        keys = set(keys)
+        if not keys:
+            return []
+        matches = {}
+        for row_id, value in self.session.execute(select(model.id, key_column).where(key_column.in_(keys))):
+            if value in keys:
+                matches.setdefault(value, []).append(row_id)
+        return [ids[0] for ids in matches.values() if len(ids) == 1]
+
+    def _import_deleted(self, rows):
+        keys = {name: set() for name in SECTIONS}
+        for r in rows:
+            if r.get('table') in keys:
+                keys[r['table']].add((r['key'], r.get('parent_key')))
+
+        # Éléments de liste : clé (public_id de la liste, uid du film), ou titre exact pour les anciennes pierres tombales
+        if keys['list_items']:
+            pairs = {(parent, key) for key, parent in keys['list_items']}
+            candidates = self.session.execute(
+                select(ListItem.id, List.public_id, Movie.uid, Movie.title)
+                .join(List, List.id == ListItem.list_id).join(Movie, Movie.id == ListItem.movie_id)
+                .where(List.public_id.in_({parent for parent, _ in pairs}),
+                       or_(Movie.uid.in_({key for _, key in pairs}), Movie.title.in_({key for _, key in pairs})))
+            ).all()
+            targets, legacy = [], {}
+            for item_id, public_id, uid, title in candidates:
+                if (public_id, uid) in pairs:
+                    targets.append(item_id)
+                elif (public_id, title) in pairs:
+                    legacy.setdefault((public_id, title), []).append(item_id)
+            # Titre porté par un seul élément de la liste : pas d'ambiguïté
+            targets.extend(ids[0] for ids in legacy.values() if len(ids) == 1)
+            self._scores(leaderboard.remove_items, targets)
+            delete_list_items(self.session, targets)
+        if keys['lists']:
+            list_ids = list(self._lookup(List.public_id, [k for k, _ in keys['lists']]).values())
+            if list_ids:
+                self._scores(leaderboard.remove_items, self._item_ids(ListItem.list_id.in_(list_ids)))
+            delete_lists(self.session, list_ids)
+        for name, key_column, delete, owned in (
+            ('users', User.username, delete_users, lambda ids: ListItem.list_id.in_(select(List.id).where(List.user_id.in_(ids)))),
+            # Le score des films supprimés disparaît avec eux (ON DELETE CASCADE)
+            ('movies', Movie.title, delete_movies, ListItem.movie_id.in_),
+        ):
+            if not keys[name]:
+                continue
+            model = key_column.class_
+            by_uid = self._lookup(model.uid, [k for k, _ in keys[name]])
+            ids = list(by_uid.values()) + self._unambiguous(key_column, [k for k, _ in keys[name] if k not in by_uid])
+            if ids:
+                self._scores(leaderboard.remove_items, self._item_ids(owned(ids)))
+            delete(self.session, ids)
+        if keys['movies']:
+            self._movie_ids = None
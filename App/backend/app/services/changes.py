@@ -0,0 +1,178 @@
+from datetime import datetime
+
+from sqlalchemy import event, select, delete, bindparam, literal
+from sqlalchemy import inspect as sa_inspect
+from sqlalchemy.orm.util import identity_key
+
+from app.models import User, List, ListItem, Change
+from app.replica import RoutingSession
+
+# Journal des modifications par utilisateur, pour la synchronisation incrémentale (GET /api/sync).
+# Chaque flush qui touche des listes ou des éléments incrémente users.change_seq des propriétaires
+# concernés, puis journalise les lignes touchées avec le nouveau numéro. La mise à jour verrouille
+# la ligne de l'utilisateur jusqu'au commit : les numéros d'un utilisateur sont validés dans
+# l'ordre, sans trou, et un client qui a reçu le numéro N a vu toutes les modifications <= N.
+
+LIST, ITEM, RESET = 'list', 'item', 'reset'
+
+_users = User.__table__
+_changes = Change.__table__
+_COLUMNS = ['seq', 'user_id', 'entity', 'entity_id', 'list_id', 'created_at']
+
+# updated_at inchangé : avancer la séquence ne doit pas faire apparaître l'utilisateur dans l'export incrémental
+_bump_one = _users.update().values(
+    change_seq=_users.c.change_seq + 1, updated_at=_users.c.updated_at
+).where(_users.c.id == bindparam('b_user_id'))
+
+# Ligne du journal portant le numéro courant de l'utilisateur (relu dans la même requête)
+_insert_one = _changes.insert().from_select(_COLUMNS, select(
+    _users.c.change_seq, _users.c.id, bindparam('c_entity'), bindparam('c_entity_id'),
+    bindparam('c_list_id'), bindparam('c_created_at'),
+).where(_users.c.id == bindparam('c_user_id')))
+
+
+def _old_value(state, name):
+    history = state.attrs[name].history
+    return history.deleted[0] if history.deleted else state.dict.get(name)
+
+
+def _owners(session, list_ids):
+    """{list_id: user_id}, depuis les listes déjà en session, sinon par une requête groupée."""
+    owners, missing = {}, []
+    for list_id in list_ids:
+        movie_list = session.identity_map.get(identity_key(List, list_id))
+        if movie_list is not None and 'user_id' in sa_inspect(movie_list).dict:
+            owners[list_id] = movie_list.user_id
+        else:
+            missing.append(list_id)
+    if missing:
+        owners.update(session.connection().execute(
+            select(List.id, List.user_id).where(List.id.in_(missing))
+        ).all())
+    return owners
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _record_changes(session, flush_context):
+    """
+    Journalise les listes et éléments créés, modifiés ou supprimés pendant le flush :
+    une mise à jour des séquences et une insertion groupées (executemany).
+    Les écritures ensemblistes passent par record_items / record_lists.
+    """
+    lists, items = {}, {}
+    deleted_lists = set()
+
+    for obj in session.new:
+        if isinstance(obj, List):
+            lists[obj.id] = obj.user_id
+        elif isinstance(obj, ListItem):
+            items[obj.id] = obj.list_id
+
+    for obj in session.dirty:
+        if isinstance(obj, (List, ListItem)) and session.is_modified(obj, include_collections=False):
+            if isinstance(obj, List):
+                lists[obj.id] = obj.user_id
+            else:
+                items[obj.id] = obj.list_id
+
+    for obj in session.deleted:
+        # Valeurs déjà chargées uniquement (l'objet n'existe plus en base)
+        state = sa_inspect(obj)
+        if isinstance(obj, List) and state.dict.get('user_id'):
+            lists[obj.id] = state.dict['user_id']
+            deleted_lists.add(obj.id)
+        elif isinstance(obj, ListItem) and _old_value(state, 'list_id'):
+            items[obj.id] = _old_value(state, 'list_id')
+
+    # Les éléments d'une liste supprimée dans ce flush sont couverts par la suppression de la liste
+    items = {item_id: list_id for item_id, list_id in items.items() if list_id not in deleted_lists}
+    if not lists and not items:
+        return
+
+    owners = _owners(session, {list_id for list_id in items.values()})
+    now = datetime.utcnow()
+    rows = [
+        {"c_user_id": user_id, "c_entity": LIST, "c_entity_id": list_id, "c_list_id": list_id, "c_created_at": now}
+        for list_id, user_id in lists.items()
+    ] + [
+        {"c_user_id": owners[list_id], "c_entity": ITEM, "c_entity_id": item_id, "c_list_id": list_id, "c_created_at": now}
+        for item_id, list_id in items.items() if list_id in owners
+    ]
+    if not rows:
+        return
+
+    connection = session.connection()
+    connection.execute(_bump_one, [{"b_user_id": user_id} for user_id in {row["c_user_id"] for row in rows}])
+    connection.execute(_insert_one, rows)
+
+
+def _record(session, owners, rows):
+    # Séquence des propriétaires (tous si owners est None) avancée, puis une ligne par ligne touchée
+    bump = _users.update().values(change_seq=_users.c.change_seq + 1, updated_at=_users.c.updated_at)
+    if owners is not None:
+        bump = bump.where(_users.c.id.in_(owners))
+    session.execute(bump)
+    session.execute(_changes.insert().from_select(_COLUMNS, rows))
+
+
+def record_items(session, *criteria):
+    """
+    Journalise les éléments de liste répondant aux critères, pour les écritures ensemblistes
+    (purge, fusion de doublons). À appeler avant une suppression : l'état n'est pas lu.
+    """
+    owners = select(List.user_id).join(ListItem, ListItem.list_id == List.id).where(*criteria)
+    rows = (
+        select(User.change_seq, User.id, literal(ITEM), ListItem.id, ListItem.list_id, literal(datetime.utcnow()))
+        .select_from(ListItem).join(List, List.id == ListItem.list_id).join(User, User.id == List.user_id)
+        .where(*criteria)
+    )
+    _record(session, owners, rows)
+
+
+def record_lists(session, *criteria):
+    """Journalise les listes répondant aux critères (écritures ensemblistes, avant suppression)."""
+    owners = select(List.user_id).where(*criteria)
+    rows = (
+        select(User.change_seq, User.id, literal(LIST), List.id, List.id, literal(datetime.utcnow()))
+        .select_from(List).join(User, User.id == List.user_id)
+        .where(*criteria)
+    )
+    _record(session, owners, rows)
+
+
+def reset(session):
+    """
+    Demande à tous les clients une resynchronisation complète (après un import : les insertions
+    groupées ne sont pas journalisées ligne à ligne).
+    """
+    _record(session, None, select(
+        User.change_seq, User.id, literal(RESET), literal(None), literal(None), literal(datetime.utcnow())
+    ))
+
+
+def changes_since(session, user_id, cursor):
+    """
+    Modifications de l'utilisateur postérieures au curseur.
+    Renvoie (nouveau curseur, {(entité, id): list_id}) ou (nouveau curseur, None) si le client doit
+    tout recharger (curseur absent, inconnu, ou plus ancien que le journal conservé).
+    """
+    current = session.scalar(select(User.change_seq).where(User.id == user_id)) or 0
+    if not cursor or cursor > current:
+        return current, None
+    if cursor == current:
+        return current, {}
+    # Borné au numéro lu : les modifications en cours de validation seront vues au prochain appel
+    rows = session.execute(
+        select(Change.seq, Change.entity, Change.entity_id, Change.list_id)
+        .where(Change.user_id == user_id, Change.seq > cursor, Change.seq <= current)
+        .order_by(Change.seq)
+    ).all()
+    # Les numéros se suivent sans trou : un premier numéro manquant signifie un journal élagué
+    if not rows or rows[0].seq != cursor + 1 or any(row.entity == RESET for row in rows):
+        return current, None
+    return current, {(row.entity, row.entity_id): row.list_id for row in rows}
+
+
+def prune(session, before):
+    """Supprime les entrées du journal antérieures à before (les clients plus anciens rechargent tout)."""
+    return session.execute(delete(Change).where(Change.created_at < before)).rowcount
@@ -0,0 +1,151 @@
+from bisect import bisect_left
+from datetime import datetime, timedelta
+from itertools import accumulate
+import random
+import uuid
+
+from sqlalchemy import func, select
+
+from app.models import User, Movie, List, ListItem, natural_uid
+from app.services.bulk_import import chunked
+
+# Génération de données synthétiques à l'échelle de la production (commande flask generate-data).
+# À graine égale et base vide, le résultat est identique d'une exécution à l'autre.
+
+# Exposant de la loi de Zipf pour la popularité des films (le film de rang k a un poids 1/k^s)
+DEFAULT_ZIPF_EXPONENT = 1.1
+
+# Paramètre de la loi de Pareto pour la taille des listes (plus il est faible, plus la traîne est longue)
+DEFAULT_PARETO_ALPHA = 1.3
+
+# Date de référence fixe : les dates générées ne dépendent pas de l'heure d'exécution
+REFERENCE_DATE = datetime(2024, 1, 1)
+
+COMMENTS = (
+    "Un classique.", "À revoir absolument.", "Surcoté selon moi.", "Meilleure bande originale.",
+    "Vu au cinéma à sa sortie.", "La fin est incroyable.", "Un peu long.", "Mon préféré du réalisateur.",
+)
+
+
+class ZipfSampler:
+    """Tirage d'indices 0..n-1 selon une loi de Zipf (0 = le plus fréquent), par recherche dichotomique dans les poids cumulés."""
+
+    def __init__(self, n, exponent, rng):
+        self.rng = rng
+        self.cumulative = list(accumulate(1.0 / k ** exponent for k in range(1, n + 1)))
+        self.total = self.cumulative[-1]
+
+    def sample(self):
+        return bisect_left(self.cumulative, self.rng.random() * self.total)
+
+    def sample_distinct(self, count):
+        """
+        Tire count indices distincts. Au-delà d'un certain nombre de rejets
+        (listes très longues), les rangs manquants sont complétés uniformément.
+        """
+        count = min(count, len(self.cumulative))
+        chosen = {}
+        attempts = 0
+        while len(chosen) < count and attempts < count * 4:
+            chosen.setdefault(self.sample(), None)
+            attempts += 1
+        while len(chosen) < count:
+            chosen.setdefault(self.rng.randrange(len(self.cumulative)), None)
+        return list(chosen)
+
+
+def list_sizes(list_count, item_count, max_size, alpha, rng):
+    """Répartit item_count éléments entre list_count listes selon une loi de Pareto (longue traîne)."""
+    weights = [rng.paretovariate(alpha) for _ in range(list_count)]
+    scale = item_count / sum(weights)
+    sizes = [min(max_size, max(1, int(w * scale))) for w in weights]
+    # Correction de l'arrondi : le reliquat est réparti sur les listes non pleines
+    remaining = item_count - sum(sizes)
+    while remaining > 0:
+        open_lists = [i for i, size in enumerate(sizes) if size < max_size]
+        if not open_lists:
+            break
+        share = max(1, remaining // len(open_lists))
+        for i in open_lists:
+            added = min(share, max_size - sizes[i], remaining)
+            sizes[i] += added
+            remaining -= added
+            if not remaining:
+                break
+    return sizes
+
+
+def _next_id(session, model):
+    return (session.scalar(select(func.max(model.id))) or 0) + 1
+
+
+def _random_date(rng):
+    return REFERENCE_DATE - timedelta(seconds=rng.randrange(3 * 365 * 24 * 3600))
+
+
+def generate(session, password_hash, users=100, movies=1000, lists=500, items=10000, seed=42,
+             comment_ratio=0.2, zipf_exponent=DEFAULT_ZIPF_EXPONENT, pareto_alpha=DEFAULT_PARETO_ALPHA,
+             chunk_size=10000, progress=None):
+    """
+    Insère users utilisateurs, movies films, lists listes et environ items éléments de liste,
+    par insertions groupées de chunk_size lignes (une transaction par bloc).
+    Tous les utilisateurs partagent password_hash : bcrypt n'est calculé qu'une fois.
+    Renvoie le nombre de lignes créées par table.
+    """
+    rng = random.Random(seed)
+    progress = progress or (lambda name, count: None)
+    counts = {}
+
+    # Les IDs sont attribués explicitement à la suite des lignes existantes
+    first_user = _next_id(session, User)
+    first_movie = _next_id(session, Movie)
+    first_list = _next_id(session, List)
+
+    def insert(model, name, rows):
+        total = 0
+        for chunk in chunked(rows, chunk_size):
+            session.execute(model.__table__.insert(), chunk)
+            session.commit()
+            total += len(chunk)
+            progress(name, total)
+        counts[name] = total
+
+    insert(User, 'users', (
+        {"id": first_user + i, "username": f"user{first_user + i}", "uid": natural_uid('user', f"user{first_user + i}"),
+         "password_hash": password_hash,
+         "created_at": _random_date(rng), "updated_at": REFERENCE_DATE}
+        for i in range(users)
+    ))
+
+    # Le film d'ID first_movie est le plus populaire (rang 1 de la loi de Zipf)
+    insert(Movie, 'movies', (
+        {"id": first_movie + i, "title": f"Film {first_movie + i}", "uid": natural_uid('movie', f"Film {first_movie + i}"),
+         "release_date": str(1930 + rng.randrange(95)),
+         "is_custom": rng.random() < 0.05, "updated_at": REFERENCE_DATE}
+        for i in range(movies)
+    ))
+
+    insert(List, 'lists', (
+        {"id": first_list + i, "user_id": first_user + rng.randrange(users), "name": f"Liste {first_list + i}",
+         "public_id": str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+         "private_id": str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+         "is_public": rng.random() < 0.8, "created_at": _random_date(rng), "updated_at": REFERENCE_DATE}
+        for i in range(lists)
+    ))
+
+    sampler = ZipfSampler(movies, zipf_exponent, rng)
+    sizes = list_sizes(lists, items, movies, pareto_alpha, rng)
+
+    def list_items():
+        for offset, size in enumerate(sizes):
+            for rank, movie_index in enumerate(sampler.sample_distinct(size), 1):
+                yield {
+                    "list_id": first_list + offset,
+                    "movie_id": first_movie + movie_index,
+                    "rank": rank,
+                    "comment": rng.choice(COMMENTS) if rng.random() < comment_ratio else None,
+                    "updated_at": REFERENCE_DATE,
+                }
+
+    insert(ListItem, 'list_items', list_items())
+    return counts
@@ -0,0 +1,175 @@
+from bisect import bisect_left
+from collections import defaultdict
+import math
+import re
+import unicodedata
+
+from sqlalchemy import select, update, delete, func, or_, and_
+from sqlalchemy.orm import aliased
+
+from app.models import ListItem
+from app.services import leaderboard, changes
+
+# Détection des films personnalisés en double ("Inception ", "inception (2010)", "Incepton").
+# Les titres sont normalisés puis découpés en trigrammes, comparés par similarité de Dice.
+# Blocage par filtrage de préfixe : les trigrammes de chaque titre sont triés du plus rare au
+# plus fréquent, et deux titres assez similaires partagent forcément un trigramme parmi les
+# premiers de chacun. Seuls ces préfixes (courts et rares) sont indexés : les paires candidates
+# sont peu nombreuses et la comparaison exacte ne porte que sur elles, loin des O(n²) paires.
+
+NGRAM = 3
+
+# Similarité de Dice minimale entre deux titres pour les considérer comme doublons
+DEFAULT_THRESHOLD = 0.7
+
+_YEAR = re.compile(r'\(?\b((?:18|19|20)\d{2})\b\)?')
+_NON_ALNUM = re.compile(r'[^0-9a-z]+')
+
+
+def normalize_title(title):
+    """
+    Titre normalisé et année éventuelle : sans accents, en minuscules, ponctuation et année
+    entre parenthèses retirées ("Inception (2010) " -> ("inception", "2010")).
+    """
+    text = unicodedata.normalize('NFKD', title or '')
+    text = ''.join(c for c in text if not unicodedata.combining(c)).lower()
+    years = _YEAR.findall(text)
+    year = years[-1] if years and _NON_ALNUM.sub('', _YEAR.sub('', text)) else None
+    if year:
+        text = _YEAR.sub(' ', text)
+    return _NON_ALNUM.sub(' ', text).strip(), year
+
+
+def ngrams(text, n=NGRAM):
+    """Ensemble des n-grammes d'un titre normalisé (avec marqueurs de début et de fin)."""
+    padded = f"{' ' * (n - 1)}{text} "
+    return {padded[i:i + n] for i in range(len(padded) - n + 1)}
+
+
+def _release_year(release_date):
+    match = re.match(r'\s*(\d{4})', release_date or '')
+    return match.group(1) if match else None
+
+
+class _UnionFind:
+    def __init__(self):
+        self.parent = {}
+
+    def find(self, x):
+        self.parent.setdefault(x, x)
+        while self.parent[x] != x:
+            self.parent[x] = self.parent[self.parent[x]]
+            x = self.parent[x]
+        return x
+
+    def union(self, a, b):
+        self.parent[self.find(a)] = self.find(b)
+
+
+def _prefix_length(size, overlap_ratio):
+    # Nombre de trigrammes (les plus rares) à indexer pour ne manquer aucune paire au-dessus du seuil
+    return size - math.ceil(overlap_ratio * size - 1e-9) + 1
+
+
+def find_clusters(movies, threshold=DEFAULT_THRESHOLD):
+    """
+    Regroupe les films probablement identiques.
+    movies : itérable de (id, titre, date de sortie). Renvoie une liste de groupes
+    {id: meilleure similarité avec un autre membre} (groupes d'au moins deux films).
+    Deux films d'années connues et différentes ne sont jamais rapprochés.
+    """
+    grams, years = {}, {}
+    frequency = defaultdict(int)
+    for movie_id, title, release_date in movies:
+        key, year = normalize_title(title)
+        if not key:
+            continue
+        grams[movie_id] = ngrams(key)
+        years[movie_id] = _release_year(release_date) or year
+        for gram in grams[movie_id]:
+            frequency[gram] += 1
+
+    # Dice >= t équivaut à Jaccard >= t / (2 - t) : bornes de taille et de préfixe de Jaccard
+    ratio = threshold / (2 - threshold)
+    postings = defaultdict(lambda: ([], []))
+    union = _UnionFind()
+    best = defaultdict(float)
+
+    # Titres traités par taille croissante : les candidats déjà indexés sont plus courts ou égaux
+    for movie_id in sorted(grams, key=lambda m: (len(grams[m]), m)):
+        movie_grams = grams[movie_id]
+        size = len(movie_grams)
+        prefix = sorted(movie_grams, key=lambda g: (frequency[g], g))[:_prefix_length(size, ratio)]
+        candidates = set()
+        for gram in prefix:
+            # Index trié par taille : les titres trop courts pour atteindre le seuil sont sautés d'un coup
+            sizes, ids = postings[gram]
+            candidates.update(ids[bisect_left(sizes, ratio * size - 1e-9):])
+            sizes.append(size)
+            ids.append(movie_id)
+
+        for other in candidates:
+            if years[movie_id] and years[other] and years[movie_id] != years[other]:
+                continue
+            similarity = 2 * len(movie_grams & grams[other]) / (size + len(grams[other]))
+            if similarity >= threshold:
+                union.union(movie_id, other)
+                best[movie_id] = max(best[movie_id], similarity)
+                best[other] = max(best[other], similarity)
+
+    groups = defaultdict(dict)
+    for movie_id in union.parent:
+        groups[union.find(movie_id)][movie_id] = round(best[movie_id], 3)
+    return [members for members in groups.values() if len(members) > 1]
+
+
+def item_counts(session, movie_ids):
+    """Nombre d'éléments de liste référençant chaque film (une requête groupée)."""
+    if not movie_ids:
+        return {}
+    return dict(session.execute(
+        select(ListItem.movie_id, func.count())
+        .where(ListItem.movie_id.in_(movie_ids))
+        .group_by(ListItem.movie_id)
+    ).all())
+
+
+def merge(session, canonical_id, duplicate_ids):
+    """
+    Fusionne des doublons dans le film canonique, de façon ensembliste :
+    - quand une même liste contient plusieurs films du groupe (canonique compris), seul
+      l'élément le mieux classé est gardé, les autres sont supprimés ;
+    - tous les autres éléments sont repointés vers le film canonique en un seul UPDATE.
+    Le classement et le journal des modifications sont ajustés en conséquence. Ne valide pas la transaction.
+    Renvoie (éléments repointés, éléments supprimés).
+    """
+    members = [canonical_id] + list(duplicate_ids)
+    other = aliased(ListItem)
+    # Un élément est redondant si la même liste contient un élément du groupe mieux placé
+    # (meilleur rang, puis plus petit ID) ; l'élément du film canonique peut donc être supprimé
+    better = or_(
+        other.rank < ListItem.rank,
+        and_(other.rank == ListItem.rank, other.id < ListItem.id),
+    )
+    redundant = session.scalars(
+        select(ListItem.id).distinct()
+        .join(other, and_(other.list_id == ListItem.list_id, other.id != ListItem.id))
+        .where(ListItem.movie_id.in_(members), other.movie_id.in_(members), better)
+    ).all()
+    remaining = select(ListItem.id).where(ListItem.movie_id.in_(duplicate_ids))
+    if redundant:
+        remaining = remaining.where(ListItem.id.notin_(redundant))
+    moved = session.scalars(remaining).all()
+
+    leaderboard.remove_items(session, redundant + moved)
+    if redundant or moved:
+        changes.record_items(session, ListItem.id.in_(redundant + moved))
+    if redundant:
+        session.execute(delete(ListItem).where(ListItem.id.in_(redundant)).execution_options(synchronize_session=False))
+    if moved:
+        session.execute(
+            update(ListItem).where(ListItem.id.in_(moved)).values(movie_id=canonical_id)
+            .execution_options(synchronize_session=False)
+        )
+        leaderboard.add_items(session, moved)
+    return len(moved), len(redundant)
@@ -0,0 +1,158 @@
+from datetime import datetime, timezone
+import json
+
+from sqlalchemy import select, or_
+
+from app.models import User, Movie, List, ListItem, Tombstone
+from app.services.bulk_import import chunked
+
+EXPORT_VERSION = "1.0"
+
+# Nombre de lignes lues par aller-retour lors du parcours des tables
+FETCH_SIZE = 1000
+
+
+def parse_since(value):
+    """
+    Convertit le paramètre since (ISO 8601) en datetime UTC naïf, comme les colonnes updated_at.
+    Lève ValueError si le format est invalide.
+    """
+    since = datetime.fromisoformat(value)
+    if since.tzinfo:
+        since = since.astimezone(timezone.utc).replace(tzinfo=None)
+    return since
+
+
+def _iso(value):
+    return value.isoformat() if value else None
+
+
+def _stream(session, statement):
+    return session.execute(statement.execution_options(yield_per=FETCH_SIZE))
+
+
+def iter_users(session, where=None):
+    statement = select(User.id, User.uid, User.username, User.password_hash, User.created_at).order_by(User.id)
+    if where is not None:
+        statement = statement.where(where)
+    for row in _stream(session, statement):
+        yield {
+            "id": row.id,
+            "uid": row.uid,
+            "username": row.username,
+            "password_hash": row.password_hash, # Export du hash pour pouvoir restaurer à l'identique
+            "created_at": _iso(row.created_at)
+        }
+
+
+def iter_movies(session, where=None):
+    statement = select(Movie.id, Movie.uid, Movie.title, Movie.poster_path, Movie.release_date, Movie.is_custom).order_by(Movie.id)
+    if where is not None:
+        statement = statement.where(where)
+    for row in _stream(session, statement):
+        yield {
+            "id": row.id,
+            "uid": row.uid,
+            "title": row.title,
+            "poster_path": row.poster_path,
+            "release_date": row.release_date,
+            "is_custom": row.is_custom
+        }
+
+
+def iter_lists(session, where=None):
+    statement = select(
+        List.id, List.user_id, List.name, List.public_id, List.private_id, List.is_public, List.created_at
+    ).order_by(List.id)
+    if where is not None:
+        statement = statement.where(where)
+    for row in _stream(session, statement):
+        yield {
+            "id": row.id,
+            "user_id": row.user_id,
+            "name": row.name,
+            "public_id": row.public_id,
+            "private_id": row.private_id,
+            "is_public": row.is_public,
+            "created_at": _iso(row.created_at)
+        }
+
+
+def iter_list_items(session, where=None):
+    statement = select(ListItem.id, ListItem.list_id, ListItem.movie_id, ListItem.rank, ListItem.comment).order_by(ListItem.id)
+    if where is not None:
+        statement = statement.where(where)
+    for row in _stream(session, statement):
+        yield {
+            "id": row.id,
+            "list_id": row.list_id,
+            "movie_id": row.movie_id,
+            "rank": row.rank,
+            "comment": row.comment
+        }
+
+
+def iter_deleted(session, since):
+    statement = select(Tombstone).where(Tombstone.deleted_at > since).order_by(Tombstone.id)
+    for tombstone in session.execute(statement).scalars():
+        yield {
+            "table": tombstone.table_name,
+            "key": tombstone.key,
+            "parent_key": tombstone.parent_key,
+            "deleted_at": _iso(tombstone.deleted_at)
+        }
+
+
+def iter_sections(session, since=None):
+    """
+    Produit les sections de l'export (nom, itérateur de lignes) dans l'ordre des dépendances.
+    Avec since, seules les lignes modifiées depuis cette date sont exportées, ainsi que
+    les lignes parentes qu'elles référencent (pour que l'import puisse résoudre les IDs),
+    précédées des suppressions ("deleted") à rejouer en premier.
+    """
+    if since is None:
+        yield "users", iter_users(session)
+        yield "movies", iter_movies(session)
+        yield "lists", iter_lists(session)
+        yield "list_items", iter_list_items(session)
+        return
+
+    changed_items = ListItem.updated_at > since
+    item_lists = select(ListItem.list_id).where(changed_items)
+    item_movies = select(ListItem.movie_id).where(changed_items)
+    lists_filter = or_(List.updated_at > since, List.id.in_(item_lists))
+    list_owners = select(List.user_id).where(lists_filter)
+
+    yield "deleted", iter_deleted(session, since)
+    yield "users", iter_users(session, or_(User.updated_at > since, User.id.in_(list_owners)))
+    yield "movies", iter_movies(session, or_(Movie.updated_at > since, Movie.id.in_(item_movies)))
+    yield "lists", iter_lists(session, lists_filter)
+    yield "list_items", iter_list_items(session, changed_items)
+
+
+def iter_json(session, since=None, progress=None):
+    """
+    Sérialise l'export en JSON au fil de l'eau, par blocs de FETCH_SIZE lignes,
+    sans construire le document complet en mémoire.
+    progress(section, lignes) est appelé après chaque bloc.
+    """
+    # La date d'export est prise avant la lecture : elle sert de "since" à la sauvegarde suivante
+    header = {
+        "version": EXPORT_VERSION,
+        "exported_at": datetime.utcnow().isoformat()
+    }
+    if since:
+        header["since"] = since.isoformat()
+    yield json.dumps(header)[:-1]
+
+    # Sections dans l'ordre des dépendances (l'import peut ainsi les traiter au fil de l'eau)
+    for name, rows in iter_sections(session, since):
+        yield f', "{name}": ['
+        separator = ''
+        for chunk in chunked(rows, FETCH_SIZE):
+            yield separator + ', '.join(json.dumps(row) for row in chunk)
+            separator = ', '
+            if progress:
+                progress(name, len(chunk))
+        yield ']'
+    yield '}'
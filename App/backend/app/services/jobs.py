@@ -0,0 +1,296 @@
+from datetime import datetime, timedelta
+import json
+import logging
+import os
+import shutil
+import socket
+import threading
+
+from sqlalchemy import select, update, or_, and_, func
+
+from app.models import Job
+from app.services.bulk_import import BulkImporter, SECTIONS
+from app.services.export import iter_json, parse_since
+from app.services.json_stream import iter_object
+from app.services.snapshot import write_snapshot, iter_snapshot, SNAPSHOT_MIMETYPE
+
+# Tâches d'administration en arrière-plan (import, export).
+# La requête HTTP enregistre la tâche (et le fichier à importer) puis répond aussitôt ;
+# des threads d'exécution (dans chaque worker Gunicorn, ou un processus "flask run-jobs"
+# dédié) se réservent les tâches en attente par une mise à jour conditionnelle en base.
+# Le worker en charge rafraîchit heartbeat_at ; une tâche dont le heartbeat est trop ancien
+# (worker tué, conteneur redémarré) est reprise depuis le fichier d'entrée conservé.
+
+PENDING, RUNNING, SUCCEEDED, FAILED = 'pending', 'running', 'succeeded', 'failed'
+KINDS = ('import', 'export')
+FORMATS = ('json', 'sqlite')
+
+RESULT_MIMETYPES = {
+    'json': 'application/json',
+    'sqlite': SNAPSHOT_MIMETYPE,
+}
+
+logger = logging.getLogger(__name__)
+
+
+class JobLost(Exception):
+    """La tâche a été reprise par un autre worker (heartbeat jugé trop ancien)."""
+
+
+def input_path(jobs_dir, job_id):
+    return os.path.join(jobs_dir, f'{job_id}.input')
+
+
+def result_path(jobs_dir, job_id, fmt):
+    return os.path.join(jobs_dir, f'{job_id}.{fmt}')
+
+
+def to_dict(job):
+    params = json.loads(job.params or '{}')
+    return {
+        "id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "params": params,
+        "progress": json.loads(job.progress or '{}'),
+        "rows": job.rows,
+        "result": json.loads(job.result) if job.result else None,
+        "error": job.error,
+        "attempts": job.attempts,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+        "download": job.status == SUCCEEDED and job.kind == 'export',
+    }
+
+
+def submit(session, kind, params, job_id=None):
+    """Enregistre une tâche en attente et renvoie son ID (le fichier d'entrée est déjà sur disque)."""
+    job = Job(id=job_id, kind=kind, status=PENDING, params=json.dumps(params))
+    session.add(job)
+    session.commit()
+    return job.id
+
+
+def claim(session, worker, stale_seconds, max_attempts):
+    """
+    Réserve la plus ancienne tâche disponible (en attente, ou abandonnée par un worker arrêté).
+    La mise à jour est conditionnelle : si deux workers visent la même tâche, un seul l'obtient.
+    Renvoie l'ID de la tâche réservée, ou None.
+    """
+    now = datetime.utcnow()
+    stale = and_(Job.status == RUNNING, Job.heartbeat_at < now - timedelta(seconds=stale_seconds))
+
+    # Tâches ayant fait tomber trop de workers : abandonnées plutôt que relancées indéfiniment
+    session.execute(
+        update(Job).where(stale, Job.attempts >= max_attempts)
+        .values(status=FAILED, error=f"Abandoned after {max_attempts} attempts", finished_at=now)
+    )
+    session.commit()
+
+    claimable = or_(Job.status == PENDING, stale)
+    candidates = session.scalars(select(Job.id).where(claimable).order_by(Job.created_at).limit(5)).all()
+    for job_id in candidates:
+        claimed = session.execute(
+            update(Job).where(Job.id == job_id, claimable)
+            .values(status=RUNNING, worker=worker, attempts=Job.attempts + 1, heartbeat_at=now,
+                    started_at=func.coalesce(Job.started_at, now), error=None)
+        )
+        session.commit()
+        if claimed.rowcount == 1:
+            return job_id
+    return None
+
+
+class Heartbeat:
+    """
+    Compteurs de progression d'une tâche, écrits en base avec le heartbeat toutes les
+    interval secondes par un thread et une connexion à part (la transaction de la tâche
+    n'est pas concernée). Si la tâche a été reprise par un autre worker, la progression
+    suivante lève JobLost pour interrompre ce worker-ci.
+    """
+
+    def __init__(self, engine, job_id, worker, interval):
+        self.engine = engine
+        self.job_id = job_id
+        self.worker = worker
+        self.interval = interval
+        self.counts = dict.fromkeys(SECTIONS, 0)
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f'job-heartbeat-{job_id}', daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def add(self, section, count):
+        if self.lost:
+            raise JobLost(self.job_id)
+        self.counts[section] = self.counts.get(section, 0) + count
+
+    def values(self):
+        counts = dict(self.counts)
+        return {"progress": json.dumps(counts), "rows": sum(counts.values())}
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                with self.engine.begin() as conn:
+                    updated = conn.execute(
+                        update(Job).where(Job.id == self.job_id, Job.worker == self.worker)
+                        .values(heartbeat_at=datetime.utcnow(), **self.values())
+                    )
+                if updated.rowcount == 0:
+                    self.lost = True
+                    return
+            except Exception as e:
+                # Base momentanément indisponible (ou verrouillée sous SQLite) : nouvel essai au prochain tour
+                logger.warning("Job heartbeat failed: %s", e)
+
+
+def _run_import(session, params, path, progress, chunk_size):
+    # Validation à chaque paquet : une reprise après arrêt ne rejoue que les lignes non validées
+    # (les lignes déjà importées sont reconnues par leur clé naturelle et ignorées)
+    def on_chunk(section, count):
+        progress.add(section, count)
+        session.commit()
+
+    importer = BulkImporter(session, chunk_size=chunk_size, on_chunk=on_chunk)
+    if params.get('format') == 'sqlite':
+        meta, sections = iter_snapshot(path)
+        importer.update_existing = bool(meta.get('since'))
+        for name, rows in sections:
+            importer.feed(name, rows)
+    else:
+        has_data = False
+        with open(path, 'rb') as stream:
+            for key, value in iter_object(stream):
+                has_data = True
+                if key == 'since' and value:
+                    importer.update_existing = True
+                if key in SECTIONS:
+                    importer.feed(key, value)
+        if not has_data:
+            raise ValueError("No data provided")
+    importer.finish()
+    session.commit()
+    return {"counts": importer.counts}
+
+
+def _run_export(session, params, path, progress, chunk_size):
+    since = parse_since(params['since']) if params.get('since') else None
+    if params.get('format') == 'sqlite':
+        snapshot = write_snapshot(session, since, chunk_size=chunk_size, progress=progress.add)
+        shutil.move(snapshot, path)
+    else:
+        # Écriture dans un fichier partiel renommé à la fin : un résultat présent est toujours complet
+        partial = f'{path}.part'
+        with open(partial, 'w', encoding='utf-8') as target:
+            for block in iter_json(session, since, progress=progress.add):
+                target.write(block)
+        os.replace(partial, path)
+    session.rollback()
+    return {"counts": dict(progress.counts), "size": os.path.getsize(path)}
+
+
+class JobRunner:
+    """
+    Exécution des tâches : threads démarrés à la demande dans chaque processus
+    (JOBS_WORKERS par processus, 0 = aucun, les tâches sont alors exécutées par "flask run-jobs").
+    """
+
+    def __init__(self, app, db):
+        self.app = app
+        self.db = db
+        self._pid = None
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+
+    def start(self):
+        """Démarre les threads de ce processus (une fois par processus : les threads ne survivent pas au fork)."""
+        count = self.app.config['JOBS_WORKERS']
+        with self._lock:
+            if not count or self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            for i in range(count):
+                threading.Thread(target=self._loop, name=f'job-worker-{i}', daemon=True).start()
+
+    def wake(self):
+        """Signale une nouvelle tâche aux threads de ce processus (sinon prise au prochain tour)."""
+        self.start()
+        self._wakeup.set()
+
+    def _loop(self):
+        while True:
+            self._wakeup.wait(self.app.config['JOBS_POLL_INTERVAL'])
+            self._wakeup.clear()
+            with self.app.app_context():
+                try:
+                    while self.run_next():
+                        pass
+                except Exception as e:
+                    logger.exception("Error in job worker")
+                finally:
+                    self.db.session.remove()
+
+    def run_next(self):
+        """Réserve et exécute une tâche. Renvoie False s'il n'y avait rien à faire."""
+        config = self.app.config
+        session = self.db.session
+        worker = f'{socket.gethostname()}:{os.getpid()}:{threading.current_thread().name}'
+        job_id = claim(session, worker, config['JOBS_STALE_SECONDS'], config['JOBS_MAX_ATTEMPTS'])
+        if job_id is None:
+            return False
+        job = session.get(Job, job_id)
+        kind, params = job.kind, json.loads(job.params or '{}')
+        jobs_dir = config['JOBS_DIR']
+        chunk_size = config.get('IMPORT_CHUNK_SIZE', 1000)
+
+        heartbeat = Heartbeat(self.db.engine, job_id, worker, config['JOBS_HEARTBEAT_INTERVAL'])
+        try:
+            with heartbeat:
+                if kind == 'import':
+                    result = _run_import(session, params, input_path(jobs_dir, job_id), heartbeat, chunk_size)
+                else:
+                    path = result_path(jobs_dir, job_id, params.get('format', 'json'))
+                    result = _run_export(session, params, path, heartbeat, chunk_size)
+            status, error = SUCCEEDED, None
+        except JobLost:
+            session.rollback()
+            logger.warning("Job %s was taken over by another worker", job_id)
+            return True
+        except ValueError as e:
+            session.rollback()
+            status, error, result = FAILED, f"Invalid input: {str(e)}", None
+        except Exception as e:
+            session.rollback()
+            logger.exception("Error running job %s", job_id)
+            status, error, result = FAILED, str(e), None
+
+        session.execute(
+            update(Job).where(Job.id == job_id, Job.worker == worker)
+            .values(status=status, error=error, result=json.dumps(result) if result else None,
+                    finished_at=datetime.utcnow(), **heartbeat.values())
+        )
+        session.commit()
+        if kind == 'import' and os.path.exists(input_path(jobs_dir, job_id)):
+            os.remove(input_path(jobs_dir, job_id))
+        return True
+
+
+def init_app(app, db):
+    """Configure le dossier des fichiers de tâches et le JobRunner (app.extensions['jobs'])."""
+    app.config.setdefault('JOBS_DIR', '/tmp/app-jobs')
+    app.config.setdefault('JOBS_WORKERS', 1)
+    app.config.setdefault('JOBS_POLL_INTERVAL', 5)
+    app.config.setdefault('JOBS_HEARTBEAT_INTERVAL', 10)
+    app.config.setdefault('JOBS_STALE_SECONDS', 120)
+    app.config.setdefault('JOBS_MAX_ATTEMPTS', 3)
+    os.makedirs(app.config['JOBS_DIR'], exist_ok=True)
+    app.extensions['jobs'] = JobRunner(app, db)
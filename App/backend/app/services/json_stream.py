@@ -0,0 +1,130 @@
+import codecs
+import json
+
+# Caractères ignorés entre deux jetons JSON
+_WHITESPACE = ' \t\n\r'
+
+# Taille des blocs lus sur le flux d'entrée
+READ_CHUNK_SIZE = 64 * 1024
+
+# Taille maximale d'une valeur isolée (un élément de tableau) gardée en mémoire
+MAX_VALUE_SIZE = 16 * 1024 * 1024
+
+_decoder = json.JSONDecoder()
+
+
+class _Reader:
+    """
+    Tampon de lecture incrémental au-dessus d'un flux binaire (ex: request.stream).
+    Ne conserve en mémoire que la partie du document pas encore consommée.
+    """
+
+    def __init__(self, stream, chunk_size=READ_CHUNK_SIZE):
+        self._stream = stream
+        self._chunk_size = chunk_size
+        self._utf8 = codecs.getincrementaldecoder('utf-8')()
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    def fill(self):
+        """Lit un bloc supplémentaire. Renvoie False si le flux est terminé."""
+        if self.eof:
+            return False
+        data = self._stream.read(self._chunk_size)
+        # On abandonne la partie déjà consommée du tampon
+        if self.pos:
+            self.buf = self.buf[self.pos:]
+            self.pos = 0
+        if not data:
+            self.buf += self._utf8.decode(b'', final=True)
+            self.eof = True
+            return False
+        self.buf += self._utf8.decode(data)
+        if len(self.buf) > MAX_VALUE_SIZE:
+            raise ValueError("JSON value too large")
+        return True
+
+    def peek(self):
+        """Renvoie le prochain caractère significatif ('' en fin de flux)."""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.fill():
+                return ''
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"Expected '{char}' in JSON stream")
+        self.pos += 1
+
+    def value(self):
+        """Décode une valeur JSON complète, en lisant plus de données si nécessaire."""
+        self.peek()
+        while True:
+            try:
+                obj, end = _decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if self.fill():
+                    continue
+                raise
+            # Un nombre en fin de tampon peut être tronqué : on vérifie avec la suite
+            if end == len(self.buf) and self.fill():
+                continue
+            self.pos = end
+            return obj
+
+
+def _iter_array(reader):
+    first = True
+    while True:
+        char = reader.peek()
+        if char == ']':
+            reader.pos += 1
+            return
+        if not first:
+            reader.expect(',')
+        first = False
+        yield reader.value()
+
+
+def iter_object(stream, chunk_size=READ_CHUNK_SIZE):
+    """
+    Parcourt un objet JSON de premier niveau clé par clé sans le charger entièrement.
+    Produit des couples (clé, valeur). Les tableaux sont renvoyés sous forme
+    d'itérateurs paresseux qui doivent être consommés avant de passer à la clé suivante
+    (ils sont vidés automatiquement sinon).
+    Lève ValueError si le document est mal formé.
+    """
+    reader = _Reader(stream, chunk_size)
+    if reader.peek() == '':
+        return
+    reader.expect('{')
+    first = True
+    while True:
+        char = reader.peek()
+        if char == '}':
+            reader.pos += 1
+            return
+        if char == '':
+            raise ValueError("Unexpected end of JSON stream")
+        if not first:
+            reader.expect(',')
+        first = False
+
+        key = reader.value()
+        if not isinstance(key, str):
+            raise ValueError("Invalid JSON object key")
+        reader.expect(':')
+
+        if reader.peek() == '[':
+            reader.pos += 1
+            items = _iter_array(reader)
+            yield key, items
+            # Vidage des éléments non consommés par l'appelant
+            for _ in items:
+                pass
+        else:
+            yield key, reader.value()
@@ -0,0 +1,220 @@
+import logging
+import threading
+import time
+
+from sqlalchemy import event, select, exists, bindparam, case, func, tuple_
+from sqlalchemy import inspect as sa_inspect
+
+from app.models import Movie, List, ListItem, MovieScore
+from app.replica import RoutingSession
+
+# Classement "les plus aimés" : chaque élément d'une liste publique rapporte des points de Borda
+# selon son rang (rang 1 = BORDA_DEPTH points, rang BORDA_DEPTH = 1 point, au-delà 0).
+# Le barème ne dépend que du rang : un ajout ou une suppression ne modifie qu'une ligne du classement.
+BORDA_DEPTH = 10
+
+logger = logging.getLogger(__name__)
+
+_scores = MovieScore.__table__
+
+# Ajout (ou retrait, en négatif) de points au score d'un film
+_increment = _scores.update().values(
+    score=_scores.c.score + bindparam('b_score'),
+    list_count=_scores.c.list_count + bindparam('b_count'),
+).where(_scores.c.movie_id == bindparam('b_movie_id'))
+
+
+def points(rank):
+    return max(0, BORDA_DEPTH - rank + 1) if rank else 0
+
+
+def _points_sql(rank_column):
+    return case((rank_column <= BORDA_DEPTH, BORDA_DEPTH - rank_column + 1), else_=0)
+
+
+def _add(deltas, list_id, movie_id, score, count):
+    delta = deltas.setdefault((list_id, movie_id), [0, 0])
+    delta[0] += score
+    delta[1] += count
+
+
+def _old_value(state, name):
+    history = state.attrs[name].history
+    return history.deleted[0] if history.deleted else state.dict.get(name)
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _apply_deltas(session, flush_context):
+    """
+    Reporte dans movie_scores les éléments ajoutés, supprimés ou déplacés pendant le flush,
+    en une requête groupée (executemany). Les écritures ensemblistes (import, purge) échappent
+    à ce suivi : elles sont corrigées par rebuild().
+    """
+    deltas = {}
+    new_movies = []
+    deleted_movies = []
+    # Listes supprimées dans ce même flush : leur ligne n'existe plus, leur visibilité est lue ici
+    deleted_lists = {obj.id: obj.is_public for obj in session.deleted if isinstance(obj, List)}
+
+    for obj in session.new:
+        if isinstance(obj, Movie):
+            new_movies.append({"movie_id": obj.id})
+        elif isinstance(obj, ListItem):
+            _add(deltas, obj.list_id, obj.movie_id, points(obj.rank), 1)
+
+    for obj in session.deleted:
+        if isinstance(obj, Movie):
+            deleted_movies.append({"b_movie_id": obj.id})
+        elif isinstance(obj, ListItem):
+            # Valeurs déjà chargées uniquement : aucune requête ORM n'est permise pendant le flush
+            values = sa_inspect(obj).dict
+            if values.get('list_id') and values.get('movie_id'):
+                _add(deltas, values['list_id'], values['movie_id'], -points(values.get('rank')), -1)
+
+    for obj in session.dirty:
+        if not isinstance(obj, ListItem):
+            continue
+        state = sa_inspect(obj)
+        if not any(state.attrs[name].history.has_changes() for name in ('rank', 'movie_id', 'list_id')):
+            continue
+        _add(deltas, _old_value(state, 'list_id'), _old_value(state, 'movie_id'), -points(_old_value(state, 'rank')), -1)
+        _add(deltas, obj.list_id, obj.movie_id, points(obj.rank), 1)
+
+    connection = session.connection()
+    if deleted_movies:
+        connection.execute(_scores.delete().where(_scores.c.movie_id == bindparam('b_movie_id')), deleted_movies)
+    if new_movies:
+        connection.execute(_scores.insert(), new_movies)
+
+    live, removed = [], []
+    for (list_id, movie_id), (score, count) in deltas.items():
+        if not score and not count:
+            continue
+        params = {"b_list_id": list_id, "b_movie_id": movie_id, "b_score": score, "b_count": count}
+        if list_id in deleted_lists:
+            if deleted_lists[list_id]:
+                removed.append(params)
+        else:
+            live.append(params)
+    if live:
+        is_public = exists().where(List.id == bindparam('b_list_id'), List.is_public.is_(True))
+        connection.execute(_increment.where(is_public), live)
+    if removed:
+        connection.execute(_increment, removed)
+
+
+def _apply_items(session, item_ids, sign):
+    rows = session.execute(
+        select(ListItem.movie_id, func.sum(_points_sql(ListItem.rank)), func.count())
+        .join(List, List.id == ListItem.list_id)
+        .where(ListItem.id.in_(item_ids), List.is_public.is_(True))
+        .group_by(ListItem.movie_id)
+    ).all()
+    if rows:
+        session.execute(_increment, [
+            {"b_movie_id": movie_id, "b_score": sign * int(score), "b_count": sign * count}
+            for movie_id, score, count in rows
+        ])
+
+
+def remove_items(session, item_ids):
+    """
+    Retire du classement les points d'éléments de liste sur le point d'être supprimés (ou
+    modifiés) par requête ensembliste, invisible pour le suivi par flush : une lecture groupée
+    des points par film, puis une mise à jour groupée (executemany).
+    """
+    _apply_items(session, item_ids, -1)
+
+
+def add_items(session, item_ids):
+    """Ajoute au classement les points d'éléments de liste écrits par requête ensembliste."""
+    _apply_items(session, item_ids, 1)
+
+
+def add_movies(session, movie_ids):
+    """Crée la ligne (à zéro) de films insérés par requête ensembliste."""
+    if movie_ids:
+        session.execute(_scores.insert(), [{"movie_id": movie_id} for movie_id in movie_ids])
+
+
+def rebuild(session):
+    """
+    Recalcule entièrement le classement depuis list_items (une requête INSERT ... SELECT).
+    Corrige la dérive due aux écritures ensemblistes et aux changements de visibilité des listes.
+    """
+    totals = (
+        select(
+            ListItem.movie_id,
+            func.sum(_points_sql(ListItem.rank)).label('score'),
+            func.count(ListItem.list_id.distinct()).label('list_count'),
+        )
+        .join(List, List.id == ListItem.list_id)
+        .where(List.is_public.is_(True))
+        .group_by(ListItem.movie_id)
+        .subquery()
+    )
+    rows = (
+        select(Movie.id, func.coalesce(totals.c.score, 0), func.coalesce(totals.c.list_count, 0))
+        .outerjoin(totals, totals.c.movie_id == Movie.id)
+    )
+    session.execute(_scores.delete())
+    session.execute(_scores.insert().from_select(['movie_id', 'score', 'list_count'], rows))
+    session.commit()
+
+
+def is_empty(session):
+    return session.scalar(select(_scores.c.movie_id).limit(1)) is None
+
+
+def parse_cursor(cursor):
+    """Curseur de pagination "score:movie_id" -> (score, movie_id). Lève ValueError si invalide."""
+    score, movie_id = cursor.split(':')
+    return int(score), int(movie_id)
+
+
+def page(session, limit, cursor=None):
+    """
+    Renvoie une page du classement et le curseur de la suivante (None en fin de classement).
+    Pagination par clé (score, movie_id) sur l'index : coût proportionnel à la page, pas à l'offset.
+    """
+    query = (
+        select(MovieScore, Movie)
+        .join(Movie, Movie.id == MovieScore.movie_id)
+        .where(MovieScore.score > 0)
+    )
+    if cursor:
+        query = query.where(tuple_(MovieScore.score, MovieScore.movie_id) < parse_cursor(cursor))
+    rows = session.execute(
+        query.order_by(MovieScore.score.desc(), MovieScore.movie_id.desc()).limit(limit + 1)
+    ).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1][0]
+        next_cursor = f'{last.score}:{last.movie_id}'
+    return rows, next_cursor
+
+
+def start_periodic_rebuild(app, db, interval, lock_path):
+    """
+    Lance (dans un worker Gunicorn) un thread qui reconstruit le classement toutes les
+    interval secondes. Un verrou fichier élit un seul worker du conteneur ; si ce worker
+    s'arrête, le verrou est libéré et un autre prend le relais.
+    """
+    import fcntl
+
+    def run():
+        with open(lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            while True:
+                time.sleep(interval)
+                with app.app_context():
+                    try:
+                        rebuild(db.session)
+                    except Exception as e:
+                        db.session.rollback()
+                        logger.exception("Error rebuilding leaderboard")
+                    finally:
+                        db.session.remove()
+
+    threading.Thread(target=run, name='leaderboard-rebuild', daemon=True).start()
@@ -0,0 +1,205 @@
+import hashlib
+import io
+import ipaddress
+import os
+import socket
+import tempfile
+from urllib.parse import urlsplit
+
+import requests
+import urllib3
+from flask import url_for
+from PIL import Image
+
+# Cache local des affiches : chaque affiche (chemin TMDB relatif ou URL complète) est téléchargée
+# une seule fois, puis déclinée en miniatures servies avec des en-têtes de cache longs.
+
+# Largeurs (pixels) des variantes générées ; "original" sert le fichier d'origine tel quel
+SIZES = {
+    'thumb': 92,
+    'list': 200,
+    'grid': 500,
+}
+ORIGINAL = 'original'
+
+JPEG_QUALITY = 85
+
+# Hôtes d'origine acceptés pour les URL complètes (l'hôte de POSTER_TMDB_BASE_URL s'y ajoute)
+ALLOWED_HOSTS = ('image.tmdb.org', 'upload.wikimedia.org')
+
+# Types d'image acceptés depuis l'origine (format Pillow -> type MIME)
+MIMETYPES = {
+    'JPEG': 'image/jpeg',
+    'PNG': 'image/png',
+    'WEBP': 'image/webp',
+    'GIF': 'image/gif',
+}
+
+
+class PosterError(Exception):
+    """Affiche introuvable ou illisible à l'origine."""
+
+
+def _is_public(address):
+    ip = ipaddress.ip_address(address.split('%')[0])
+    return not (ip.is_private or ip.is_loopback or ip.is_link_local or ip.is_reserved
+                or ip.is_multicast or ip.is_unspecified)
+
+
+class HttpFetcher:
+    """
+    Récupère les affiches par HTTP (TMDB, Wikipédia). Le chemin d'affiche est fourni par les
+    utilisateurs : seuls les hôtes autorisés sont contactés, sans suivre les redirections, et un
+    hôte résolu vers une adresse privée, locale ou de lien local (métadonnées cloud) est refusé.
+    """
+
+    def __init__(self, allowed_hosts=ALLOWED_HOSTS, timeout=10, max_bytes=10 * 1024 * 1024):
+        self.allowed_hosts = {host.lower() for host in allowed_hosts}
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+
+    def check(self, url):
+        """Lève PosterError si l'URL ne désigne pas un hôte autorisé et public."""
+        parts = urlsplit(url)
+        host = (parts.hostname or '').lower()
+        if parts.scheme not in ('http', 'https') or host not in self.allowed_hosts:
+            raise PosterError(f"Poster origin not allowed: {url}")
+        try:
+            addresses = {info[4][0] for info in socket.getaddrinfo(host, parts.port or parts.scheme, proto=socket.IPPROTO_TCP)}
+        except (socket.gaierror, UnicodeError) as e:
+            raise PosterError(f"Cannot resolve {host}: {e}") from e
+        if not all(_is_public(address) for address in addresses):
+            raise PosterError(f"Poster origin resolves to a non-public address: {host}")
+
+    def fetch(self, url):
+        self.check(url)
+        try:
+            response = requests.get(url, timeout=self.timeout, stream=True, allow_redirects=False)
+            if response.is_redirect:
+                response.close()
+                raise PosterError(f"Poster origin redirected: {url}")
+            response.raise_for_status()
+            content = response.raw.read(self.max_bytes + 1, decode_content=True)
+        except (requests.RequestException, urllib3.exceptions.HTTPError, OSError) as e:
+            # raw.read lit directement le flux urllib3 : ses erreurs (coupure, décompression) ne sont pas enveloppées par requests
+            raise PosterError(f"Cannot fetch {url}: {e}") from e
+        if len(content) > self.max_bytes:
+            raise PosterError(f"Poster too large: {url}")
+        return content
+
+
+class DirectoryFetcher:
+    """Lit les affiches dans un dossier local (fixtures de test) d'après le nom de fichier de l'URL."""
+
+    def __init__(self, root):
+        self.root = root
+
+    def fetch(self, url):
+        path = os.path.join(self.root, os.path.basename(url.split('?')[0]))
+        try:
+            with open(path, 'rb') as f:
+                return f.read()
+        except OSError as e:
+            raise PosterError(f"Fixture poster not found: {path}") from e
+
+
+def resolve(poster_path, tmdb_base_url):
+    """URL complète d'une affiche : les chemins relatifs (/abc.jpg) désignent l'original TMDB."""
+    if poster_path.startswith(('http://', 'https://')):
+        return poster_path
+    return f"{tmdb_base_url.rstrip('/')}/original/{poster_path.lstrip('/')}"
+
+
+def cache_key(poster_path):
+    """Clé de cache (et ETag) : dérivée du chemin, elle change si l'affiche du film change."""
+    return hashlib.sha256(poster_path.encode('utf-8')).hexdigest()[:32]
+
+
+def _write_atomic(path, data):
+    # Écriture atomique : deux workers générant la même variante ne produisent jamais de fichier tronqué
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+    with os.fdopen(fd, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _resize(original, width):
+    # Le décodage complet n'a lieu qu'ici : une image tronquée ou corrompue passe la validation de l'original
+    try:
+        with Image.open(io.BytesIO(original)) as image:
+            image = image.convert('RGB')
+            if image.width > width:
+                image = image.resize((width, round(image.height * width / image.width)), Image.LANCZOS)
+            buffer = io.BytesIO()
+            image.save(buffer, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+            return buffer.getvalue()
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        raise PosterError(f"Cannot resize poster: {e}") from e
+
+
+class PosterCache:
+    """
+    Affiches sur disque : <cache_dir>/<clé>/original puis <clé>/<taille>.jpg.
+    L'original est récupéré au premier accès via le fetcher, les variantes sont générées à la demande.
+    """
+
+    def __init__(self, cache_dir, fetcher, tmdb_base_url):
+        self.cache_dir = cache_dir
+        self.fetcher = fetcher
+        self.tmdb_base_url = tmdb_base_url
+
+    def _original(self, poster_path, directory):
+        path = os.path.join(directory, ORIGINAL)
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                return path, f.read()
+        content = self.fetcher.fetch(resolve(poster_path, self.tmdb_base_url))
+        try:
+            with Image.open(io.BytesIO(content)) as image:
+                if image.format not in MIMETYPES:
+                    raise PosterError(f"Unsupported poster format: {image.format}")
+        except (OSError, Image.DecompressionBombError) as e:
+            raise PosterError(f"Invalid poster image: {poster_path}") from e
+        os.makedirs(directory, exist_ok=True)
+        _write_atomic(path, content)
+        return path, content
+
+    def get(self, poster_path, size):
+        """Renvoie (chemin du fichier, type MIME) de la variante demandée, en la créant si besoin."""
+        directory = os.path.join(self.cache_dir, cache_key(poster_path))
+        if size != ORIGINAL:
+            path = os.path.join(directory, f'{size}.jpg')
+            if not os.path.exists(path):
+                _, original = self._original(poster_path, directory)
+                _write_atomic(path, _resize(original, SIZES[size]))
+            return path, 'image/jpeg'
+
+        path, content = self._original(poster_path, directory)
+        with Image.open(io.BytesIO(content)) as image:
+            return path, MIMETYPES[image.format]
+
+
+def init_app(app):
+    """Configure le cache d'affiches (fetcher HTTP, ou dossier de fixtures si POSTER_FIXTURE_DIR est défini)."""
+    app.config.setdefault('POSTER_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'poster-cache'))
+    app.config.setdefault('POSTER_TMDB_BASE_URL', 'https://image.tmdb.org/t/p')
+    app.config.setdefault('POSTER_ALLOWED_HOSTS', ALLOWED_HOSTS)
+    app.config.setdefault('POSTER_FIXTURE_DIR', None)
+    app.config.setdefault('POSTER_FETCHER', None)
+    fetcher = app.config['POSTER_FETCHER']
+    if fetcher is None:
+        fixture_dir = app.config['POSTER_FIXTURE_DIR']
+        allowed_hosts = (*app.config['POSTER_ALLOWED_HOSTS'], urlsplit(app.config['POSTER_TMDB_BASE_URL']).hostname)
+        fetcher = DirectoryFetcher(fixture_dir) if fixture_dir else HttpFetcher(allowed_hosts)
+    os.makedirs(app.config['POSTER_CACHE_DIR'], exist_ok=True)
+    app.extensions['posters'] = PosterCache(app.config['POSTER_CACHE_DIR'], fetcher, app.config['POSTER_TMDB_BASE_URL'])
+
+
+def poster_url(movie_id, poster_path, size='list'):
+    """
+    URL versionnée de l'affiche d'un film (None sans affiche). Le paramètre v change avec
+    l'affiche : la réponse peut donc être mise en cache indéfiniment (immutable).
+    """
+    if not poster_path:
+        return None
+    return url_for('movies.get_poster', movie_id=movie_id, size=size, v=cache_key(poster_path))
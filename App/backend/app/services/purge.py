@@ -0,0 +1,137 @@
+from datetime import datetime
+
+from sqlalchemy import select, delete, insert, literal
+
+from app.models import User, UserProfile, Movie, List, ListItem, Tombstone
+from app.services import leaderboard, changes
+
+
+def _delete(session, model, *criteria):
+    # Pas de synchronisation de la session : les objets ne sont pas chargés en mémoire
+    statement = delete(model).where(*criteria).execution_options(synchronize_session=False)
+    return session.execute(statement).rowcount
+
+
+def delete_list_items(session, item_ids):
+    """Supprime des éléments de liste par ID."""
+    if not item_ids:
+        return 0
+    return _delete(session, ListItem, ListItem.id.in_(item_ids))
+
+
+def delete_lists(session, list_ids):
+    """Supprime des listes et leurs éléments en deux requêtes ensemblistes."""
+    if not list_ids:
+        return 0
+    _delete(session, ListItem, ListItem.list_id.in_(list_ids))
+    return _delete(session, List, List.id.in_(list_ids))
+
+
+def delete_users(session, user_ids):
+    """Supprime des utilisateurs avec leurs listes, éléments de liste et profils."""
+    if not user_ids:
+        return 0
+    list_ids = select(List.id).where(List.user_id.in_(user_ids)).scalar_subquery()
+    _delete(session, ListItem, ListItem.list_id.in_(list_ids))
+    _delete(session, List, List.user_id.in_(user_ids))
+    _delete(session, UserProfile, UserProfile.user_id.in_(user_ids))
+    return _delete(session, User, User.id.in_(user_ids))
+
+
+def delete_movies(session, movie_ids):
+    """Supprime des films et les éléments de liste qui les référencent."""
+    if not movie_ids:
+        return 0
+    _delete(session, ListItem, ListItem.movie_id.in_(movie_ids))
+    return _delete(session, Movie, Movie.id.in_(movie_ids))
+
+
+# Suppressions volumineuses (routes d'administration) : les éléments de liste, seules tables
+# réellement grosses, sont supprimés par paquets validés séparément (verrous courts) ; les lignes
+# parentes sont ensuite supprimées une par requête et la base supprime le reste (ON DELETE CASCADE).
+
+PURGE_CHUNK_SIZE = 5000
+
+
+def _slices(ids, size):
+    ids = list(ids)
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+
+def purge_list_items(session, criteria, chunk_size=PURGE_CHUNK_SIZE, record_changes=True, commit=True):
+    """
+    Supprime les éléments de liste répondant aux critères, par paquets de chunk_size validés
+    un à un, en retirant leurs points du classement et en les inscrivant au journal des
+    modifications de leurs propriétaires. Renvoie le nombre d'éléments supprimés.
+    Avec commit=False, les paquets restent dans la transaction de l'appelant.
+    """
+    total = 0
+    while True:
+        item_ids = session.scalars(select(ListItem.id).where(*criteria).limit(chunk_size)).all()
+        if not item_ids:
+            return total
+        leaderboard.remove_items(session, item_ids)
+        if record_changes:
+            changes.record_items(session, ListItem.id.in_(item_ids))
+        total += _delete(session, ListItem, ListItem.id.in_(item_ids))
+        if commit:
+            session.commit()
+
+
+def _record_deletions(session, table_name, key_column, *criteria):
+    # Pierres tombales de l'export incrémental, écrites en une requête (les écouteurs
+    # after_delete de l'ORM ne voient pas les suppressions ensemblistes)
+    session.execute(insert(Tombstone).from_select(
+        ['table_name', 'key', 'deleted_at'],
+        select(literal(table_name), key_column, literal(datetime.utcnow())).where(*criteria)
+    ))
+
+
+def purge_users(session, user_ids, chunk_size=PURGE_CHUNK_SIZE):
+    """
+    Supprime des utilisateurs : éléments de leurs listes par paquets, puis les utilisateurs
+    (listes et profil suivent par cascade). Renvoie le nombre d'utilisateurs supprimés.
+    """
+    deleted = 0
+    for chunk in _slices(user_ids, chunk_size):
+        list_ids = select(List.id).where(List.user_id.in_(chunk))
+        # Pas de journal : il disparaît avec les utilisateurs
+        purge_list_items(session, [ListItem.list_id.in_(list_ids)], chunk_size, record_changes=False)
+        _record_deletions(session, 'users', User.uid, User.id.in_(chunk))
+        deleted += _delete(session, User, User.id.in_(chunk))
+        session.commit()
+    return deleted
+
+
+def purge_movies(session, movie_ids, chunk_size=PURGE_CHUNK_SIZE, commit=True):
+    """
+    Supprime des films : éléments de liste qui les référencent par paquets, puis les films
+    (score et voisins suivent par cascade). Renvoie le nombre de films supprimés.
+    Avec commit=False (fusion de doublons), la suppression suit la transaction de l'appelant.
+    """
+    deleted = 0
+    for chunk in _slices(movie_ids, chunk_size):
+        purge_list_items(session, [ListItem.movie_id.in_(chunk)], chunk_size, commit=commit)
+        _record_deletions(session, 'movies', Movie.uid, Movie.id.in_(chunk))
+        deleted += _delete(session, Movie, Movie.id.in_(chunk))
+        if commit:
+            session.commit()
+    return deleted
+
+
+def purge_lists(session, list_ids, chunk_size=PURGE_CHUNK_SIZE, commit=True):
+    """
+    Supprime des listes : leurs éléments par paquets, puis les listes. Renvoie le nombre de listes supprimées.
+    Avec commit=False (API par lots), rien n'est validé : la suppression suit la transaction de l'appelant.
+    """
+    deleted = 0
+    for chunk in _slices(list_ids, chunk_size):
+        # Les éléments d'une liste supprimée sont couverts par la suppression de la liste
+        purge_list_items(session, [ListItem.list_id.in_(chunk)], chunk_size, record_changes=False, commit=commit)
+        _record_deletions(session, 'lists', List.public_id, List.id.in_(chunk))
+        changes.record_lists(session, List.id.in_(chunk))
+        deleted += _delete(session, List, List.id.in_(chunk))
+        if commit:
+            session.commit()
+    return deleted
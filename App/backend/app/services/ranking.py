@@ -0,0 +1,200 @@
+import numpy as np
+
+# Comparaison de classements (corrélations de rang entre listes), vectorisée avec numpy.
+
+
+def rerank(ranks):
+    """Rangs 1..k dans l'ordre des rangs donnés (les trous laissés par les films non partagés disparaissent)."""
+    ranks = np.asarray(ranks)
+    result = np.empty(len(ranks), dtype=np.float64)
+    result[np.argsort(ranks, kind='stable')] = np.arange(1, len(ranks) + 1)
+    return result
+
+
+def spearman(ranks_a, ranks_b):
+    """Rho de Spearman entre deux classements des mêmes films (None si moins de deux films)."""
+    k = len(ranks_a)
+    if k < 2:
+        return None
+    d = rerank(ranks_a) - rerank(ranks_b)
+    return float(1 - 6 * np.sum(d ** 2) / (k * (k ** 2 - 1)))
+
+
+def kendall_tau(ranks_a, ranks_b):
+    """Tau de Kendall entre deux classements des mêmes films (None si moins de deux films)."""
+    k = len(ranks_a)
+    if k < 2:
+        return None
+    a, b = np.asarray(ranks_a), np.asarray(ranks_b)
+    # Matrices des signes de toutes les paires : +1 si les deux listes sont d'accord, -1 sinon
+    agreement = np.sign(a[:, None] - a[None, :]) * np.sign(b[:, None] - b[None, :])
+    return float(np.sum(np.triu(agreement, 1)) / (k * (k - 1) / 2))
+
+
+def compare(items_a, items_b):
+    """
+    Compare deux listes données sous forme {movie_id: rank}.
+    Renvoie les films communs (triés selon la première liste) et les corrélations sur ces films.
+    """
+    shared = sorted(set(items_a) & set(items_b), key=lambda movie_id: items_a[movie_id])
+    ranks_a = [items_a[movie_id] for movie_id in shared]
+    ranks_b = [items_b[movie_id] for movie_id in shared]
+    union = len(set(items_a) | set(items_b))
+    return {
+        "shared": shared,
+        "overlap": len(shared),
+        "jaccard": len(shared) / union if union else 0.0,
+        "spearman": spearman(ranks_a, ranks_b),
+        "kendall_tau": kendall_tau(ranks_a, ranks_b),
+    }
+
+
+def _group_rerank(groups, ranks):
+    """Rangs 1..k à l'intérieur de chaque groupe, pour tous les groupes en une passe."""
+    order = np.lexsort((ranks, groups))
+    sorted_groups = groups[order]
+    starts = np.flatnonzero(np.r_[True, sorted_groups[1:] != sorted_groups[:-1]])
+    sizes = np.diff(np.r_[starts, len(groups)])
+    result = np.empty(len(groups), dtype=np.float64)
+    result[order] = np.arange(len(groups)) - np.repeat(starts, sizes) + 1
+    return result
+
+
+def spearman_many(reference, list_ids, movie_ids, ranks, min_overlap=2):
+    """
+    Rho de Spearman entre une liste de référence ({movie_id: rank}) et de nombreuses listes
+    candidates, données à plat par trois tableaux (list_id, movie_id, rank) : aucun parcours
+    Python par liste, uniquement des opérations vectorisées sur l'ensemble des éléments.
+    Renvoie (ids des listes, nombre de films communs, rho) pour les listes ayant au moins
+    min_overlap films en commun.
+    """
+    reference_movies = np.array(sorted(reference), dtype=np.int64)
+    reference_ranks = np.array([reference[m] for m in reference_movies], dtype=np.int64)
+    list_ids, movie_ids, ranks = (np.asarray(x, dtype=np.int64) for x in (list_ids, movie_ids, ranks))
+
+    # Rang de référence de chaque élément candidat (recherche dichotomique), éléments non partagés écartés
+    position = np.searchsorted(reference_movies, movie_ids)
+    position[position == len(reference_movies)] = 0
+    shared = reference_movies[position] == movie_ids if len(reference_movies) else np.zeros(len(movie_ids), bool)
+    list_ids, ranks, mine = list_ids[shared], ranks[shared], reference_ranks[position[shared]]
+    if not len(list_ids):
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0)
+
+    # Numérotation dense des listes, puis re-classement des films communs dans chaque liste
+    candidates, groups = np.unique(list_ids, return_inverse=True)
+    d = _group_rerank(groups, ranks) - _group_rerank(groups, mine)
+    k = np.bincount(groups).astype(np.float64)
+    sum_d2 = np.bincount(groups, weights=d ** 2)
+
+    keep = k >= max(min_overlap, 2)
+    k, sum_d2 = k[keep], sum_d2[keep]
+    rho = 1 - 6 * sum_d2 / (k * (k ** 2 - 1))
+    return candidates[keep], k.astype(np.int64), rho
+
+
+# Consensus de plusieurs classements (classement de groupe)
+
+CONSENSUS_METHODS = ('borda', 'kemeny', 'schulze')
+
+# Nombre de listes comparées simultanément lors de la construction de la matrice (mémoire bornée)
+PREFERENCE_CHUNK = 16
+
+
+def rank_matrix(rankings, movie_ids):
+    """
+    Matrice (listes x films) des rangs ; un film absent d'une liste a un rang infini
+    (il est classé après tous les films de cette liste).
+    """
+    column = {movie_id: i for i, movie_id in enumerate(movie_ids)}
+    matrix = np.full((len(rankings), len(movie_ids)), np.inf)
+    for row, ranks in enumerate(rankings):
+        matrix[row, [column[m] for m in ranks]] = list(ranks.values())
+    return matrix
+
+
+def preference_matrix(ranks):
+    """
+    P[a, b] = nombre de listes classant a avant b, par comparaison vectorisée de toutes
+    les paires (les films absents d'une même liste ne sont pas départagés par elle).
+    """
+    lists, movies = ranks.shape
+    preferences = np.zeros((movies, movies), dtype=np.int64)
+    for start in range(0, lists, PREFERENCE_CHUNK):
+        block = ranks[start:start + PREFERENCE_CHUNK]
+        preferences += (block[:, :, None] < block[:, None, :]).sum(axis=0)
+    return preferences
+
+
+def borda(preferences):
+    """Score de Borda : nombre total de films battus, liste par liste (classements partiels inclus)."""
+    return preferences.sum(axis=1)
+
+
+def schulze(preferences):
+    """
+    Méthode de Schulze : force des chemins les plus forts (Floyd-Warshall vectorisé sur les lignes),
+    puis score = nombre de films battus par chemin.
+    """
+    strength = np.where(preferences > preferences.T, preferences, 0)
+    for k in range(len(strength)):
+        strength = np.maximum(strength, np.minimum(strength[:, k][:, None], strength[k, :][None, :]))
+    return (strength > strength.T).sum(axis=1)
+
+
+def kemeny_score(preferences, order):
+    """Nombre d'accords entre l'ordre proposé et les listes (somme de P[a, b] pour a avant b)."""
+    reordered = preferences[np.ix_(order, order)]
+    return int(np.triu(reordered, 1).sum())
+
+
+def kemeny_local(preferences, order, max_passes=20):
+    """
+    Approximation de Kemeny par recherche locale : partant d'un ordre initial (Borda), chaque film
+    est réinséré à la position qui maximise les accords avec les listes. Le gain de toutes les
+    positions possibles est calculé d'un coup par sommes cumulées. Arrêt quand plus aucun
+    déplacement n'améliore l'ordre (optimum local, qui inclut les échanges de voisins).
+    """
+    order = np.array(order)
+    for _ in range(max_passes):
+        improved = False
+        for movie in order.copy():
+            position = int(np.flatnonzero(order == movie)[0])
+            rest = np.delete(order, position)
+            # Accords de movie inséré avant rest[j] : listes le classant après rest[:j] et avant rest[j:]
+            before = np.concatenate(([0], np.cumsum(preferences[rest, movie])))
+            after = np.concatenate((np.cumsum(preferences[movie, rest][::-1])[::-1], [0]))
+            agreement = before + after
+            best = int(np.argmax(agreement))
+            if agreement[best] > agreement[position]:
+                order = np.insert(rest, best, movie)
+                improved = True
+        if not improved:
+            break
+    return order
+
+
+def consensus(rankings, method='borda'):
+    """
+    Classement consensuel de plusieurs listes ({movie_id: rank} chacune).
+    Renvoie (movie_ids dans l'ordre du consensus, score par film, score de Kemeny de l'ordre).
+    """
+    movie_ids = sorted({movie_id for ranks in rankings for movie_id in ranks})
+    if not movie_ids:
+        return [], {}, 0
+    preferences = preference_matrix(rank_matrix(rankings, movie_ids))
+    borda_scores = borda(preferences)
+    # Ordre de Borda décroissant, à égalité l'ID du film pour un résultat stable
+    borda_order = np.lexsort((np.array(movie_ids), -borda_scores))
+
+    if method == 'schulze':
+        scores = schulze(preferences)
+        order = np.lexsort((np.array(movie_ids), -borda_scores, -scores))
+    elif method == 'kemeny':
+        order = kemeny_local(preferences, borda_order)
+        scores = borda_scores
+    else:
+        order = borda_order
+        scores = borda_scores
+
+    ordered = [movie_ids[i] for i in order]
+    return ordered, {movie_ids[i]: int(scores[i]) for i in order}, kemeny_score(preferences, order)
@@ -0,0 +1,162 @@
+import math
+
+import numpy as np
+from sqlalchemy import select
+
+from app.models import Movie, List, ListItem, MovieNeighbor
+
+# Recommandations "quoi ajouter ensuite ?" par co-occurrence des films dans les listes publiques.
+# Le calcul (matrice film x film creuse, vectorisée avec numpy) est fait par lot ; la requête
+# HTTP se contente de relire les voisins précalculés et de les fusionner.
+
+# Nombre de voisins conservés par film
+TOP_NEIGHBORS = 50
+
+# Seuls les MAX_DEPTH premiers rangs de chaque liste comptent (le poids des rangs profonds est négligeable)
+MAX_DEPTH = 100
+
+# Nombre de paires accumulées avant réduction (somme des doublons), pour borner la mémoire
+REDUCE_EVERY = 5_000_000
+
+FETCH_SIZE = 10000
+INSERT_CHUNK_SIZE = 5000
+
+
+def rank_weight(rank):
+    """Poids d'un élément selon son rang (décroissance logarithmique, comme un DCG)."""
+    return 1.0 / np.log2(np.maximum(np.asarray(rank, dtype=np.float64), 1.0) + 1.0)
+
+
+def _load_items(session):
+    """Charge (list_id, movie_id, rank) des listes publiques dans trois tableaux numpy."""
+    rows = session.execute(
+        select(ListItem.list_id, ListItem.movie_id, ListItem.rank)
+        .join(List, List.id == ListItem.list_id)
+        .where(List.is_public.is_(True))
+        .execution_options(yield_per=FETCH_SIZE)
+    )
+    columns = ([], [], [])
+    for partition in rows.partitions():
+        block = np.array(partition, dtype=np.int64).reshape(-1, 3)
+        for column, values in zip(columns, block.T):
+            column.append(values)
+    if not columns[0]:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, empty
+    return tuple(np.concatenate(column) for column in columns)
+
+
+def _reduce(keys, values):
+    """Additionne les valeurs des clés identiques : renvoie (clés uniques triées, sommes)."""
+    unique, inverse = np.unique(keys, return_inverse=True)
+    return unique, np.bincount(inverse, weights=values)
+
+
+def cooccurrences(list_ids, movie_indices, weights, movie_count):
+    """
+    Matrice de co-occurrence pondérée C[a, b] = somme sur les listes de w(a) * w(b), a < b,
+    sous forme creuse : (clés a * movie_count + b, valeurs).
+    Les éléments doivent être triés par liste puis par rang. Les paires sont générées par
+    décalage d : l'élément k est associé à l'élément k + d s'ils sont dans la même liste,
+    soit au plus MAX_DEPTH opérations vectorisées sur tout le tableau.
+    """
+    key_parts, value_parts, pending = [], [], 0
+    keys, values = np.empty(0, dtype=np.int64), np.empty(0)
+    for d in range(1, MAX_DEPTH):
+        same_list = list_ids[:-d] == list_ids[d:]
+        if not same_list.any():
+            break
+        # Un film présent deux fois dans une liste n'est pas son propre voisin
+        pairs = same_list & (movie_indices[:-d] != movie_indices[d:])
+        a, b = movie_indices[:-d][pairs], movie_indices[d:][pairs]
+        key_parts.append(np.minimum(a, b) * movie_count + np.maximum(a, b))
+        value_parts.append(weights[:-d][pairs] * weights[d:][pairs])
+        pending += len(a)
+        if pending >= REDUCE_EVERY:
+            keys, values = _reduce(np.concatenate([keys] + key_parts), np.concatenate([values] + value_parts))
+            key_parts, value_parts, pending = [], [], 0
+    if key_parts:
+        keys, values = _reduce(np.concatenate([keys] + key_parts), np.concatenate([values] + value_parts))
+    return keys, values
+
+
+def top_neighbors(keys, values, norms, movie_count, top_n):
+    """
+    Similarité cosinus C[a, b] / (|a| |b|) puis N meilleurs voisins de chaque film.
+    Renvoie trois tableaux (film, voisin, score) en indices denses.
+    """
+    a, b = keys // movie_count, keys % movie_count
+    scores = values / (norms[a] * norms[b])
+    # La matrice est symétrique : chaque paire donne un voisin dans les deux sens
+    sources = np.concatenate([a, b])
+    targets = np.concatenate([b, a])
+    scores = np.concatenate([scores, scores])
+
+    order = np.lexsort((-scores, sources))
+    sources, targets, scores = sources[order], targets[order], scores[order]
+    # Position de chaque paire dans le groupe de son film source, pour ne garder que les top_n
+    group_start = np.searchsorted(sources, sources, side='left')
+    keep = np.arange(len(sources)) - group_start < top_n
+    return sources[keep], targets[keep], scores[keep]
+
+
+def build(session, top_n=TOP_NEIGHBORS):
+    """
+    Recalcule les voisins de tous les films et remplace le contenu de movie_neighbors
+    (une transaction : les lectures voient l'ancien ou le nouveau jeu, jamais un mélange).
+    Renvoie le nombre de paires conservées.
+    """
+    list_ids, movie_ids, ranks = _load_items(session)
+
+    # Tri par liste puis par rang, et troncature aux MAX_DEPTH premiers éléments de chaque liste
+    order = np.lexsort((ranks, list_ids))
+    list_ids, movie_ids, ranks = list_ids[order], movie_ids[order], ranks[order]
+    if len(list_ids):
+        starts = np.flatnonzero(np.r_[True, list_ids[1:] != list_ids[:-1]])
+        position = np.arange(len(list_ids)) - np.repeat(starts, np.diff(np.r_[starts, len(list_ids)]))
+        depth = position < MAX_DEPTH
+        list_ids, movie_ids, ranks = list_ids[depth], movie_ids[depth], ranks[depth]
+
+    # Indices denses des films (les IDs peuvent être épars)
+    movie_table, movie_indices = np.unique(movie_ids, return_inverse=True)
+    movie_count = len(movie_table)
+    weights = rank_weight(ranks)
+    norms = np.sqrt(np.bincount(movie_indices, weights=weights ** 2, minlength=movie_count))
+
+    keys, values = cooccurrences(list_ids, movie_indices, weights, movie_count)
+    sources, targets, scores = top_neighbors(keys, values, norms, movie_count, top_n)
+
+    table = MovieNeighbor.__table__
+    session.execute(table.delete())
+    for start in range(0, len(sources), INSERT_CHUNK_SIZE):
+        end = start + INSERT_CHUNK_SIZE
+        session.execute(table.insert(), [
+            {"movie_id": int(m), "neighbor_id": int(n), "score": float(s)}
+            for m, n, s in zip(movie_table[sources[start:end]], movie_table[targets[start:end]], scores[start:end])
+        ])
+    session.commit()
+    return len(sources)
+
+
+def recommend(session, movie_ranks, limit=20):
+    """
+    Fusionne les voisins précalculés des films d'une liste ({movie_id: rank}) :
+    chaque voisin cumule score x poids du rang du film source. Les films déjà présents
+    dans la liste sont exclus. Une seule requête (voisins + films).
+    """
+    if not movie_ranks:
+        return []
+    rows = session.execute(
+        select(MovieNeighbor.movie_id, MovieNeighbor.score, Movie)
+        .join(Movie, Movie.id == MovieNeighbor.neighbor_id)
+        .where(MovieNeighbor.movie_id.in_(list(movie_ranks)))
+    ).all()
+
+    totals, movies = {}, {}
+    for source_id, score, movie in rows:
+        if movie.id in movie_ranks:
+            continue
+        totals[movie.id] = totals.get(movie.id, 0.0) + score / math.log2(max(movie_ranks[source_id], 1) + 1)
+        movies[movie.id] = movie
+    best = sorted(totals.items(), key=lambda item: (-item[1], item[0]))[:limit]
+    return [(movies[movie_id], score) for movie_id, score in best]
@@ -0,0 +1,190 @@
+from datetime import datetime
+import os
+import sqlite3
+import tempfile
+
+from app.services.bulk_import import chunked
+from app.services.export import iter_sections, EXPORT_VERSION
+
+# Signature présente en tête de tout fichier SQLite
+SQLITE_HEADER = b'SQLite format 3\x00'
+
+SNAPSHOT_MIMETYPE = 'application/vnd.sqlite3'
+
+# Schéma des tables du snapshot : mêmes colonnes que l'export JSON
+SNAPSHOT_TABLES = {
+    'deleted': (
+        ('table', 'TEXT NOT NULL'),
+        ('key', 'TEXT NOT NULL'),
+        ('parent_key', 'TEXT'),
+        ('deleted_at', 'TEXT'),
+    ),
+    'users': (
+        ('id', 'INTEGER PRIMARY KEY'),
+        ('uid', 'TEXT'),
+        ('username', 'TEXT NOT NULL'),
+        ('password_hash', 'TEXT NOT NULL'),
+        ('created_at', 'TEXT'),
+    ),
+    'movies': (
+        ('id', 'INTEGER PRIMARY KEY'),
+        ('uid', 'TEXT'),
+        ('title', 'TEXT NOT NULL'),
+        ('poster_path', 'TEXT'),
+        ('release_date', 'TEXT'),
+        ('is_custom', 'BOOLEAN'),
+    ),
+    'lists': (
+        ('id', 'INTEGER PRIMARY KEY'),
+        ('user_id', 'INTEGER NOT NULL REFERENCES users(id)'),
+        ('name', 'TEXT NOT NULL'),
+        ('public_id', 'TEXT'),
+        ('private_id', 'TEXT'),
+        ('is_public', 'BOOLEAN'),
+        ('created_at', 'TEXT'),
+    ),
+    'list_items': (
+        ('id', 'INTEGER PRIMARY KEY'),
+        ('list_id', 'INTEGER NOT NULL REFERENCES lists(id)'),
+        ('movie_id', 'INTEGER NOT NULL REFERENCES movies(id)'),
+        ('rank', 'INTEGER NOT NULL'),
+        ('comment', 'TEXT'),
+    ),
+}
+
+# Index créés en fin d'écriture pour l'analyse hors ligne du fichier
+_SNAPSHOT_INDEXES = (
+    'CREATE INDEX ix_lists_user_id ON lists (user_id)',
+    'CREATE INDEX ix_list_items_list_id ON list_items (list_id, rank)',
+    'CREATE INDEX ix_list_items_movie_id ON list_items (movie_id)',
+)
+
+
+def _columns(table):
+    return ', '.join(f'"{name}"' for name, _ in SNAPSHOT_TABLES[table])
+
+
+def write_snapshot(session, since=None, chunk_size=1000, progress=None):
+    """
+    Écrit les données (ou le delta depuis since) dans un fichier SQLite autonome.
+    Renvoie le chemin du fichier temporaire créé, à supprimer par l'appelant.
+    progress(section, lignes) est appelé après chaque paquet.
+    """
+    fd, path = tempfile.mkstemp(suffix='.sqlite')
+    os.close(fd)
+    conn = sqlite3.connect(path)
+    try:
+        # Écriture en un seul bloc sans journal : le fichier est jetable tant qu'il n'est pas terminé
+        conn.execute('PRAGMA journal_mode = OFF')
+        conn.execute('PRAGMA synchronous = OFF')
+        conn.execute('CREATE TABLE meta ("key" TEXT PRIMARY KEY, "value" TEXT)')
+        meta = {"version": EXPORT_VERSION, "exported_at": datetime.utcnow().isoformat()}
+        if since:
+            meta["since"] = since.isoformat()
+        conn.executemany('INSERT INTO meta VALUES (?, ?)', meta.items())
+
+        for table, columns in SNAPSHOT_TABLES.items():
+            definition = ', '.join(f'"{name}" {kind}' for name, kind in columns)
+            conn.execute(f'CREATE TABLE {table} ({definition})')
+
+        placeholders = {table: ', '.join('?' * len(columns)) for table, columns in SNAPSHOT_TABLES.items()}
+        for table, rows in iter_sections(session, since):
+            names = [name for name, _ in SNAPSHOT_TABLES[table]]
+            statement = f'INSERT INTO {table} ({_columns(table)}) VALUES ({placeholders[table]})'
+            for chunk in chunked(rows, chunk_size):
+                conn.executemany(statement, [tuple(row[name] for name in names) for row in chunk])
+                if progress:
+                    progress(table, len(chunk))
+
+        for statement in _SNAPSHOT_INDEXES:
+            conn.execute(statement)
+        conn.commit()
+    except Exception:
+        conn.close()
+        os.remove(path)
+        raise
+    conn.close()
+    return path
+
+
+def remove_file(path):
+    """Supprime un fichier temporaire (sans erreur s'il a déjà disparu)."""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def stream_and_remove(response_class, path, chunk_size=64 * 1024, **kwargs):
+    """
+    Réponse envoyant un fichier temporaire par blocs, supprimé à la fermeture de la réponse :
+    le serveur WSGI la ferme toujours, même si le client est parti avant la lecture du flux
+    (un finally dans le générateur ne s'exécuterait pas si celui-ci n'a jamais démarré).
+    """
+    def blocks():
+        with open(path, 'rb') as source:
+            while True:
+                block = source.read(chunk_size)
+                if not block:
+                    break
+                yield block
+
+    try:
+        response = response_class(blocks(), **kwargs)
+        response.headers['Content-Length'] = str(os.path.getsize(path))
+    except Exception:
+        remove_file(path)
+        raise
+    response.call_on_close(lambda: remove_file(path))
+    return response
+
+
+def save_upload(stream, chunk_size=64 * 1024):
+    """
+    Recopie un fichier envoyé dans le corps de la requête vers un fichier temporaire,
+    par blocs (mémoire bornée). Lève ValueError si ce n'est pas une base SQLite.
+    """
+    fd, path = tempfile.mkstemp(suffix='.sqlite')
+    try:
+        with os.fdopen(fd, 'wb') as target:
+            while True:
+                block = stream.read(chunk_size)
+                if not block:
+                    break
+                target.write(block)
+        with open(path, 'rb') as source:
+            header = source.read(len(SQLITE_HEADER))
+        if header != SQLITE_HEADER:
+            raise ValueError("Not a SQLite snapshot")
+    except Exception:
+        # Envoi interrompu ou fichier invalide : l'appelant ne reçoit pas le chemin
+        remove_file(path)
+        raise
+    return path
+
+
+def iter_snapshot(path):
+    """
+    Ouvre un snapshot SQLite en lecture seule.
+    Renvoie (meta, sections) où sections produit les couples (nom, lignes) attendus par BulkImporter.
+    """
+    conn = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+    conn.row_factory = sqlite3.Row
+    try:
+        meta = dict(conn.execute('SELECT "key", "value" FROM meta').fetchall())
+    except sqlite3.DatabaseError as e:
+        conn.close()
+        raise ValueError(f"Invalid snapshot: {e}")
+
+    def sections():
+        try:
+            for table in SNAPSHOT_TABLES:
+                # Colonnes ajoutées depuis (uid) absentes des snapshots plus anciens : ignorées
+                present = {row['name'] for row in conn.execute(f'PRAGMA table_info({table})')}
+                columns = ', '.join(f'"{name}"' for name, _ in SNAPSHOT_TABLES[table] if name in present)
+                cursor = conn.execute(f'SELECT {columns} FROM {table} ORDER BY rowid')
+                yield table, (dict(row) for row in cursor)
+        finally:
+            conn.close()
+
+    return meta, sections()
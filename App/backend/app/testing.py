@@ -0,0 +1,17 @@
+import pytest
+
+from app.query_budget import QueryCounter
+
+# Fixtures pytest partagées, à activer dans conftest.py avec : pytest_plugins = ['app.testing']
+
+
+@pytest.fixture
+def query_counter():
+    """
+    Compte les requêtes SQL d'un bloc de test :
+        with query_counter() as counter:
+            client.get(...)
+        counter.assert_at_most(3)
+    Les vues décorées par @query_budget sont en plus vérifiées automatiquement sous TestConfig.
+    """
+    return QueryCounter
@@ -0,0 +1,210 @@
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+# Ajout du répertoire courant au chemin système pour permettre les imports relatifs
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import insert
+from flask_jwt_extended import create_access_token
+
+from app import create_app, db, bcrypt
+from app.config import BenchmarkConfig
+from app.models import User, Movie, List, ListItem
+from app.services.bulk_import import chunked
+
+# Banc d'essai des endpoints principaux sur des jeux de données de tailles croissantes.
+# Exemple : python benchmark.py --scales 1000,100000 --output bench.json
+# Les résultats (latences p50/p95/p99, débit, pic mémoire) sont produits en JSON pour
+# pouvoir être comparés d'un commit à l'autre.
+
+DEFAULT_SCALES = (1000, 100000, 1000000)
+
+# Forme du jeu de données, exprimée par rapport au nombre d'éléments de liste
+ITEMS_PER_LIST = 20
+LISTS_PER_USER = 5
+MOVIES_PER_ITEM = 0.1
+BIG_LIST_SIZE = 500
+
+
+def load_dataset(item_count, seed=42, chunk_size=5000):
+    """
+    Charge un jeu de données déterministe (graine fixe) par insertions groupées.
+    Renvoie le nombre de lignes créées par table.
+    """
+    rng = random.Random(seed)
+    list_count = max(1, item_count // ITEMS_PER_LIST)
+    user_count = max(1, list_count // LISTS_PER_USER)
+    movie_count = max(BIG_LIST_SIZE, int(item_count * MOVIES_PER_ITEM))
+
+    # Un seul hachage partagé : le chargement ne doit pas être dominé par bcrypt
+    password_hash = bcrypt.generate_password_hash('benchmark').decode('utf-8')
+    for chunk in chunked(range(1, user_count + 1), chunk_size):
+        db.session.execute(insert(User), [
+            {"id": i, "username": f"user{i}", "password_hash": password_hash} for i in chunk
+        ])
+    for chunk in chunked(range(1, movie_count + 1), chunk_size):
+        db.session.execute(insert(Movie), [
+            {"id": i, "title": f"Movie {i}", "release_date": str(1950 + i % 75), "is_custom": i % 10 == 0}
+            for i in chunk
+        ])
+    for chunk in chunked(range(1, list_count + 1), chunk_size):
+        db.session.execute(insert(List), [
+            {"id": i, "user_id": (i - 1) % user_count + 1, "name": f"List {i}",
+             "public_id": f"pub-{i}", "private_id": f"priv-{i}"}
+            for i in chunk
+        ])
+
+    # La liste 1 (utilisateur 1) est la liste volumineuse servant à get_list / reorder_items
+    def items():
+        big = min(BIG_LIST_SIZE, item_count)
+        for rank, movie_id in enumerate(rng.sample(range(1, movie_count + 1), big), 1):
+            yield {"list_id": 1, "movie_id": movie_id, "rank": rank}
+        remaining = item_count - big
+        for list_id in range(2, list_count + 1):
+            size = remaining // (list_count - list_id + 1) if list_id < list_count else remaining
+            remaining -= size
+            for rank, movie_id in enumerate(rng.sample(range(1, movie_count + 1), min(size, movie_count)), 1):
+                yield {"list_id": list_id, "movie_id": movie_id, "rank": rank}
+
+    for chunk in chunked(items(), chunk_size):
+        db.session.execute(insert(ListItem), chunk)
+    db.session.commit()
+    return {"users": user_count, "movies": movie_count, "lists": list_count, "list_items": item_count}
+
+
+def percentile(sorted_values, fraction):
+    """Percentile au rang le plus proche sur une liste triée."""
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def measure(name, call, iterations):
+    """Exécute un scénario : passe chronométrée, puis une passe sous tracemalloc pour le pic mémoire."""
+    latencies = []
+    statuses = {}
+    started = time.perf_counter()
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        status = call()
+        latencies.append(time.perf_counter() - t0)
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    total = time.perf_counter() - started
+
+    tracemalloc.start()
+    call()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latencies.sort()
+    return {
+        "endpoint": name,
+        "iterations": iterations,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "mean_ms": round(total / iterations * 1000, 3),
+        "throughput_rps": round(iterations / total, 2),
+        "peak_memory_kb": round(peak / 1024, 1),
+        "status_codes": statuses,
+    }
+
+
+def run_scale(item_count, iterations, heavy_iterations, seed):
+    app = create_app(BenchmarkConfig)
+    client = app.test_client()
+    with app.app_context():
+        db.create_all()
+        t0 = time.perf_counter()
+        sizes = load_dataset(item_count, seed=seed)
+        load_seconds = time.perf_counter() - t0
+        admin = {"Authorization": f"Bearer {create_access_token(identity='admin')}"}
+        owner = {"Authorization": f"Bearer {create_access_token(identity='1')}"}
+
+    big_list = client.get('/api/lists/pub-1').get_json()["items"]
+    reversed_order = [{"id": item["id"], "rank": len(big_list) - item["rank"] + 1} for item in big_list]
+    payload = client.get('/api/admin/export', headers=admin).get_data()
+
+    def import_into_empty_database():
+        # Chaque import part d'une base vide distincte (autre application, autre base en mémoire)
+        target = create_app(BenchmarkConfig)
+        with target.app_context():
+            db.create_all()
+            headers = {"Authorization": f"Bearer {create_access_token(identity='admin')}"}
+        return target.test_client().post('/api/admin/import', data=payload, headers=headers,
+                                         content_type='application/json').status_code
+
+    scenarios = [
+        ("search", lambda: client.get('/api/movies/search?query=Movie 1', headers=owner).status_code, iterations),
+        ("get_list", lambda: client.get('/api/lists/pub-1').status_code, iterations),
+        ("get_my_lists", lambda: client.get('/api/lists/mine', headers=owner).status_code, iterations),
+        ("reorder_items", lambda: client.put('/api/lists/priv-1/reorder', json={"items": reversed_order}).status_code, iterations),
+        ("export_data", lambda: len(client.get('/api/admin/export', headers=admin).get_data()) and 200, heavy_iterations),
+        ("import_data", import_into_empty_database, heavy_iterations),
+    ]
+    results = []
+    for name, call, count in scenarios:
+        result = measure(name, call, count)
+        result["scale"] = item_count
+        results.append(result)
+        print(f"[{item_count}] {name}: p50={result['p50_ms']}ms p95={result['p95_ms']}ms", file=sys.stderr)
+
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+    return {"scale": item_count, "dataset": sizes, "load_seconds": round(load_seconds, 2), "export_bytes": len(payload)}, results
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Banc d'essai des endpoints de l'API")
+    parser.add_argument('--scales', default=','.join(map(str, DEFAULT_SCALES)),
+                        help="Nombres d'éléments de liste, séparés par des virgules")
+    parser.add_argument('--iterations', type=int, default=50, help="Itérations par endpoint léger")
+    parser.add_argument('--heavy-iterations', type=int, default=3, help="Itérations pour export/import")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help="Fichier JSON de sortie (sortie standard par défaut)")
+    args = parser.parse_args()
+
+    report = {
+        "meta": {
+            "git_revision": git_revision(),
+            "started_at": datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "database": BenchmarkConfig.SQLALCHEMY_DATABASE_URI.split('://')[0],
+            "seed": args.seed,
+        },
+        "datasets": [],
+        "results": [],
+    }
+    for scale in (int(s) for s in args.scales.split(',') if s):
+        dataset, results = run_scale(scale, args.iterations, args.heavy_iterations, args.seed)
+        report["datasets"].append(dataset)
+        report["results"].extend(results)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+import gc
+import math
+import os
+import shutil
+
+# Configuration Gunicorn pour la production : gunicorn -c gunicorn.conf.py wsgi:app
+# Toutes les valeurs peuvent être surchargées par variables d'environnement.
+
+
+def available_cores():
+    """
+    Nombre de cœurs réellement utilisables par le conteneur :
+    quota CPU du cgroup (limite Docker) si présent, sinon affinité CPU du processus.
+    """
+    cores = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else (os.cpu_count() or 1)
+    quota = None
+    try:
+        # cgroup v2 : "<quota> <période>" ou "max <période>"
+        with open('/sys/fs/cgroup/cpu.max') as f:
+            value, period = f.read().split()
+            if value != 'max':
+                quota = int(value) / int(period)
+    except (OSError, ValueError):
+        try:
+            # cgroup v1
+            with open('/sys/fs/cgroup/cpu/cpu.cfs_quota_us') as f:
+                value = int(f.read())
+            with open('/sys/fs/cgroup/cpu/cpu.cfs_period_us') as f:
+                period = int(f.read())
+            if value > 0:
+                quota = value / period
+        except (OSError, ValueError):
+            pass
+    if quota:
+        cores = min(cores, max(1, math.ceil(quota)))
+    return cores
+
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+
+# Processus : 2 par cœur + 1 (les requêtes alternent CPU (bcrypt, JSON) et attente base de données)
+workers = int(os.environ.get('WEB_CONCURRENCY', available_cores() * 2 + 1))
+
+# Threads par processus : recouvrent les attentes réseau / base de données,
+# et portent les flux SSE des pages de liste ouvertes (un thread par flux)
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+worker_class = 'gthread' if threads > 1 else 'sync'
+
+# Application chargée une seule fois dans le maître (migrations, seed) puis partagée
+# en copie-sur-écriture par les workers forkés
+preload_app = True
+
+# Délais : requête longue (import/export), arrêt propre, keep-alive derrière Nginx
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+
+# Recyclage des workers pour borner les fuites mémoire (jitter pour éviter les redémarrages simultanés)
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 100))
+
+# Journal d'accès écrit par l'application (JSON, échantillonné, hors des threads de requête) :
+# celui de Gunicorn, écrit de façon synchrone par chaque requête, n'est activé qu'à la demande
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG')
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+
+# Compteurs /api/metrics partagés par les workers du nœud
+os.environ.setdefault('METRICS_DIR', '/tmp/app-metrics')
+
+# Compartiments de limitation de débit partagés par les workers du conteneur
+os.environ.setdefault('RATE_LIMIT_STORAGE', '/tmp/app-rate-limit.sqlite')
+
+# Évènements des listes diffusés à tous les workers du conteneur ; deux threads
+# par worker restent toujours disponibles pour les requêtes ordinaires
+os.environ.setdefault('EVENTS_BUS_PATH', '/tmp/app-events.sqlite')
+os.environ.setdefault('EVENTS_MAX_STREAMS', str(max(1, threads - 2)))
+
+# Nginx transmet l'IP cliente (X-Real-IP / X-Forwarded-For)
+forwarded_allow_ips = os.environ.get('FORWARDED_ALLOW_IPS', '*')
+
+
+def on_starting(server):
+    # Repart de compteurs vides à chaque démarrage du maître
+    shutil.rmtree(os.environ['METRICS_DIR'], ignore_errors=True)
+    os.makedirs(os.environ['METRICS_DIR'], exist_ok=True)
+
+
+def when_ready(server):
+    # Les objets créés au chargement ne seront plus parcourus par le ramasse-miettes :
+    # leurs pages mémoire restent partagées entre les workers au lieu d'être recopiées
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    # Les connexions ouvertes par le maître (migrations au démarrage) ne doivent pas
+    # être partagées entre processus : chaque worker ouvre son propre pool
+    from app import db
+    from wsgi import app
+
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+
+    # Reconstruction périodique du classement : un seul worker élu par verrou fichier
+    interval = app.config['LEADERBOARD_REBUILD_INTERVAL']
+    if interval:
+        from app.services.leaderboard import start_periodic_rebuild
+        start_periodic_rebuild(app, db, interval, '/tmp/app-leaderboard.lock')
+
+    # Threads d'exécution des tâches d'import/export (reprennent aussi les tâches abandonnées)
+    app.extensions['jobs'].start()
+
+
+def child_exit(server, worker):
+    # Les compteurs du worker terminé (recyclage max_requests, crash) sont conservés dans l'archive
+    from app.metrics import mark_process_dead
+
+    mark_process_dead(os.environ['METRICS_DIR'], worker.pid)
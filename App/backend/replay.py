@@ -0,0 +1,260 @@
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import json
+import re
+import sys
+import threading
+import time
+from urllib.parse import urlsplit, parse_qsl, urlencode
+
+import requests
+
+# Rejoue un trafic réel (logs d'accès nginx ou fichier d'enregistrement JSONL) contre une instance
+# locale, pour mesurer le débit soutenu par un conteneur avec notre mélange de requêtes.
+# Exemple : python replay.py access.log --fixture fixture.json --concurrency 16 --speed 4
+#
+# Fichier d'enregistrement (une requête JSON par ligne) :
+#   {"time": "2024-05-01T12:00:00", "method": "PUT", "path": "/api/lists/<id>/reorder",
+#    "user": "alice", "json": {...}}
+# Fixture des identifiants (les mots de passe et jetons de production ne sont jamais rejoués) :
+#   {"users": {"alice": "motdepasse"}, "default_user": "alice", "ids": {"<id prod>": "<id local>"}}
+
+# Format "combined" de nginx
+NGINX_LINE = re.compile(
+    r'(?P<ip>\S+) \S+ \S+ \[(?P<time>[^\]]+)\] "(?P<method>[A-Z]+) (?P<path>\S+) [^"]*" (?P<status>\d{3}) '
+)
+NGINX_TIME_FORMAT = '%d/%b/%Y:%H:%M:%S %z'
+
+UUID_SEGMENT = re.compile(r'^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$', re.I)
+
+# Segments suivant ces mots sont des noms libres (/api/lists/name/<nom>, /api/admin/movies/title/<titre>)
+NAME_MARKERS = ('name', 'title')
+
+
+def parse_nginx(lines):
+    for line in lines:
+        match = NGINX_LINE.match(line)
+        if not match or not match['path'].startswith('/api/'):
+            continue
+        yield {
+            "time": datetime.strptime(match['time'], NGINX_TIME_FORMAT).timestamp(),
+            "method": match['method'],
+            "path": match['path'],
+            "ip": match['ip'],
+        }
+
+
+def parse_recording(lines):
+    for line in lines:
+        if not line.strip():
+            continue
+        entry = json.loads(line)
+        if isinstance(entry.get("time"), str):
+            entry["time"] = datetime.fromisoformat(entry["time"]).timestamp()
+        yield entry
+
+
+def load_entries(path, limit=None):
+    with open(path, encoding='utf-8') as f:
+        first = f.readline()
+        f.seek(0)
+        parser = parse_recording if first.lstrip().startswith('{') else parse_nginx
+        entries = []
+        for entry in parser(f):
+            entries.append(entry)
+            if limit and len(entries) >= limit:
+                break
+    entries.sort(key=lambda e: e.get("time") or 0)
+    return entries
+
+
+def route_of(method, path):
+    """Regroupe les chemins par route : /api/lists/3f2a.../reorder -> PUT /api/lists/<id>/reorder."""
+    segments = urlsplit(path).path.rstrip('/').split('/')
+    normalized = []
+    for i, segment in enumerate(segments):
+        if UUID_SEGMENT.match(segment):
+            segment = '<id>'
+        elif segment.isdigit():
+            segment = '<int>'
+        elif i and segments[i - 1] in NAME_MARKERS and len(segments) > 3:
+            segment = '<name>'
+        normalized.append(segment)
+    return f"{method} {'/'.join(normalized) or '/'}"
+
+
+class Credentials:
+    """
+    Substitue les identifiants du fixture à ceux du trafic enregistré :
+    mot de passe en paramètre de requête, jeton JWT (obtenu une fois par utilisateur via /api/auth/login)
+    et identifiants de listes de production.
+    """
+
+    def __init__(self, base_url, fixture):
+        self.base_url = base_url
+        self.users = fixture.get("users", {})
+        self.default_user = fixture.get("default_user")
+        self.ids = fixture.get("ids", {})
+        self._tokens = {}
+        self._lock = threading.Lock()
+
+    def token(self, username):
+        with self._lock:
+            if username not in self._tokens:
+                response = requests.post(f'{self.base_url}/api/auth/login',
+                                         params={"username": username, "password": self.users.get(username, '')})
+                self._tokens[username] = response.json().get("access_token") if response.ok else None
+            return self._tokens[username]
+
+    def prepare(self, entry):
+        parts = urlsplit(entry["path"])
+        path = '/'.join(self.ids.get(segment, segment) for segment in parts.path.split('/'))
+        params = parse_qsl(parts.query, keep_blank_values=True)
+        if any(name == 'password' for name, _ in params):
+            username = dict(params).get('username')
+            if username not in self.users:
+                username = self.default_user
+            params = [(name, username if name == 'username' else self.users.get(username, '') if name == 'password' else value)
+                      for name, value in params]
+
+        headers = dict(entry.get("headers") or {})
+        headers.pop('Authorization', None)
+        # Les logs nginx ne contiennent pas les en-têtes : l'utilisateur par défaut est alors utilisé
+        user = entry.get("user", self.default_user)
+        if user:
+            token = self.token(user)
+            if token:
+                headers['Authorization'] = f'Bearer {token}'
+        if entry.get("ip"):
+            headers['X-Real-IP'] = entry["ip"]
+
+        url = f'{self.base_url}{path}'
+        if params:
+            url = f'{url}?{urlencode(params)}'
+        return url, headers
+
+
+def percentile(sorted_values, fraction):
+    """Percentile au rang le plus proche sur une liste triée."""
+    index = max(0, min(len(sorted_values) - 1, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies, statuses, errors, elapsed):
+    latencies = sorted(latencies)
+    count = len(latencies) + errors
+    failed = errors + sum(n for status, n in statuses.items() if status >= 500)
+    summary = {
+        "requests": count,
+        "throughput_rps": round(count / elapsed, 2) if elapsed else None,
+        "error_rate": round(failed / count, 4) if count else 0.0,
+        "connection_errors": errors,
+        "status_codes": {str(status): n for status, n in sorted(statuses.items())},
+    }
+    if latencies:
+        summary.update({
+            "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+            "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+            "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+            "max_ms": round(latencies[-1] * 1000, 3),
+        })
+    return summary
+
+
+def replay(entries, credentials, concurrency=8, speed=1.0, timeout=30):
+    """
+    Rejoue les requêtes en respectant leurs écarts temporels divisés par speed
+    (speed=0 : aussi vite que possible), avec au plus concurrency requêtes en vol.
+    """
+    results = {}
+    lock = threading.Lock()
+    slots = threading.BoundedSemaphore(concurrency)
+    local = threading.local()
+
+    def send(entry):
+        try:
+            # Une session HTTP par thread : réutilisation des connexions keep-alive
+            if not hasattr(local, 'session'):
+                local.session = requests.Session()
+            url, headers = credentials.prepare(entry)
+            started = time.perf_counter()
+            try:
+                response = local.session.request(entry["method"], url, headers=headers,
+                                                 json=entry.get("json"), timeout=timeout)
+                latency, status = time.perf_counter() - started, response.status_code
+            except requests.RequestException:
+                latency, status = None, None
+            with lock:
+                route = results.setdefault(route_of(entry["method"], entry["path"]),
+                                           {"latencies": [], "statuses": {}, "errors": 0})
+                if status is None:
+                    route["errors"] += 1
+                else:
+                    route["latencies"].append(latency)
+                    route["statuses"][status] = route["statuses"].get(status, 0) + 1
+        finally:
+            slots.release()
+
+    started = time.perf_counter()
+    origin = entries[0].get("time") or 0
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for entry in entries:
+            if speed:
+                delay = ((entry.get("time") or origin) - origin) / speed - (time.perf_counter() - started)
+                if delay > 0:
+                    time.sleep(delay)
+            slots.acquire()
+            pool.submit(send, entry)
+    elapsed = time.perf_counter() - started
+
+    latencies, statuses, errors = [], {}, 0
+    for data in results.values():
+        latencies.extend(data["latencies"])
+        errors += data["errors"]
+        for status, count in data["statuses"].items():
+            statuses[status] = statuses.get(status, 0) + count
+    report = {"total": summarize(latencies, statuses, errors, elapsed), "routes": {}}
+    report["total"]["elapsed_seconds"] = round(elapsed, 2)
+    for route, data in sorted(results.items(), key=lambda item: -len(item[1]["latencies"])):
+        report["routes"][route] = summarize(data["latencies"], data["statuses"], data["errors"], elapsed)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rejeu de trafic contre une instance locale de l'API")
+    parser.add_argument('source', help="Log d'accès nginx (format combined) ou fichier d'enregistrement JSONL")
+    parser.add_argument('--base-url', default='http://localhost:5000')
+    parser.add_argument('--fixture', help="Fichier JSON des identifiants à substituer")
+    parser.add_argument('--concurrency', type=int, default=8, help="Requêtes simultanées maximum")
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help="Multiplicateur de vitesse (2 = deux fois plus vite, 0 = sans attente)")
+    parser.add_argument('--limit', type=int, help="Nombre maximal de requêtes rejouées")
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--output', help="Fichier JSON de sortie (sortie standard par défaut)")
+    args = parser.parse_args()
+
+    fixture = {}
+    if args.fixture:
+        with open(args.fixture, encoding='utf-8') as f:
+            fixture = json.load(f)
+    entries = load_entries(args.source, args.limit)
+    if not entries:
+        print("No replayable /api request found", file=sys.stderr)
+        sys.exit(1)
+
+    print(f"Replaying {len(entries)} requests against {args.base_url}", file=sys.stderr)
+    report = replay(entries, Credentials(args.base_url.rstrip('/'), fixture), args.concurrency, args.speed, args.timeout)
+    report["meta"] = {"source": args.source, "concurrency": args.concurrency, "speed": args.speed,
+                      "started_at": datetime.utcnow().isoformat()}
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,27 @@
+import os
+
+import pytest
+
+os.environ.setdefault('ADMIN_USERNAME', 'admin')
+os.environ.setdefault('ADMIN_PASSWORD', 'adminpw')
+
+from app import create_app, db
+from app.config import TestConfig
+
+pytest_plugins = ['app.testing']
+
+
+@pytest.fixture
+def app():
+    """Application de test (TestConfig : base en mémoire, budgets de requêtes SQL vérifiés)."""
+    app = create_app(TestConfig)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
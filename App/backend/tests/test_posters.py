@@ -0,0 +1,138 @@
+import io
+import socket
+
+import pytest
+from PIL import Image
+
+from app import create_app, db
+from app.config import TestConfig
+from app.models import Movie
+from app.services import posters
+
+
+def _image(fmt, size=(1000, 1500)):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, (200, 10, 10)).save(buffer, fmt)
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def poster_app(tmp_path):
+    """Application servant les affiches d'un dossier de fixtures (DirectoryFetcher) au lieu de TMDB."""
+    fixtures = tmp_path / 'origin'
+    fixtures.mkdir()
+    (fixtures / 'abc.png').write_bytes(_image('PNG'))
+    (fixtures / 'broken.jpg').write_bytes(_image('JPEG')[:2000])
+    (fixtures / 'notes.jpg').write_bytes(b'not an image')
+
+    class Config(TestConfig):
+        POSTER_CACHE_DIR = str(tmp_path / 'cache')
+        POSTER_FIXTURE_DIR = str(fixtures)
+
+    app = create_app(Config)
+    with app.app_context():
+        db.create_all()
+        db.session.add_all([
+            Movie(id=1, title='A', poster_path='/abc.png'),
+            Movie(id=2, title='B'),
+            Movie(id=3, title='C', poster_path='/missing.jpg'),
+            Movie(id=4, title='D', poster_path='/broken.jpg'),
+            Movie(id=5, title='E', poster_path='/notes.jpg'),
+        ])
+        db.session.commit()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def poster_client(poster_app):
+    return poster_app.test_client()
+
+
+def test_variants_are_resized_jpeg(poster_client):
+    for size, width in posters.SIZES.items():
+        response = poster_client.get(f'/api/movies/1/poster/{size}')
+        assert response.status_code == 200
+        assert response.mimetype == 'image/jpeg'
+        with Image.open(io.BytesIO(response.data)) as image:
+            assert image.size == (width, width * 3 // 2)
+
+
+def test_original_is_served_as_is(poster_client):
+    response = poster_client.get('/api/movies/1/poster/original')
+    assert response.status_code == 200
+    assert response.mimetype == 'image/png'
+    assert response.data == _image('PNG')
+
+
+def test_versioned_url_is_immutable(poster_app, poster_client):
+    with poster_app.test_request_context():
+        url = posters.poster_url(1, '/abc.png')
+    assert url == f"/api/movies/1/poster/list?v={posters.cache_key('/abc.png')}"
+
+    response = poster_client.get(url)
+    assert response.cache_control.max_age == 31536000
+    assert response.cache_control.immutable
+
+    response = poster_client.get('/api/movies/1/poster/list')
+    assert response.cache_control.max_age == 86400
+    assert not response.cache_control.immutable
+
+
+def test_etag_revalidation(poster_client):
+    response = poster_client.get('/api/movies/1/poster/thumb')
+    etag = response.headers['ETag']
+    assert etag == f'"{posters.cache_key("/abc.png")}-thumb"'
+
+    response = poster_client.get('/api/movies/1/poster/thumb', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.headers['ETag'] == etag
+    assert not response.data
+
+
+def test_origin_fetched_once(poster_app, poster_client, tmp_path):
+    poster_client.get('/api/movies/1/poster/thumb')
+    (tmp_path / 'origin' / 'abc.png').unlink()
+    # Original et variantes viennent désormais du cache
+    assert poster_client.get('/api/movies/1/poster/grid').status_code == 200
+
+
+@pytest.mark.parametrize('movie_id', [3, 4, 5])
+def test_bad_image_is_unavailable(poster_client, movie_id):
+    # Absente à l'origine, tronquée (décodage complet au redimensionnement) ou illisible
+    response = poster_client.get(f'/api/movies/{movie_id}/poster/thumb')
+    assert response.status_code == 502
+
+
+def test_missing_poster_and_unknown_size(poster_client):
+    assert poster_client.get('/api/movies/2/poster').status_code == 404
+    assert poster_client.get('/api/movies/99/poster').status_code == 404
+    assert poster_client.get('/api/movies/1/poster/huge').status_code == 400
+
+
+@pytest.mark.parametrize('url', [
+    'http://169.254.169.254/latest/meta-data/',
+    'http://localhost:5000/api/admin/users',
+    'https://image.tmdb.org.evil.example/x.jpg',
+    'file:///etc/passwd',
+    'ftp://image.tmdb.org/x.jpg',
+])
+def test_http_fetcher_refuses_other_hosts(url):
+    with pytest.raises(posters.PosterError, match='not allowed'):
+        posters.HttpFetcher().fetch(url)
+
+
+def test_http_fetcher_refuses_private_addresses(monkeypatch):
+    # Hôte autorisé mais résolu vers une adresse interne (DNS compromis ou mal configuré)
+    def resolve(host, port, *args, **kwargs):
+        return [(socket.AF_INET, socket.SOCK_STREAM, socket.IPPROTO_TCP, '', ('10.0.0.5', 443))]
+
+    monkeypatch.setattr(socket, 'getaddrinfo', resolve)
+    with pytest.raises(posters.PosterError, match='non-public'):
+        posters.HttpFetcher().fetch('https://image.tmdb.org/t/p/original/abc.jpg')
+
+
+def test_relative_path_stays_on_tmdb():
+    url = posters.resolve('//169.254.169.254/latest', 'https://image.tmdb.org/t/p')
+    assert url == 'https://image.tmdb.org/t/p/original/169.254.169.254/latest'
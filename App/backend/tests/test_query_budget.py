@@ -0,0 +1,114 @@
+import pytest
+from flask import jsonify
+
+from app import db
+from app.models import Movie, ListItem, User
+from app.query_budget import query_budget, QueryBudgetExceeded
+
+
+@pytest.fixture
+def big_list(client):
+    """Liste de 50 films appartenant à bob."""
+    client.post('/api/auth/register?username=bob&password=pw')
+    new_list = client.post('/api/lists/?username=bob&password=pw&name=L1').json
+    for rank in range(1, 51):
+        movie = Movie(title=f'Film {rank}')
+        db.session.add(movie)
+        db.session.flush()
+        db.session.add(ListItem(list_id=new_list['id'], movie_id=movie.id, rank=rank))
+    db.session.commit()
+    # Session vide : les vues ne profitent pas des objets déjà chargés par la fixture
+    db.session.remove()
+    return new_list
+
+
+def test_get_list_stays_within_budget(client, big_list, query_counter):
+    with query_counter() as counter:
+        response = client.get(f"/api/lists/{big_list['public_id']}")
+
+    assert response.status_code == 200
+    assert len(response.json['items']) == 50
+    # Nombre de requêtes indépendant du nombre de films (pas de N+1)
+    counter.assert_at_most(3)
+
+
+def test_private_get_list_stays_within_budget(client, big_list, query_counter):
+    with query_counter() as counter:
+        response = client.get(f"/api/lists/{big_list['private_id']}")
+
+    assert response.status_code == 200
+    assert len(response.json['items']) == 50
+    counter.assert_at_most(3)
+
+
+def test_reorder_stays_within_budget(client, big_list, query_counter):
+    items = client.get(f"/api/lists/{big_list['public_id']}").json['items']
+    order = [{"id": item['id'], "rank": 51 - item['rank']} for item in items]
+
+    with query_counter() as counter:
+        response = client.put(f"/api/lists/{big_list['private_id']}/reorder", json={"items": order})
+
+    assert response.status_code == 200
+    counter.assert_at_most(6)
+    items = client.get(f"/api/lists/{big_list['public_id']}").json['items']
+    assert [item['rank'] for item in items] == list(range(1, 51))
+    assert items[0]['movie']['title'] == 'Film 50'
+
+
+def test_consensus_stays_within_budget(client, big_list, query_counter):
+    other = client.post('/api/lists/?username=bob&password=pw&name=L2').json
+    for movie_id in range(1, 51, 2):
+        db.session.add(ListItem(list_id=other['id'], movie_id=movie_id, rank=movie_id))
+    db.session.commit()
+    db.session.remove()
+
+    with query_counter() as counter:
+        response = client.get(f"/api/lists/consensus?ids={big_list['public_id']},{other['public_id']}")
+
+    assert response.status_code == 200
+    counter.assert_at_most(1)
+
+
+def test_budget_declared_on_view(app):
+    assert app.view_functions['lists.get_list'].query_budget == 3
+
+
+def test_exceeded_budget_fails_with_statements(app):
+    @app.route('/test/over-budget')
+    @query_budget(1)
+    def over_budget():
+        return jsonify(users=User.query.count(), movies=Movie.query.count())
+
+    with pytest.raises(QueryBudgetExceeded) as excinfo:
+        app.test_client().get('/test/over-budget')
+
+    message = str(excinfo.value)
+    assert 'issued 2 SQL queries (budget 1)' in message
+    assert 'FROM users' in message and 'FROM movies' in message
+
+
+def test_budget_not_enforced_outside_tests(app):
+    app.config['QUERY_BUDGET_ENFORCED'] = False
+
+    @app.route('/test/over-budget')
+    @query_budget(0)
+    def over_budget():
+        return jsonify(users=User.query.count())
+
+    assert app.test_client().get('/test/over-budget').status_code == 200
+
+
+def test_counter_ignores_other_threads(app, query_counter):
+    import threading
+
+    def other_thread():
+        with app.app_context():
+            User.query.count()
+
+    with query_counter() as counter:
+        thread = threading.Thread(target=other_thread)
+        thread.start()
+        thread.join()
+        Movie.query.count()
+
+    assert counter.count == 1
@@ -0,0 +1,85 @@
+import time
+
+import pytest
+from flask import g
+from sqlalchemy import insert, select
+
+from app import create_app, db
+from app.config import TestConfig
+from app.models import User, List
+from app.replica import STICKY_COOKIE
+
+PUBLIC_ID = 'public-list'
+PRIVATE_ID = 'private-list'
+
+
+@pytest.fixture
+def replica_app(tmp_path):
+    """
+    Primaire et réplica dans deux fichiers SQLite distincts, sans réplication : la même liste
+    y porte un nom différent, ce qui indique la base lue par chaque requête.
+    """
+    class Config(TestConfig):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'primary.db'}"
+        SQLALCHEMY_BINDS = {'replica': f"sqlite:///{tmp_path / 'replica.db'}"}
+
+    app = create_app(Config)
+    with app.app_context():
+        for engine, name in ((db.engines[None], 'primary'), (db.engines['replica'], 'replica')):
+            db.metadata.create_all(engine)
+            with engine.begin() as conn:
+                conn.execute(insert(User.__table__), {"id": 1, "username": "bob", "password_hash": "x"})
+                conn.execute(insert(List.__table__), {
+                    "id": 1, "user_id": 1, "name": name, "public_id": PUBLIC_ID, "private_id": PRIVATE_ID, "is_public": True,
+                })
+    # Pas de contexte d'application englobant : chaque requête a sa propre session
+    yield app
+    with app.app_context():
+        db.drop_all()
+        db.metadata.drop_all(db.engines['replica'])
+
+
+def test_read_only_view_reads_replica(replica_app):
+    response = replica_app.test_client().get(f'/api/lists/{PUBLIC_ID}')
+    assert response.status_code == 200
+    assert response.json['name'] == 'replica'
+    assert STICKY_COOKIE not in response.headers.get('Set-Cookie', '')
+
+
+def test_unmarked_view_reads_primary(replica_app):
+    # Vue d'écriture (non @read_only) : toujours sur le primaire
+    response = replica_app.test_client().put(f'/api/lists/{PRIVATE_ID}', json={"name": "renamed"})
+    assert response.status_code == 200
+    with replica_app.app_context():
+        assert db.session.get(List, 1).name == 'renamed'
+        with db.engines['replica'].connect() as conn:
+            assert conn.scalar(select(List.name).where(List.id == 1)) == 'replica'
+
+
+def test_reads_go_to_primary_after_write_in_request(replica_app):
+    with replica_app.test_request_context():
+        g.read_only = True
+        assert db.session.scalar(select(List.name)) == 'replica'
+        db.session.get(List, 1).name = 'written'
+        db.session.flush()
+        # La requête a écrit : ses lectures suivantes voient sa propre écriture
+        assert db.session.scalar(select(List.name)) == 'written'
+        db.session.rollback()
+
+
+def test_sticky_cookie_reads_primary_after_write(replica_app):
+    client = replica_app.test_client()
+    response = client.put(f'/api/lists/{PRIVATE_ID}', json={"name": "renamed"})
+    assert STICKY_COOKIE in response.headers['Set-Cookie']
+
+    # Le client qui vient d'écrire relit sur le primaire, les autres lisent le réplica (en retard)
+    assert client.get(f'/api/lists/{PUBLIC_ID}').json['name'] == 'renamed'
+    assert replica_app.test_client().get(f'/api/lists/{PUBLIC_ID}').json['name'] == 'replica'
+
+
+def test_expired_sticky_cookie_reads_replica(replica_app):
+    client = replica_app.test_client()
+    client.set_cookie(STICKY_COOKIE, str(time.time() - 1))
+    assert client.get(f'/api/lists/{PUBLIC_ID}').json['name'] == 'replica'
+    client.set_cookie(STICKY_COOKIE, 'garbage')
+    assert client.get(f'/api/lists/{PUBLIC_ID}').json['name'] == 'replica'
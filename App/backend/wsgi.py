@@ -0,0 +1,9 @@
+from app import create_app
+import logging
+
+# Point d'entrée WSGI pour la production (Gunicorn, voir gunicorn.conf.py)
+# Le serveur de développement reste lancé par app.py
+app = create_app()
+
+# Journalisé après create_app : le logger "app" n'est configuré qu'à ce moment
+logging.getLogger('app.wsgi').info("Starting Flask Application (WSGI)...")
@@ -44,6 +44,46 @@ export default function ListEditor() {
         fetchList();
     }, [listId]);
 
+    // Mises à jour en direct (Server-Sent Events) : les modifications faites ailleurs
+    // (autre onglet, autre appareil, API) sont appliquées sans recharger la liste
+    const publicId = list?.public_id;
+    useEffect(() => {
+        if (!publicId) return;
+        const source = new EventSource(`/api/lists/${publicId}/events`);
+        const sortByRank = (items) => [...items].sort((a, b) => a.rank - b.rank);
+
+        source.addEventListener('item_added', (e) => {
+            const item = JSON.parse(e.data);
+            setItems((items) => items.some(i => i.id === item.id) ? items : sortByRank([...items, item]));
+        });
+        source.addEventListener('item_removed', (e) => {
+            const { item_id } = JSON.parse(e.data);
+            setItems((items) => items.filter(item => item.id !== item_id));
+        });
+        source.addEventListener('items_moved', (e) => {
+            const ranks = new Map(JSON.parse(e.data).items.map(i => [i.id, i.rank]));
+            setItems((items) => sortByRank(items.map(item =>
+                ranks.has(item.id) ? { ...item, rank: ranks.get(item.id) } : item
+            )));
+        });
+        source.addEventListener('comment_edited', (e) => {
+            const { item_id, comment } = JSON.parse(e.data);
+            setItems((items) => items.map(item => item.id === item_id ? { ...item, comment } : item));
+        });
+        source.addEventListener('renamed', (e) => {
+            const { name } = JSON.parse(e.data);
+            setList((list) => ({ ...list, name }));
+        });
+        source.addEventListener('list_deleted', () => {
+            source.close();
+            navigate('/');
+        });
+        // Trop d'évènements manqués : rechargement complet
+        source.addEventListener('reset', () => fetchList());
+
+        return () => source.close();
+    }, [publicId]);
+
     // Gestion de la fin du glisser-déposer
     const handleDragEnd = async (event) => {
         const { active, over } = event;